@@ -19,6 +19,16 @@ from PIL import Image, ImageTk
 import io
 import shutil
 import math
+import zlib
+import re
+import csv
+import collections
+import itertools
+import gzip
+import functools
+import pathlib
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 
 
@@ -38,6 +48,21 @@ FONT_SMALL = ('Segoe UI', 10)
 
 CONFIG_FILE = "hotel_config.json"
 DATABASE_FILE = "hotel11_database.db"
+BACKUP_DIR = "database_backups"
+BACKUP_INTERVALS = {"hourly": timedelta(hours=1), "daily": timedelta(days=1),
+                    "weekly": timedelta(weeks=1), "monthly": timedelta(days=30)}
+DEFAULT_RETENTION_POLICY = {"hourly": 24, "daily": 7, "weekly": 4}
+ARCHIVE_DIR = "database_archives"
+ARCHIVE_KEEP_MONTHS = 3  # current month plus the two before it stay in the live database
+ARCHIVED_TABLES = {"sales": "date", "stock_history": "date", "user_activity": "timestamp"}
+ARCHIVE_SCHEMA_VERSION = 1  # archive files stamped with this user_version hold money in cents
+MAX_ATTACHED_PARTITIONS = 8  # SQLite allows 10 attached databases per connection
+PAGE_SIZE = 200  # rows fetched per page by KeysetCursor
+COUNT_ESTIMATE_CAP = 10000  # KeysetCursor.estimate_total stops counting here
+EXPORT_BATCH_SIZE = 1000  # rows per fetchmany() while streaming an export
+# daily_summaries column each payment method's takings go to; any other method goes to other_sales
+PAYMENT_SUMMARY_COLUMNS = {"cash": "cash_sales", "mpesa": "mpesa_sales", "m-pesa": "mpesa_sales",
+                           "card": "card_sales", "credit card": "card_sales"}
 DEFAULT_CREDENTIALS = {
     "users": {
         "admin": {
@@ -61,6 +86,30 @@ def hash_password(password):
     return hashlib.md5(password.encode()).hexdigest()
 
 
+def to_cents(amount):
+    """Convert a shilling amount (entry text, int, float or Decimal) to integer cents"""
+    try:
+        value = Decimal(str(amount).strip().replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def percent_of(cents, percent):
+    """percent % of an amount in cents, rounded half up to whole cents"""
+    return int((Decimal(cents) * Decimal(str(percent)) / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_money(cents, grouped=False):
+    """Render cents as shillings with two decimals, e.g. 123450 -> '1234.50' ('1,234.50' if grouped)"""
+    cents = int(round(cents or 0))
+    whole, fraction = divmod(abs(cents), 100)
+    whole = f"{whole:,}" if grouped else str(whole)
+    return f"{'-' if cents < 0 else ''}{whole}.{fraction:02d}"
+
+
 def load_config():
     if os.path.exists(CONFIG_FILE):
         with open(CONFIG_FILE, "r") as f:
@@ -96,18 +145,1121 @@ def save_full_config(config):
         json.dump(config, f, indent=4)
 
 
-class DatabaseManager:
+class ConnectionPool:
+    """Hands every thread its own SQLite connection and keeps one dedicated writer"""
+
+    def __init__(self, database_file, busy_timeout=5000, synchronous="NORMAL"):
+        self.database_file = database_file
+        self.busy_timeout = busy_timeout  # milliseconds
+        self.synchronous = synchronous
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        self._writer = None
+        self._writer_cursor = None
+        self._writer_owner = None
+        self._write_depth = 0
+        self._after_commit = []
+        self.trace_callback = None  # receives every statement run on connections opened after it is set
+
+    @staticmethod
+    def read_only_uri(path):
+        """URI that opens a database file read-only"""
+        return pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+
+    def _open(self, autocommit=False, read_only=False):
+        """Open a connection with the pool's pragmas applied"""
+        if read_only:
+            conn = sqlite3.connect(self.read_only_uri(self.database_file), uri=True,
+                                   timeout=self.busy_timeout / 1000, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database_file, timeout=self.busy_timeout / 1000,
+                                   check_same_thread=False)
+        if autocommit:
+            # Transactions on the writer are managed explicitly in transaction()
+            conn.isolation_level = None
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        if self.trace_callback:
+            conn.set_trace_callback(self.trace_callback)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @property
+    def writer(self):
+        """The single connection all DatabaseManager writes go through"""
+        with self.write_lock:
+            if self._writer is None:
+                self._writer = self._open(autocommit=True)
+                # WAL lets readers keep going while the writer commits
+                self._writer.execute("PRAGMA journal_mode=WAL")
+                self._writer_cursor = self._writer.cursor()
+            return self._writer
+
+    def in_transaction(self):
+        """Whether the calling thread is inside transaction()"""
+        return self._write_depth > 0 and self._writer_owner == threading.get_ident()
+
+    def in_snapshot(self):
+        """Whether the calling thread is reading inside snapshot()"""
+        return getattr(self._local, 'snapshot_depth', 0) > 0
+
+    def connection(self):
+        """Get the connection owned by the calling thread"""
+        # Inside a write transaction the thread must see its own uncommitted changes
+        if self.in_transaction():
+            return self._writer
+        local = self._local
+        if self.in_snapshot():
+            return local.snapshot_conn
+        if getattr(local, 'generation', None) != self._generation or local.conn is None:
+            local.conn = self._open()
+            local.cursor = local.conn.cursor()
+            local.generation = self._generation
+        return local.conn
+
+    def cursor(self):
+        """Get the cursor owned by the calling thread"""
+        if self.in_transaction():
+            return self._writer_cursor
+        if self.in_snapshot():
+            return self._local.snapshot_cursor
+        self.connection()
+        return self._local.cursor
+
+    @contextmanager
+    def snapshot(self, prepare=None):
+        """Read through the calling thread's read-only connection, from one consistent snapshot (re-entrant)
+
+        Until the block ends, connection() and cursor() on this thread return the
+        snapshot connection, so every read in it sees the database as of its start
+        and none of them can take a lock a writer needs. prepare(conn) runs before
+        the snapshot opens, for setup a transaction forbids, such as ATTACH.
+        """
+        local = self._local
+        if self.in_snapshot():
+            local.snapshot_depth += 1
+            try:
+                yield local.snapshot_cursor
+            finally:
+                local.snapshot_depth -= 1
+            return
+
+        if getattr(local, 'snapshot_generation', None) != self._generation or local.snapshot_conn is None:
+            local.snapshot_conn = self._open(autocommit=True, read_only=True)
+            local.snapshot_cursor = local.snapshot_conn.cursor()
+            local.snapshot_generation = self._generation
+        conn = local.snapshot_conn
+        if prepare:
+            prepare(conn)
+        conn.execute("BEGIN")
+        # A deferred transaction only fixes its snapshot at the first read
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        local.snapshot_depth = 1
+        try:
+            yield local.snapshot_cursor
+        finally:
+            local.snapshot_depth = 0
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """Run a block as one write transaction on the writer connection (re-entrant)"""
+        callbacks = []
+        with self.write_lock:
+            writer = self.writer
+            outermost = self._write_depth == 0
+            if outermost:
+                writer.execute("BEGIN IMMEDIATE")
+                self._writer_owner = threading.get_ident()
+            self._write_depth += 1
+            try:
+                yield self._writer_cursor
+            except BaseException:
+                self._write_depth -= 1
+                if outermost:
+                    self._writer_owner = None
+                    self._after_commit = []
+                    writer.rollback()
+                raise
+            else:
+                self._write_depth -= 1
+                if outermost:
+                    self._writer_owner = None
+                    callbacks, self._after_commit = self._after_commit, []
+                    try:
+                        writer.commit()
+                    except BaseException:
+                        # A failed COMMIT (busy, disk full) leaves the transaction open, and the
+                        # next BEGIN IMMEDIATE would fail on it; its callbacks are dropped with it
+                        writer.rollback()
+                        raise
+        # Outside the write lock, so callbacks can take their time or write again
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback):
+        """Run callback() once the calling thread's write transaction commits (dropped on rollback),
+        or straight away outside one"""
+        if self.in_transaction():
+            self._after_commit.append(callback)
+        else:
+            callback()
+
+    def open_reader(self):
+        """A read-only connection of the caller's own, outside the per-thread ones; close it with discard()"""
+        return self._open(read_only=True)
+
+    def discard(self, conn):
+        """Close a connection from open_reader()"""
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def release(self):
+        """Close the calling thread's read connections; for worker threads about to finish"""
+        local = self._local
+        for name in ('conn', 'snapshot_conn'):
+            conn = getattr(local, name, None)
+            if conn is None:
+                continue
+            setattr(local, name, None)
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+        local.cursor = None
+        local.snapshot_cursor = None
+
+    def close_all(self):
+        """Close every pooled connection; threads reconnect lazily on next use"""
+        with self.write_lock:
+            with self._connections_lock:
+                connections, self._connections = self._connections, []
+                self._generation += 1
+            for conn in connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._writer = None
+            self._writer_cursor = None
+
+
+class ActivityLogger:
+    """Write-behind queue for user_activity rows, flushed in batches by a background thread"""
+
+    def __init__(self, pool, flush_interval=0.5, batch_size=200, max_pending=10000):
+        self.pool = pool
+        self.flush_interval = flush_interval  # seconds between background flushes
+        self.batch_size = batch_size  # pending rows that trigger an early flush
+        self.pending = queue.Queue(maxsize=max_pending)
+        # Rows written ahead of the queue on the next flush: a batch whose insert failed,
+        # and rows that arrived on a full queue inside a write transaction
+        self.held = collections.deque()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ActivityLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, user, activity_type, description, durable=False):
+        """Queue one activity row; durable=True writes it (and everything before it) before returning,
+        or when the caller's write transaction commits if it is inside one"""
+        # Stamped now, in UTC like the column's CURRENT_TIMESTAMP default, not when flushed
+        row = (user, activity_type, description, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+        # flush() takes _flush_lock before the pool's write lock, so inside a transaction,
+        # which already holds the write lock, it waits for the commit instead
+        in_transaction = self.pool.in_transaction()
+        try:
+            self.pending.put_nowait(row)
+        except queue.Full:
+            if in_transaction:
+                self.held.append(row)
+                self.pool.after_commit(self.flush)
+                return
+            # Queue is full: the caller pays for a flush instead of dropping the entry
+            self.flush()
+            self.pending.put(row)
+        if durable or self._stopped.is_set():
+            if in_transaction:
+                self.pool.after_commit(self.flush)
+            else:
+                self.flush(raise_errors=durable)
+        elif self.pending.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self, raise_errors=False):
+        """Write every held and queued row in one transaction
+
+        If the write fails the rows are held for the next flush, and the error is
+        raised when raise_errors is set.
+        """
+        with self._flush_lock:
+            rows = []
+            while self.held:
+                rows.append(self.held.popleft())
+            while True:
+                try:
+                    rows.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return
+            try:
+                with self.pool.transaction() as cursor:
+                    cursor.executemany('''
+                        INSERT INTO user_activity (user, activity_type, description, timestamp)
+                        VALUES (?, ?, ?, ?)
+                    ''', rows)
+            except sqlite3.IntegrityError:
+                # One bad row must not lose the rest of the batch
+                for row in rows:
+                    try:
+                        with self.pool.transaction() as cursor:
+                            cursor.execute('''
+                                INSERT INTO user_activity (user, activity_type, description, timestamp)
+                                VALUES (?, ?, ?, ?)
+                            ''', row)
+                    except sqlite3.IntegrityError as e:
+                        print(f"Error logging activity {row[1]!r}: {str(e)}")
+                    except sqlite3.Error:
+                        # Locked or failing for every row, not just this one: keep it and the rest
+                        self.held.extendleft(reversed(rows[rows.index(row):]))
+                        if raise_errors:
+                            raise
+                        print(f"Error flushing activity log, {len(self.held)} entries held for retry")
+                        return
+            except sqlite3.Error as e:
+                # Busy or failing (database is locked, disk full): keep the batch for the next flush
+                self.held.extendleft(reversed(rows))
+                if raise_errors:
+                    raise
+                print(f"Error flushing activity log, {len(rows)} entries held for retry: {str(e)}")
+
+    def close(self):
+        """Stop the background flusher and write whatever is still queued"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+class DatabaseStats:
+    """Row counts and file statistics for the status screens, served from memory
+
+    Row counts live in table_row_counts, kept current by triggers, so reading them
+    costs the same however large the tables grow. Even that read is skipped until
+    PRAGMA data_version shows another connection has committed since the last one.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.lock = threading.Lock()
+        self._current = None
+        # (connection, data_version) the cached figures were read at; the connection itself
+        # rather than its id(), which a later connection can be given once this one is closed
+        self._seen = None
+
+    def current(self):
+        """{"row_counts": {table: rows}, "table_count", "page_size", "page_count", "freelist_count", "refreshed_at"}"""
+        conn = self.pool.connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self.lock:
+            if self._current is None or self._seen[0] is not conn or self._seen[1] != version:
+                self._current = self._read(conn)
+                self._seen = (conn, version)
+            return self._current
+
+    @staticmethod
+    def _read(conn):
+        return {
+            "row_counts": dict(conn.execute("SELECT table_name, row_count FROM table_row_counts").fetchall()),
+            "table_count": conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'").fetchone()[0],
+            "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+            "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+            "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "refreshed_at": datetime.now(),
+        }
+
+
+class KeysetCursor:
+    """Reads an ordered query one page at a time by seeking past the last key returned
+
+    Unlike LIMIT/OFFSET every page costs the same however far the reader has got,
+    and only one page of rows is held at a time. The key columns must be unique
+    together (end them with id) and are left out of the rows handed back. A temp
+    range source from range_source is read on the connection that made it, and
+    dropped by close().
+    """
+
+    def __init__(self, db, columns, source, where="1", params=(), key=("date", "time", "id"),
+                 descending=True, page_size=PAGE_SIZE):
+        self.db = db
+        self.columns = columns
+        self.source = source
+        self.conn = db.range_connection(source)
+        self.where = where
+        self.params = list(params)
+        self.key = tuple(key)
+        self.descending = descending
+        self.page_size = page_size
+        self.last_key = None
+        self.exhausted = False
+        self.fetched = 0
+
+    def next_page(self):
+        """The next page of rows, or [] once the query is exhausted"""
+        if self.exhausted:
+            return []
+        key = ", ".join(self.key)
+        where, params = self.where, list(self.params)
+        if self.last_key is not None:
+            # Row-value comparison, so SQLite seeks straight to it on the index
+            where = f"({where}) AND ({key}) {'<' if self.descending else '>'} ({', '.join('?' * len(self.key))})"
+            params += self.last_key
+        direction = "DESC" if self.descending else "ASC"
+        order = ", ".join(f"{column} {direction}" for column in self.key)
+        cursor = self.cursor()
+        cursor.execute(f'''
+            SELECT {self.columns}, {key}
+            FROM {self.source}
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT ?
+        ''', params + [self.page_size])
+        rows = cursor.fetchall()
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows:
+            self.last_key = list(rows[-1][-len(self.key):])
+        self.fetched += len(rows)
+        return [row[:-len(self.key)] for row in rows]
+
+    def __iter__(self):
+        while True:
+            page = self.next_page()
+            if not page:
+                return
+            yield from page
+
+    def cursor(self):
+        """A cursor on the connection holding the source"""
+        return self.conn.cursor() if self.conn is not None else self.db.cursor
+
+    def close(self):
+        """Drop the source if it is a temp range; the cursor cannot be read after"""
+        self.db.drop_range_source(self.source)
+        self.exhausted = True
+
+    def estimate_total(self, cap=COUNT_ESTIMATE_CAP):
+        """(row count, exact) for the whole query; counting stops past cap to keep it cheap"""
+        cursor = self.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM (SELECT 1 FROM {self.source} WHERE {self.where} LIMIT ?)
+        ''', self.params + [cap + 1])
+        count = cursor.fetchone()[0]
+        return min(count, cap), count <= cap
+
+
+class QueryRows:
+    """A query's rows addressed by position, for a VirtualGrid
+
+    Rows are read a page at a time around the grid's position by seeking on the
+    sort key and id from the nearest page already read, as KeysetCursor does, so
+    nothing the size of the whole result is ever held. The count is capped like
+    KeysetCursor.estimate_total and counted further as the grid nears its end.
+    sort_columns maps each sortable grid column to the SQL expressions it orders by.
+    A temp range source is read and dropped as KeysetCursor does it.
+    """
+    CACHED_PAGES = 8
+
+    def __init__(self, db, columns, source, where="1", params=(), order=("id",), descending=True,
+                 sort_columns=None, page_size=PAGE_SIZE):
+        self.db = db
+        self.columns = columns
+        self.source = source
+        self.conn = db.range_connection(source)
+        self.where = where
+        self.params = list(params)
+        self.order = tuple(order)
+        self.descending = descending
+        self.sort_columns = sort_columns or {}
+        self.page_size = page_size
+        self.sorted_by = None
+        self.total = None
+        self.exact = False
+        self.pages = {}  # page number -> (rows, first key, last key)
+
+    @classmethod
+    def from_cursor(cls, pager, sort_columns=None):
+        """The same query as a KeysetCursor, in the same default order; it takes over closing the source"""
+        order = pager.key if pager.key[-1] == "id" else pager.key + ("id",)
+        return cls(pager.db, pager.columns, pager.source, pager.where, pager.params, order,
+                   pager.descending, sort_columns, pager.page_size)
+
+    def sortable(self, column):
+        return column in self.sort_columns
+
+    def sort(self, column, descending):
+        """Order by a grid column from sort_columns, or by the default order for None"""
+        self.sorted_by = (column, descending) if column else None
+        self.pages = {}
+
+    def reload(self):
+        """Count and read the rows again when next shown, for data that has changed"""
+        self.total = None
+        self.pages = {}
+
+    def close(self):
+        """Drop the source if it is a temp range"""
+        self.db.drop_range_source(self.source)
+
+    def cursor(self):
+        """A cursor on the connection holding the source"""
+        return self.conn.cursor() if self.conn is not None else self.db.cursor
+
+    def _key(self):
+        """(key expressions, descending) of the current order"""
+        if not self.sorted_by:
+            return self.order, self.descending
+        column, descending = self.sorted_by
+        # A NULL never compares in a row value; -1e999 (-inf) sorts where NULL would
+        return tuple(f"COALESCE({expression}, -1e999)" for expression in self.sort_columns[column]) + ("id",), descending
+
+    def _count(self, cap):
+        cursor = self.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM (SELECT 1 FROM {self.source} WHERE {self.where} LIMIT ?)
+        ''', self.params + [cap + 1])
+        count = cursor.fetchone()[0]
+        self.total, self.exact = min(count, cap), count <= cap
+
+    def __len__(self):
+        if self.total is None:
+            self._count(COUNT_ESTIMATE_CAP)
+        return self.total
+
+    def _seek(self, after, skip, backward=False):
+        """A page of rows past the key after (from the start for None), skipping skip rows first
+
+        backward reads towards the start instead, for the rows before after; they
+        are still returned in grid order.
+        """
+        key, descending = self._key()
+        descending = descending != backward
+        where, params = self.where, list(self.params)
+        if after is not None:
+            where = f"({where}) AND ({', '.join(key)}) {'<' if descending else '>'} ({', '.join('?' * len(key))})"
+            params += after
+        direction = "DESC" if descending else "ASC"
+        cursor = self.cursor()
+        cursor.execute(f'''
+            SELECT {self.columns}, {", ".join(key)}
+            FROM {self.source}
+            WHERE {where}
+            ORDER BY {", ".join(f"{expression} {direction}" for expression in key)}
+            LIMIT ? OFFSET ?
+        ''', params + [self.page_size, skip])
+        rows = cursor.fetchall()
+        if backward:
+            rows.reverse()
+        if not rows:
+            return None
+        return [row[:-len(key)] for row in rows], list(rows[0][-len(key):]), list(rows[-1][-len(key):])
+
+    def _page(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            # Seek from whichever is nearest: the start, or a page either side already read
+            after, skip, backward = None, number * self.page_size, False
+            for anchor, (_, first, last) in self.pages.items():
+                if anchor < number and (number - anchor - 1) * self.page_size < skip:
+                    after, skip, backward = last, (number - anchor - 1) * self.page_size, False
+                elif anchor > number and (anchor - number - 1) * self.page_size < skip:
+                    after, skip, backward = first, (anchor - number - 1) * self.page_size, True
+            page = self._seek(after, skip, backward)
+            if page is None:
+                return []
+            if len(self.pages) >= self.CACHED_PAGES:
+                self.pages.pop(next(iter(self.pages)))
+            self.pages[number] = page
+        return page[0]
+
+    def window(self, start, count):
+        """Up to count rows from position start"""
+        if not self.exact and start + count >= len(self) - self.page_size:
+            # Near the end of what has been counted: count further
+            self._count(len(self) * 4)
+        end = min(start + count, len(self))
+        rows = []
+        for number in range(start // self.page_size, (end - 1) // self.page_size + 1 if end > start else 0):
+            page = self._page(number)
+            first = number * self.page_size
+            rows.extend(page[max(start - first, 0):end - first])
+        return rows
+
+
+class ListRows:
+    """Rows already in memory addressed by position, for a VirtualGrid
+
+    For results that are small or already computed (summaries, search matches).
+    sort_columns maps each sortable grid column to the index of the row value it
+    sorts by; the original order is kept for sorting by None. load, if given,
+    computes the rows afresh for reload().
+    """
+
+    def __init__(self, rows, sort_columns=None, load=None):
+        self.original = list(rows)
+        self.rows = self.original
+        self.sort_columns = sort_columns or {}
+        self.sorted_by = None
+        self.load = load
+
+    def reload(self):
+        if self.load is not None:
+            self.original = list(self.load())
+            self.sort(*(self.sorted_by or (None, False)))
+
+    def close(self):
+        pass
+
+    def sortable(self, column):
+        return column in self.sort_columns
+
+    def sort(self, column, descending):
+        self.sorted_by = (column, descending) if column else None
+        if not column:
+            self.rows = self.original
+            return
+        index = self.sort_columns[column]
+        # Empty values sort last either way
+        present = [row for row in self.original if row[index] is not None]
+        missing = [row for row in self.original if row[index] is None]
+        self.rows = sorted(present, key=lambda row: row[index], reverse=descending) + missing
+
+    def __len__(self):
+        return len(self.rows)
+
+    def window(self, start, count):
+        return self.rows[start:start + count]
+
+
+class DailySalesSummary:
+    """One user's sales for a day, as show_daily_sales displays them and print_sales_summary prints them
+
+    rows are get_daily_sales rows: (category, meal, quantity, amount, payment_method, profit, margin).
+    """
+    ITEM_SORT_COLUMNS = {"Category": 0, "Meal": 1, "Qty Sold": 2, "Amount": 3, "Profit": 5, "Margin": 6}
+    PAYMENT_SORT_COLUMNS = {"Payment Method": 0, "Amount": 1}
+
+    def __init__(self, date, user, rows):
+        self.date = date
+        self.user = user
+        self.rows = list(rows)
+        self.total = sum(amount for _, _, _, amount, _, _, _ in self.rows)
+        self.profit = sum(profit for _, _, _, _, _, profit, _ in self.rows)
+        self.profit_percentage = (self.profit / self.total * 100) if self.total > 0 else 0
+
+        self.payment_methods = {}
+        item_sales = {}
+        category_sales = {}
+        for category, meal, quantity, amount, method, _, _ in self.rows:
+            self.payment_methods[method] = self.payment_methods.get(method, 0) + amount
+            item_sales[meal] = item_sales.get(meal, 0) + quantity
+            category_sales[category] = category_sales.get(category, 0) + quantity
+        self.most_sold_item = max(item_sales, key=item_sales.get) if item_sales else "None"
+        self.most_sold_category = max(category_sales, key=category_sales.get) if category_sales else "None"
+
+    def item_rows(self):
+        return ListRows(self.rows, self.ITEM_SORT_COLUMNS)
+
+    def payment_rows(self):
+        return ListRows(self.payment_methods.items(), self.PAYMENT_SORT_COLUMNS)
+
+    @staticmethod
+    def item_values(row):
+        category, meal, quantity, amount, _, profit, margin = row
+        return (category, meal, quantity, format_money(amount), format_money(profit), f"{margin or 0:.1f}%")
+
+    @staticmethod
+    def payment_values(row):
+        method, amount = row
+        return (method, format_money(amount))
+
+
+class MenuItem:
+    """One meal held in the MenuCatalog"""
+    __slots__ = ("category", "name", "description", "buying_price", "selling_price",
+                 "current_stock", "is_active")
+
+    def __init__(self, category, name, description, buying_price, selling_price, current_stock, is_active=True):
+        self.category = category
+        self.name = name
+        self.description = description
+        self.buying_price = buying_price
+        self.selling_price = selling_price
+        self.current_stock = current_stock
+        self.is_active = bool(is_active)
+
+
+class MenuCatalog:
+    """In-memory copy of the meals table, written through by every DatabaseManager change"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.items = {}
+        # Bumped on every change so views can tell when they need to redraw
+        self.version = 0
+        # (category, name) -> version it last changed at, so views can redraw just those items
+        self.changed = {}
+        self._loaded_version = 0
+        self._menu = {}
+        self._menu_version = -1
+
+    def load(self, rows):
+        """Replace the catalog from (category, name, description, buying_price,
+        selling_price, current_stock, is_active) rows"""
+        with self.lock:
+            self.items = {(row[0], row[1]): MenuItem(*row) for row in rows}
+            self.version += 1
+            self.changed = {}
+            self._loaded_version = self.version
+
+    def get(self, category, name):
+        return self.items.get((category, name))
+
+    def stock(self, category, name):
+        item = self.items.get((category, name))
+        return item.current_stock if item else 0
+
+    def buying_price(self, category, name):
+        item = self.items.get((category, name))
+        return item.buying_price if item else 0
+
+    def selling_price(self, category, name):
+        item = self.items.get((category, name))
+        return item.selling_price if item else 0
+
+    def put(self, category, name, description, buying_price, selling_price, current_stock, is_active=True):
+        """Add or replace an item"""
+        with self.lock:
+            self.items[(category, name)] = MenuItem(category, name, description, buying_price,
+                                                    selling_price, current_stock, is_active)
+            self.version += 1
+            self.changed[(category, name)] = self.version
+
+    def update(self, category, name, **fields):
+        """Overwrite selected fields of an existing item"""
+        with self.lock:
+            item = self.items.get((category, name))
+            if item is None:
+                return
+            for field, value in fields.items():
+                setattr(item, field, value)
+            self.version += 1
+            self.changed[(category, name)] = self.version
+
+    def adjust_stock(self, changes):
+        """Apply {(category, name): delta} stock changes"""
+        with self.lock:
+            self.version += 1
+            for key, delta in changes.items():
+                item = self.items.get(key)
+                if item is not None:
+                    item.current_stock += delta
+                    self.changed[key] = self.version
+
+    def changed_since(self, version):
+        """(category, name) keys changed after version, or None if the whole catalog was reloaded since"""
+        with self.lock:
+            if version < self._loaded_version:
+                return None
+            return [key for key, changed in self.changed.items() if changed > version]
+
+    def low_stock(self, threshold=10):
+        """Active items at or below threshold as (category, name, current_stock), lowest first"""
+        with self.lock:
+            rows = [(item.category, item.name, item.current_stock) for item in self.items.values()
+                    if item.is_active and item.current_stock <= threshold]
+        return sorted(rows, key=lambda row: row[2])
+
+    def menu(self):
+        """Active items as {category: {name: selling_price}}, rebuilt only after a change"""
+        with self.lock:
+            if self._menu_version != self.version:
+                menu = {}
+                for (category, name), item in sorted(self.items.items()):
+                    if item.is_active:
+                        menu.setdefault(category, {})[name] = item.selling_price
+                self._menu = menu
+                self._menu_version = self.version
+            return self._menu
+
+
+class DataEvent:
+    """A change DatabaseManager has committed; each subclass names the fields it carries"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class SaleRecorded(DataEvent):
+    """A receipt was recorded; items maps (category, meal) to the quantity sold"""
+    __slots__ = ("dates", "items")
+
+
+class StockChanged(DataEvent):
+    """Stock levels changed; items maps (category, name) to the new stock"""
+    __slots__ = ("items",)
+
+
+class MealAdded(DataEvent):
+    __slots__ = ("category", "name")
+
+
+class MealRemoved(DataEvent):
+    __slots__ = ("category", "name")
+
+
+class DayCleared(DataEvent):
+    """Every sale from start_date to end_date (inclusive) was voided"""
+    __slots__ = ("start_date", "end_date")
+
+
+class HistoryPurged(DataEvent):
+    """Rows were deleted from a log table (stock_history or user_activity)"""
+    __slots__ = ("table",)
+
+
+class DataReloaded(DataEvent):
+    """The whole database was replaced underneath, as by restore_from"""
+    __slots__ = ()
+
+
+class EventBus:
+    """Hands each published DataEvent to the callbacks subscribed to its type or a base of it
+
+    Callbacks run on the publishing thread; one that raises does not stop the rest.
+    """
+
     def __init__(self):
-        self.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        self.lock = threading.Lock()
+        self.subscribers = []  # (event type, callback)
+
+    def subscribe(self, event_type, callback):
+        with self.lock:
+            self.subscribers.append((event_type, callback))
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [(event_type, subscribed) for event_type, subscribed in self.subscribers
+                                if subscribed != callback]
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for event_type, callback in subscribers:
+            if isinstance(event, event_type):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Error handling {type(event).__name__}: {str(e)}")
+
+
+def reporting(method):
+    """Run a DatabaseManager read method inside its own (or the caller's) snapshot()"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.snapshot():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class DatabaseManager:
+    def __init__(self, database_file=DATABASE_FILE):
+        self.pool = ConnectionPool(database_file)
+        self.activity = ActivityLogger(self.pool)
+        self.stats = DatabaseStats(self.pool)
+        self.catalog = MenuCatalog()
+        self.events = EventBus()
+        # Temp range views and tables from range_source: name -> (connection holding it,
+        # archive schemas it reads, whether the connection is its own)
+        self.range_sources = {}
+        self._range_ids = itertools.count(1)
         self.initialize_database()
+        self.reload_catalog()
+
+    @property
+    def conn(self):
+        """Connection owned by the calling thread"""
+        return self.pool.connection()
+
+    @property
+    def cursor(self):
+        """Cursor owned by the calling thread"""
+        return self.pool.cursor()
+
+    def snapshot(self):
+        """Context manager running reports against one read-only, consistent view of the database
+
+        Nothing read inside it can hold a lock the checkout path needs, and a
+        dashboard refreshed inside one block sees every figure as of the same moment.
+        """
+        return self.pool.snapshot(prepare=self._attach_recent_archives)
+
+    def _attach_recent_archives(self, conn):
+        """Attach the newest archive months read-only; range_source cannot ATTACH inside a snapshot"""
+        wanted = {self._archive_schema(month): path for month, path in conn.execute(
+            "SELECT month, file_path FROM archive_partitions ORDER BY month DESC LIMIT ?",
+            (MAX_ATTACHED_PARTITIONS,))}
+        attached = {row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("arch_")}
+        # Months an open range view on this connection still reads stay attached
+        in_use = {name for holder, schemas, _ in list(self.range_sources.values()) if holder is conn
+                  for name in schemas}
+        for name in attached - set(wanted) - in_use:
+            conn.execute(f"DETACH DATABASE {name}")
+        for name, path in wanted.items():
+            if name not in attached and os.path.exists(path):
+                conn.execute(f"ATTACH DATABASE ? AS {name}", (self.pool.read_only_uri(path),))
+
+    def close(self):
+        """Write out queued activity and close all pooled connections"""
+        self.activity.flush()
+        self.pool.close_all()
+
+    def log_activity(self, user, activity_type, description, durable=False):
+        """Queue a user_activity row; pass durable=True for entries that must be on disk on return"""
+        self.activity.log(user, activity_type, description, durable)
+
+    def backup_to(self, path, pages=256, progress=None):
+        """Copy the live database to path with the SQLite online backup API, a few pages at a time"""
+        # The writer is the source so commits made during the backup are carried
+        # into the copy instead of forcing the backup to restart
+        source = self.pool.writer
+        dest = sqlite3.connect(path)
+        try:
+            source.backup(dest, pages=pages, progress=progress, sleep=0.005)
+        finally:
+            dest.close()
+
+    def restore_from(self, path, pages=256, progress=None):
+        """Replace the live database content with a backup file, without closing any connection"""
+        # Entries queued before the restore belong to the database being replaced
+        self.activity.flush()
+        source = sqlite3.connect(path)
+        try:
+            # Hold the write lock so no sale can commit halfway through the swap
+            with self.pool.write_lock:
+                source.backup(self.pool.writer, pages=pages, progress=progress, sleep=0.005)
+        finally:
+            source.close()
+
+        # Backups taken by older versions may be missing newer tables
+        self.initialize_database()
+        self.reload_catalog()
+        self.publish(DataReloaded())
+
+    def publish(self, *events):
+        """Publish DataEvents on self.events once the current write transaction, if any, commits"""
+        for event in events:
+            self.pool.after_commit(functools.partial(self.events.publish, event))
+
+    def reload_catalog(self):
+        """Load the in-memory menu catalog from the meals table"""
+        self.cursor.execute('''
+            SELECT category, name, description, buying_price, selling_price, current_stock, is_active
+            FROM meals
+        ''')
+        self.catalog.load(self.cursor.fetchall())
 
     # Removed ensure_meals_table_columns as it's redundant
 
+    # Schema migrations, applied in order and tracked in PRAGMA user_version.
+    # Append new ones at the end; never edit or renumber one that has shipped.
+    MIGRATIONS = (
+        (1, "Base tables and default meals"),
+        (2, "Daily item totals"),
+        (3, "Archive partition registry"),
+        (4, "Composite and covering report indexes"),
+        (5, "Money stored as integer cents"),
+        (6, "Hourly sales rollup"),
+        (7, "Per-user sales paging index"),
+        (8, "Change capture watermarks and tombstones"),
+        (9, "Full-text search over stock history and activity"),
+        (10, "Trigger-maintained table row counts"),
+    )
+
+    # Tables whose row counts table_row_counts keeps; a migration adding a table
+    # should call _count_rows for it
+    COUNTED_TABLES = ("meals", "sales", "daily_summaries", "stock_history", "user_activity",
+                      "daily_item_totals", "sales_hourly", "archive_partitions",
+                      "export_watermarks", "export_tombstones")
+
+    # Columns indexed for full-text search, per table; each gets a {table}_fts
+    # FTS5 index over the table's own rows
+    SEARCH_INDEXES = {
+        "stock_history": ("item_name", "category", "notes"),
+        "user_activity": ("description",),
+    }
+
+    # sales grouped into sales_hourly rows, for a {source} of sales and a date range.
+    # Dashboards read the rollup; record_cart keeps it current.
+    HOURLY_ROLLUP_SELECT = '''
+        SELECT date, CAST(substr(time, 1, 2) AS INTEGER), user, category, meal, payment_method,
+               COUNT(*), SUM(quantity), SUM(amount), SUM(profit)
+        FROM {source}
+        WHERE date >= ? AND date <= ?
+        GROUP BY date, substr(time, 1, 2), user, category, meal, payment_method
+    '''
+    HOURLY_ROLLUP_UPSERT = '''
+        INSERT INTO sales_hourly (date, hour, user, category, meal, payment_method,
+                                  transactions, quantity, amount, profit)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(date, hour, user, category, meal, payment_method) DO UPDATE SET
+            transactions = transactions + excluded.transactions,
+            quantity = quantity + excluded.quantity,
+            amount = amount + excluded.amount,
+            profit = profit + excluded.profit
+    '''
+
+    # Tables holding money, as created by migration 5: (DDL with a {name} slot, money columns)
+    CENTS_TABLES = {
+        "meals": ('''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT NOT NULL,
+                name TEXT NOT NULL,
+                description TEXT,
+                buying_price INTEGER NOT NULL CHECK(buying_price >= 0),
+                selling_price INTEGER NOT NULL CHECK(selling_price >= buying_price),
+                current_stock INTEGER DEFAULT 0 CHECK(current_stock >= 0),
+                total_sold INTEGER DEFAULT 0 CHECK(total_sold >= 0),
+                total_revenue INTEGER DEFAULT 0 CHECK(total_revenue >= 0),
+                total_profit INTEGER DEFAULT 0,
+                last_updated TEXT,
+                is_active BOOLEAN DEFAULT 1,
+                UNIQUE(category, name)
+            )
+        ''', ("buying_price", "selling_price", "total_revenue", "total_profit")),
+        "sales": ('''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT NOT NULL,
+                date TEXT NOT NULL,
+                time TEXT NOT NULL,
+                customer_name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                quantity INTEGER NOT NULL CHECK(quantity > 0),
+                buying_price INTEGER NOT NULL CHECK(buying_price >= 0),
+                selling_price INTEGER NOT NULL CHECK(selling_price >= buying_price),
+                amount INTEGER NOT NULL CHECK(amount >= 0),
+                profit INTEGER NOT NULL,
+                payment_method TEXT NOT NULL,
+                payment_details TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''', ("buying_price", "selling_price", "amount", "profit")),
+        "daily_summaries": ('''
+            CREATE TABLE {name} (
+                date TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                total_sales INTEGER NOT NULL CHECK(total_sales >= 0),
+                cash_sales INTEGER DEFAULT 0 CHECK(cash_sales >= 0),
+                mpesa_sales INTEGER DEFAULT 0 CHECK(mpesa_sales >= 0),
+                card_sales INTEGER DEFAULT 0 CHECK(card_sales >= 0),
+                other_sales INTEGER DEFAULT 0 CHECK(other_sales >= 0),
+                items_sold INTEGER DEFAULT 0 CHECK(items_sold >= 0),
+                total_profit INTEGER DEFAULT 0,
+                most_sold_item TEXT,
+                most_sold_category TEXT,
+                avg_profit_margin REAL
+            )
+        ''', ("total_sales", "cash_sales", "mpesa_sales", "card_sales", "other_sales", "total_profit")),
+        "stock_history": ('''
+            CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                time TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                change_type TEXT NOT NULL CHECK(change_type IN ('add', 'remove', 'sale', 'adjust')),
+                quantity INTEGER NOT NULL CHECK(quantity > 0),
+                previous_stock INTEGER NOT NULL CHECK(previous_stock >= 0),
+                new_stock INTEGER NOT NULL CHECK(new_stock >= 0),
+                buying_price INTEGER NOT NULL CHECK(buying_price >= 0),
+                selling_price INTEGER NOT NULL CHECK(selling_price >= 0),
+                user TEXT NOT NULL,
+                notes TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (category, item_name) REFERENCES meals(category, name)
+            )
+        ''', ("buying_price", "selling_price")),
+        "daily_item_totals": ('''
+            CREATE TABLE {name} (
+                date TEXT NOT NULL,
+                category TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                amount INTEGER NOT NULL DEFAULT 0,
+                profit INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, category, meal)
+            )
+        ''', ("amount", "profit")),
+    }
+
     def initialize_database(self):
-        """Initialize all database tables with proper structure and constraints"""
+        """Bring the schema up to date by running any pending migrations"""
+        self.migration_report = self.migrate()
+
+    def migrate(self):
+        """Apply pending migrations in one transaction; returns [(version, description, seconds)]"""
+        latest = self.MIGRATIONS[-1][0]
+        writer = self.pool.writer
+        current = writer.execute("PRAGMA user_version").fetchone()[0]
+        if current == latest:
+            return []
+        if current > latest:
+            print(f"Database schema version {current} is newer than this application ({latest})")
+            return []
+
+        report = []
+        with self.pool.transaction() as cursor:
+            for version, description in self.MIGRATIONS:
+                if version <= current:
+                    continue
+                started = time.perf_counter()
+                getattr(self, f"_migrate_{version}")(cursor)
+                report.append((version, description, time.perf_counter() - started))
+            # user_version is part of the database header, so it commits with the migrations
+            cursor.execute(f"PRAGMA user_version = {latest}")
+        for version, description, seconds in report:
+            print(f"Migration {version} ({description}): {seconds * 1000:.1f} ms")
+        return report
+
+    def _migrate_1(self, cursor):
+        """Base tables; IF NOT EXISTS because databases from before versioning already have them"""
         # Sales table with proper constraints
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS meals (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 category TEXT NOT NULL,
@@ -125,7 +1277,7 @@ class DatabaseManager:
             )
         ''')
 
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS sales (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user TEXT NOT NULL,
@@ -145,7 +1297,7 @@ class DatabaseManager:
             )
         ''')
 
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS daily_summaries (
                 date TEXT PRIMARY KEY,
                 user TEXT NOT NULL,
@@ -163,7 +1315,7 @@ class DatabaseManager:
         ''')
 
         # Stock history table with proper constraints
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS stock_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 date TEXT NOT NULL,
@@ -184,7 +1336,7 @@ class DatabaseManager:
         ''')
 
         # User activity log with proper constraints
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS user_activity (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user TEXT NOT NULL,
@@ -194,88 +1346,404 @@ class DatabaseManager:
             )
         ''')
 
-        # Create indexes for better performance
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_user ON sales(user)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_meals_category ON meals(category)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_history_date ON stock_history(date)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_user ON user_activity(user)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_meals_category ON meals(category)')
 
-        self.conn.commit()
+        # Seed the menu of a brand-new database
         self.initialize_default_meals()
 
+    def _migrate_2(self, cursor):
+        """Per-day item tally maintained by record_cart"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_item_totals'")
+        tally_exists = cursor.fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_item_totals (
+                date TEXT NOT NULL,
+                category TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                amount REAL NOT NULL DEFAULT 0,
+                profit REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, category, meal)
+            )
+        ''')
+        if not tally_exists:
+            # Backfill the tally from sales recorded before it existed
+            cursor.execute('''
+                INSERT INTO daily_item_totals (date, category, meal, quantity, amount, profit)
+                SELECT date, category, meal, SUM(quantity), SUM(amount), SUM(profit)
+                FROM sales
+                GROUP BY date, category, meal
+            ''')
+
+    def _migrate_3(self, cursor):
+        """Registry of months moved out to archive files"""
+        # One row per month moved out to an archive file by archive_month
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_partitions (
+                month TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                sales_rows INTEGER DEFAULT 0,
+                stock_history_rows INTEGER DEFAULT 0,
+                user_activity_rows INTEGER DEFAULT 0,
+                archived_at TEXT NOT NULL
+            )
+        ''')
+
+    def _migrate_4(self, cursor):
+        """Indexes checked by the query plan audit"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_date_user ON sales(date, user, amount, profit)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_date_meal ON sales(date, meal, quantity)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales(customer_name, date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_history_date_time ON stock_history(date, time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_timestamp ON user_activity(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_user_time ON user_activity(user, timestamp)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_user_activity_type_user
+            ON user_activity(activity_type, user, timestamp)
+        ''')
+        # Superseded by the composite indexes above; every sales filter on user
+        # also has a date range, and a lone user index made the planner walk all sales
+        cursor.execute('DROP INDEX IF EXISTS idx_sales_date')
+        cursor.execute('DROP INDEX IF EXISTS idx_sales_user')
+        cursor.execute('DROP INDEX IF EXISTS idx_stock_history_date')
+        cursor.execute('DROP INDEX IF EXISTS idx_user_activity_user')
+
+    def _migrate_5(self, cursor):
+        """Money columns become integer cents"""
+        for table, (ddl, money_columns) in self.CENTS_TABLES.items():
+            self._rebuild_in_cents(cursor, table, ddl, money_columns)
+
+        # Archived months hold the same columns; each file is converted in its own
+        # transaction and stamped so a re-run after a failed upgrade skips it
+        if os.path.isdir(ARCHIVE_DIR):
+            for filename in sorted(os.listdir(ARCHIVE_DIR)):
+                if not (filename.startswith("hotel_archive_") and filename.endswith(".db")):
+                    continue
+                archive = sqlite3.connect(os.path.join(ARCHIVE_DIR, filename), isolation_level=None)
+                try:
+                    if archive.execute("PRAGMA user_version").fetchone()[0] >= ARCHIVE_SCHEMA_VERSION:
+                        continue
+                    archive_cursor = archive.cursor()
+                    archive_cursor.execute("BEGIN IMMEDIATE")
+                    for table in ARCHIVED_TABLES:
+                        archive_cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+                        if archive_cursor.fetchone() and table in self.CENTS_TABLES:
+                            ddl, money_columns = self.CENTS_TABLES[table]
+                            self._rebuild_in_cents(archive_cursor, table, ddl, money_columns)
+                    archive_cursor.execute(f"PRAGMA user_version = {ARCHIVE_SCHEMA_VERSION}")
+                    archive_cursor.execute("COMMIT")
+                finally:
+                    archive.close()
+
+    def _migrate_6(self, cursor):
+        """Hourly sales rollup, backfilled from live and archived sales"""
+        # Clustered on the key so a date range is one contiguous read
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sales_hourly (
+                date TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                category TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                payment_method TEXT NOT NULL,
+                transactions INTEGER NOT NULL DEFAULT 0,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                amount INTEGER NOT NULL DEFAULT 0,
+                profit INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, hour, user, category, meal, payment_method)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("DELETE FROM sales_hourly")
+        everything = ("0000-01-01", "9999-12-31")
+        cursor.execute(self.HOURLY_ROLLUP_SELECT.format(source="main.sales"), everything)
+        cursor.executemany(self.HOURLY_ROLLUP_UPSERT, cursor.fetchall())
+
+        # ATTACH is not allowed inside the migration transaction, so archived
+        # months are read through their own connections
+        cursor.execute("SELECT file_path FROM archive_partitions ORDER BY month")
+        for (path,) in cursor.fetchall():
+            if not os.path.exists(path):
+                continue
+            archive = sqlite3.connect(path)
+            try:
+                rows = archive.execute(self.HOURLY_ROLLUP_SELECT.format(source="sales"), everything).fetchall()
+            finally:
+                archive.close()
+            cursor.executemany(self.HOURLY_ROLLUP_UPSERT, rows)
+
+        # Weekly demand was the only reader of this index; it now reads the rollup
+        cursor.execute('DROP INDEX IF EXISTS idx_sales_date_meal')
+
+    def _migrate_7(self, cursor):
+        """Index the per-user sales report pages seek on"""
+        # The user-level GROUP BYs that made a user index a bad plan now read sales_hourly
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_user_date_time ON sales(user, date, time)')
+
+    def _migrate_8(self, cursor):
+        """Watermarks and tombstones for the incremental export"""
+        # High-water marks of the last incremental export, one row per captured table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_watermarks (
+                table_name TEXT PRIMARY KEY,
+                last_rowid INTEGER NOT NULL DEFAULT 0,
+                last_updated TEXT NOT NULL DEFAULT '',
+                last_tombstone INTEGER NOT NULL DEFAULT 0,
+                exported_at TEXT NOT NULL
+            )
+        ''')
+        # Ids of deleted rows, kept until an incremental export has passed them on
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_tombstones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                deleted_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_export_tombstones_table ON export_tombstones(table_name, id)')
+
+    def _migrate_9(self, cursor):
+        """FTS5 search indexes, kept in sync by triggers and built for archived months too"""
+        for table in self.SEARCH_INDEXES:
+            self._create_search_index(cursor, table)
+            columns = self.SEARCH_INDEXES[table]
+            new = ", ".join(f"new.{column}" for column in columns)
+            old = ", ".join(f"old.{column}" for column in columns)
+            listed = ", ".join(columns)
+            # External-content index: removals have to hand back the old values
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts (rowid, {listed}) VALUES (new.id, {new});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {listed} ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old});
+                    INSERT INTO {table}_fts (rowid, {listed}) VALUES (new.id, {new});
+                END
+            ''')
+
+        # Archive files are never written after archiving, so they get a plain
+        # index built once through their own connections
+        cursor.execute("SELECT file_path FROM archive_partitions ORDER BY month")
+        for (path,) in cursor.fetchall():
+            if not os.path.exists(path):
+                continue
+            archive = sqlite3.connect(path)
+            try:
+                for table in self.SEARCH_INDEXES:
+                    if archive.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                       (table,)).fetchone():
+                        self._create_search_index(archive.cursor(), table)
+                archive.commit()
+            finally:
+                archive.close()
+
+    def _migrate_10(self, cursor):
+        """Row counts kept by triggers, so the status panel never counts a table"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_row_counts (
+                table_name TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        ''')
+        for table in self.COUNTED_TABLES:
+            self._count_rows(cursor, table)
+
+    @staticmethod
+    def _count_rows(cursor, table):
+        """Seed the row count of a table and keep it current with insert and delete triggers"""
+        cursor.execute(f'''
+            INSERT INTO table_row_counts (table_name, row_count)
+            SELECT ?, COUNT(*) FROM {table} WHERE 1
+            ON CONFLICT(table_name) DO UPDATE SET row_count = excluded.row_count
+        ''', (table,))
+        for event, change in (("INSERT", "+ 1"), ("DELETE", "- 1")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_count_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE table_row_counts SET row_count = row_count {change} WHERE table_name = '{table}';
+                END
+            ''')
+
+    @classmethod
+    def _create_search_index(cls, cursor, table, schema="main"):
+        """Create the FTS5 index of a table in schema and fill it from the table's rows"""
+        columns = ", ".join(cls.SEARCH_INDEXES[table])
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.{table}_fts
+            USING fts5({columns}, content='{table}', content_rowid='id')
+        ''')
+        cursor.execute(f"INSERT INTO {schema}.{table}_fts ({table}_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def _rebuild_in_cents(cursor, table, ddl, money_columns):
+        """Recreate table from ddl, copying rows with money_columns multiplied into whole cents"""
+        cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name=? AND type='index' AND sql IS NOT NULL",
+                       (table,))
+        indexes = [row[0] for row in cursor.fetchall()]
+        sequence = None
+        if "AUTOINCREMENT" in ddl:
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,))
+            sequence = cursor.fetchone()
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+
+        cursor.execute(ddl.format(name=f"{table}_cents"))
+        values = ", ".join(f"CAST(ROUND({column} * 100) AS INTEGER)" if column in money_columns else column
+                           for column in columns)
+        cursor.execute(f"INSERT INTO {table}_cents ({', '.join(columns)}) SELECT {values} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_cents RENAME TO {table}")
+        for sql in indexes:
+            cursor.execute(sql)
+        if sequence:
+            # Keep AUTOINCREMENT from reusing ids of rows deleted before the rebuild
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name=?", (sequence[0], table))
+
     def initialize_default_meals(self):
         """Initialize with default meals if table is empty"""
         try:
-            self.cursor.execute("SELECT COUNT(*) FROM meals")
-            if self.cursor.fetchone()[0] == 0:
-                default_meals = [
-                    ("Cold Drinks", "Soda", "Carbonated soft drink", 40, 60, 100),
-                    ("Cold Drinks", "Water", "Bottled water", 30, 50, 100),
-                    ("Cold Drinks", "Juice", "Fruit juice", 30, 40, 100),
-                    ("Hot Drinks", "Coffee", "Black coffee", 20, 30, 100),
-                    ("Hot Drinks", "Milk", "Hot milk", 15, 25, 100),
-                    ("Food", "Matooke", "Steamed bananas", 50, 80, 100),
-                    ("Food", "Rice", "Steamed rice", 45, 70, 100),
-                    ("Sauce", "Meat", "Beef stew", 150, 200, 100),
-                    ("Sauce", "Beans", "Stewed beans", 25, 35, 100)
-                ]
+            with self.pool.transaction() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM meals")
+                if cursor.fetchone()[0] == 0:
+                    # Prices in shillings: this only runs from migration 1, and migration 5 converts them to cents
+                    default_meals = [
+                        ("Cold Drinks", "Soda", "Carbonated soft drink", 40, 60, 100),
+                        ("Cold Drinks", "Water", "Bottled water", 30, 50, 100),
+                        ("Cold Drinks", "Juice", "Fruit juice", 30, 40, 100),
+                        ("Hot Drinks", "Coffee", "Black coffee", 20, 30, 100),
+                        ("Hot Drinks", "Milk", "Hot milk", 15, 25, 100),
+                        ("Food", "Matooke", "Steamed bananas", 50, 80, 100),
+                        ("Food", "Rice", "Steamed rice", 45, 70, 100),
+                        ("Sauce", "Meat", "Beef stew", 150, 200, 100),
+                        ("Sauce", "Beans", "Stewed beans", 25, 35, 100)
+                    ]
 
-                self.cursor.executemany(
-                    "INSERT INTO meals (category, name, description, buying_price, selling_price, current_stock) VALUES (?, ?, ?, ?, ?, ?)",
-                    default_meals
-                )
-                self.conn.commit()
+                    cursor.executemany(
+                        "INSERT INTO meals (category, name, description, buying_price, selling_price, current_stock) VALUES (?, ?, ?, ?, ?, ?)",
+                        default_meals
+                    )
         except sqlite3.Error as e:
             print(f"Error initializing default meals: {str(e)}")
-            self.conn.rollback()
 
     def record_sale(self, sale_data):
-        """Record a sale in the database with proper transaction handling"""
-        try:
-            with self.conn:
-            # First check if we have enough stock
-                self.cursor.execute('''
-                    SELECT current_stock, buying_price, selling_price FROM meals 
-                    WHERE category=? AND name=? AND is_active=1
-                ''', (sale_data['category'], sale_data['meal']))
+        """Record a single sale line (a one-item cart)"""
+        return self.record_cart([sale_data])
 
-                result = self.cursor.fetchone()
-                if not result:
-                    return False, "Item not found or not active"
+    def record_cart(self, cart):
+        """Record every line of a receipt in one transaction, or none of them
 
-                current_stock, buying_price, selling_price = result
+        Each line carries 'price' and 'amount' in integer cents, like every money
+        value DatabaseManager takes or returns.
+        """
+        if not cart:
+            return False, "No items to record"
+        try:
+            with self.pool.transaction() as cursor:
+                # Check stock for every item in the cart with a single query
+                items = list(dict.fromkeys((sale['category'], sale['meal']) for sale in cart))
+                placeholders = ", ".join(["(?, ?)"] * len(items))
+                cursor.execute(f'''
+                    SELECT category, name, current_stock, buying_price FROM meals
+                    WHERE is_active=1 AND (category, name) IN (VALUES {placeholders})
+                ''', [value for item in items for value in item])
+                stock = {(category, name): [current_stock, buying_price]
+                         for category, name, current_stock, buying_price in cursor.fetchall()}
+
+                requested = {}
+                for sale in cart:
+                    key = (sale['category'], sale['meal'])
+                    requested[key] = requested.get(key, 0) + sale['quantity']
+                for key, quantity in requested.items():
+                    if key not in stock:
+                        return False, f"Item not found or not active: {key[1]}"
+                    if stock[key][0] < quantity:
+                        return False, f"Not enough stock for {key[1]}. Only {stock[key][0]} available"
+
+                sales_rows = []
+                meal_updates = {}
+                day_totals = {}
+                hourly = {}
+                history_rows = []
+                activity_rows = []
+                summaries = {}
+                for sale in cart:
+                    key = (sale['category'], sale['meal'])
+                    previous_stock, buying_price = stock[key]
+                    new_stock = previous_stock - sale['quantity']
+                    stock[key][0] = new_stock
+
+                    # Calculate profit
+                    profit = (sale['price'] - buying_price) * sale['quantity']
+
+                    sales_rows.append((
+                        sale['user'], sale['date'], sale['time'], sale['customer_name'],
+                        sale['category'], sale['meal'], sale['quantity'], buying_price,
+                        sale['price'], sale['amount'], profit,
+                        sale['payment_method'], sale['payment_details']
+                    ))
 
-                if current_stock < sale_data['quantity']:
-                    return False, f"Not enough stock. Only {current_stock} available"
+                    totals = meal_updates.setdefault(key, [0, 0, 0])
+                    totals[0] += sale['quantity']
+                    totals[1] += sale['amount']
+                    totals[2] += profit
+
+                    tally = day_totals.setdefault((sale['date'],) + key, [0, 0, 0])
+                    tally[0] += sale['quantity']
+                    tally[1] += sale['amount']
+                    tally[2] += profit
+
+                    bucket = hourly.setdefault((
+                        sale['date'], int(sale['time'][:2]), sale['user'],
+                        sale['category'], sale['meal'], sale['payment_method']
+                    ), [0, 0, 0, 0])
+                    bucket[0] += 1
+                    bucket[1] += sale['quantity']
+                    bucket[2] += sale['amount']
+                    bucket[3] += profit
+
+                    history_rows.append((
+                        sale['date'], sale['time'], sale['meal'], sale['category'], 'sale',
+                        sale['quantity'], previous_stock, new_stock, buying_price,
+                        sale['price'], sale['user'], f"Sold to {sale['customer_name']}"
+                    ))
 
-            # Calculate profit
-                profit = (sale_data['price'] - buying_price) * sale_data['quantity']
+                    activity_rows.append((
+                        sale['user'],
+                        'sale',
+                        f"Sold {sale['quantity']} {sale['meal']} to {sale['customer_name']} for Ksh{format_money(sale['amount'])}"
+                    ))
 
-            # Record the individual sale
-                self.cursor.execute('''
+                    # One summary update per date and payment method, not per line
+                    summary_key = (sale['date'], sale['payment_method'])
+                    summary = summaries.setdefault(summary_key, {
+                        'user': sale['user'],
+                        'date': sale['date'],
+                        'category': sale['category'],
+                        'meal': sale['meal'],
+                        'quantity': 0,
+                        'amount': 0,
+                        'profit': 0,
+                        'payment_method': sale['payment_method']
+                    })
+                    summary['quantity'] += sale['quantity']
+                    summary['amount'] += sale['amount']
+                    summary['profit'] += profit
+
+                cursor.executemany('''
                     INSERT INTO sales 
                     (user, date, time, customer_name, category, meal, quantity, 
                     buying_price, selling_price, amount, profit, payment_method, payment_details) 
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    sale_data['user'],
-                    sale_data['date'],
-                    sale_data['time'],
-                    sale_data['customer_name'],
-                    sale_data['category'],
-                    sale_data['meal'],
-                    sale_data['quantity'],
-                    buying_price,
-                    sale_data['price'],
-                    sale_data['amount'],
-                    profit,
-                    sale_data['payment_method'],
-                    sale_data['payment_details']
-                ))
+                ''', sales_rows)
 
-            # Update meal stock and sales metrics - THIS IS THE CRITICAL PART
-                self.cursor.execute('''
+                # Update meal stock and sales metrics once per distinct item
+                cursor.executemany('''
                     UPDATE meals 
                     SET current_stock = current_stock - ?,
                         total_sold = total_sold + ?,
@@ -283,50 +1751,46 @@ class DatabaseManager:
                         total_profit = total_profit + ?,
                         last_updated = datetime('now')
                     WHERE category=? AND name=? AND is_active=1
-                ''', (
-                    sale_data['quantity'],
-                    sale_data['quantity'],
-                    sale_data['amount'],
-                    profit,
-                    sale_data['category'],
-                    sale_data['meal']
-                ))
-
-            # Record in stock history
-                self.cursor.execute('''
+                ''', [
+                    (quantity, quantity, amount, profit, category, name)
+                    for (category, name), (quantity, amount, profit) in meal_updates.items()
+                ])
+
+                # Keep the per-day item tally current so summaries never re-aggregate sales
+                cursor.executemany('''
+                    INSERT INTO daily_item_totals (date, category, meal, quantity, amount, profit)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(date, category, meal) DO UPDATE SET
+                        quantity = quantity + excluded.quantity,
+                        amount = amount + excluded.amount,
+                        profit = profit + excluded.profit
+                ''', [
+                    (date, category, meal, quantity, amount, profit)
+                    for (date, category, meal), (quantity, amount, profit) in day_totals.items()
+                ])
+
+                # And the hourly rollup every dashboard reads
+                cursor.executemany(self.HOURLY_ROLLUP_UPSERT, [key + tuple(totals) for key, totals in hourly.items()])
+
+                cursor.executemany('''
                     INSERT INTO stock_history 
                     (date, time, item_name, category, change_type, quantity, 
                      previous_stock, new_stock, buying_price, selling_price, user, notes)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    sale_data['date'],
-                    sale_data['time'],
-                    sale_data['meal'],
-                    sale_data['category'],
-                    'sale',
-                    sale_data['quantity'],
-                    current_stock,
-                    current_stock - sale_data['quantity'],
-                    buying_price,
-                    sale_data['price'],
-                    sale_data['user'],
-                    f"Sold to {sale_data['customer_name']}"
-                ))
-
-            # Record user activity
-                self.cursor.execute('''
-                    INSERT INTO user_activity 
-                    (user, activity_type, description)
-                    VALUES (?, ?, ?)
-                ''', (
-                    sale_data['user'],
-                    'sale',
-                    f"Sold {sale_data['quantity']} {sale_data['meal']} to {sale_data['customer_name']} for Ksh{sale_data['amount']:.2f}"
-                ))
-
-            # Update or create daily summary
-                self.update_daily_summary(sale_data, profit)
-
+                ''', history_rows)
+
+                for summary in summaries.values():
+                    self.update_daily_summary(summary, summary['profit'])
+
+            self.catalog.adjust_stock({key: -totals[0] for key, totals in meal_updates.items()})
+            # Logged once the sale has committed, outside its transaction
+            for row in activity_rows:
+                self.activity.log(*row)
+            self.publish(
+                SaleRecorded(sorted({sale['date'] for sale in cart}),
+                             {key: totals[0] for key, totals in meal_updates.items()}),
+                StockChanged({key: self.catalog.stock(*key) for key in meal_updates})
+            )
             return True, "Sale recorded successfully"
         except sqlite3.Error as e:
             return False, f"Database error: {str(e)}"
@@ -337,99 +1801,97 @@ class DatabaseManager:
         """Update the daily summary with proper transaction handling"""
         date = sale_data['date']
         amount = sale_data['amount']
-        payment_method = sale_data['payment_method'].lower()
+        column = PAYMENT_SUMMARY_COLUMNS.get(sale_data['payment_method'].lower(), "other_sales")
         item = sale_data['meal']
         category = sale_data['category']
 
-        try:
-            with self.conn:
-                # Check if summary exists for this date
-                self.cursor.execute("SELECT 1 FROM daily_summaries WHERE date=?", (date,))
-                exists = self.cursor.fetchone()
-
-                # Get most sold item and category for the day
-                self.cursor.execute('''
-                    SELECT meal, category, SUM(quantity) as total_qty
-                    FROM sales 
-                    WHERE date=?
-                    GROUP BY meal, category
-                    ORDER BY total_qty DESC
-                    LIMIT 1
-                ''', (date,))
-                top_item = self.cursor.fetchone()
-                most_sold_item = top_item[0] if top_item else item
-                most_sold_category = top_item[1] if top_item else category
-
-                user = sale_data.get('user', 'system')
-                if exists:
-                    # Update existing summary
-                    self.cursor.execute(f'''
-                        UPDATE daily_summaries 
-                        SET total_sales = total_sales + ?,
-                            items_sold = items_sold + ?,
-                            total_profit = total_profit + ?,
-                            {payment_method}_sales = {payment_method}_sales + ?,
-                            most_sold_item = ?,
-                            most_sold_category = ?,
-                            avg_profit_margin = (total_profit + ?) / (total_sales + ?) * 100,
-                            user = ?
-                        WHERE date = ?
-                    ''', (
-                        amount,
-                        sale_data['quantity'],
-                        profit,
-                        amount,
-                        most_sold_item,
-                        most_sold_category,
-                        profit,
-                        amount,
-                        user,
-                        date
-                    ))
-                else:
-                    # Create new summary
-                    self.cursor.execute(f'''
-                        INSERT INTO daily_summaries 
-                        (date, user, total_sales, items_sold, total_profit, {payment_method}_sales,
-                         most_sold_item, most_sold_category, avg_profit_margin)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        date,
-                        user,
-                        amount,
-                        sale_data['quantity'],
-                        profit,
-                        amount,
-                        most_sold_item,
-                        most_sold_category,
-                        (profit / amount * 100) if amount > 0 else 0
-                    ))
-        except sqlite3.Error as e:
-            print(f"Error updating daily summary: {str(e)}")
+        # Errors propagate so the cart this summary belongs to rolls back with it
+        with self.pool.transaction() as cursor:
+            # Check if summary exists for this date
+            cursor.execute("SELECT 1 FROM daily_summaries WHERE date=?", (date,))
+            exists = cursor.fetchone()
+
+            # Get most sold item and category for the day from the running tally
+            cursor.execute('''
+                SELECT meal, category, quantity
+                FROM daily_item_totals
+                WHERE date=?
+                ORDER BY quantity DESC
+                LIMIT 1
+            ''', (date,))
+            top_item = cursor.fetchone()
+            most_sold_item = top_item[0] if top_item else item
+            most_sold_category = top_item[1] if top_item else category
+
+            user = sale_data.get('user', 'system')
+            if exists:
+                # Update existing summary
+                cursor.execute(f'''
+                    UPDATE daily_summaries 
+                    SET total_sales = total_sales + ?,
+                        items_sold = items_sold + ?,
+                        total_profit = total_profit + ?,
+                        {column} = {column} + ?,
+                        most_sold_item = ?,
+                        most_sold_category = ?,
+                        avg_profit_margin = (total_profit + ?) * 100.0 / (total_sales + ?),
+                        user = ?
+                    WHERE date = ?
+                ''', (
+                    amount,
+                    sale_data['quantity'],
+                    profit,
+                    amount,
+                    most_sold_item,
+                    most_sold_category,
+                    profit,
+                    amount,
+                    user,
+                    date
+                ))
+            else:
+                # Create new summary
+                cursor.execute(f'''
+                    INSERT INTO daily_summaries 
+                    (date, user, total_sales, items_sold, total_profit, {column},
+                     most_sold_item, most_sold_category, avg_profit_margin)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    date,
+                    user,
+                    amount,
+                    sale_data['quantity'],
+                    profit,
+                    amount,
+                    most_sold_item,
+                    most_sold_category,
+                    (profit / amount * 100) if amount > 0 else 0
+                ))
 
+    @reporting
     def get_daily_sales(self, date, user=None):
         """Get detailed sales summary for a specific date with correct SQL syntax"""
         try:
             query = '''
                 SELECT 
-                    s.category, 
-                    s.meal, 
-                    SUM(s.quantity) as quantity_sum,
-                    SUM(s.amount) as amount_sum,
-                    s.payment_method,
-                    SUM(s.profit) as profit_sum,
-                    (SUM(s.profit)/SUM(s.amount))*100 as profit_margin
-                FROM sales s
-                WHERE s.date=?
+                    h.category, 
+                    h.meal, 
+                    SUM(h.quantity) as quantity_sum,
+                    SUM(h.amount) as amount_sum,
+                    h.payment_method,
+                    SUM(h.profit) as profit_sum,
+                    SUM(h.profit) * 100.0 / NULLIF(SUM(h.amount), 0) as profit_margin
+                FROM sales_hourly h
+                WHERE h.date=?
             '''
             params = [date]
 
             if user:
-                query += ' AND s.user=?'
+                query += ' AND h.user=?'
                 params.append(user)
 
             query += '''
-                GROUP BY s.category, s.meal, s.payment_method
+                GROUP BY h.category, h.meal, h.payment_method
              ORDER BY amount_sum DESC
             '''
 
@@ -439,6 +1901,7 @@ class DatabaseManager:
             print(f"Error getting daily sales: {str(e)}")
             return []
 
+    @reporting
     def get_daily_summary(self, date):
         """Get the enhanced daily summary record"""
         try:
@@ -452,86 +1915,161 @@ class DatabaseManager:
 
     def clear_daily_sales(self, date):
         """Clear all sales for a specific date with proper rollback of stock"""
+        success, message = self.void_sales(date, date, notes='Stock restored from cleared sales')
+        if not success:
+            print(f"Error clearing daily sales: {message}")
+        return success
+
+    def void_sales(self, start_date, end_date=None, user="system", notes="Stock restored from voided sales"):
+        """Void every sale between two dates (inclusive), restoring stock and meal totals"""
+        end_date = end_date or start_date
         try:
-            with self.conn:
-                # First get all sales for the day to restore stock
-                self.cursor.execute('''
-                    SELECT category, meal, quantity FROM sales WHERE date=?
-                ''', (date,))
-                sales = self.cursor.fetchall()
-
-                # Restore stock for each item sold
-                for category, meal, quantity in sales:
-                    self.cursor.execute('''
-                        UPDATE meals 
-                        SET current_stock = current_stock + ?,
-                            total_sold = total_sold - ?,
-                            total_revenue = total_revenue - (SELECT SUM(amount) FROM sales WHERE date=? AND category=? AND meal=?),
-                            total_profit = total_profit - (SELECT SUM(profit) FROM sales WHERE date=? AND category=? AND meal=?)
-                        WHERE category=? AND name=?
-                    ''', (
-                        quantity,
-                        quantity,
-                        date, category, meal,
-                        date, category, meal,
-                        category, meal
-                    ))
+            # Dates are compared as text, so anything but YYYY-MM-DD would void the wrong range
+            for date in (start_date, end_date):
+                if datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d') != date:
+                    raise ValueError(f"{date!r} is not YYYY-MM-DD")
+            with self.pool.transaction() as cursor:
+                # Sales in archived months live in their partition files, which this does
+                # not touch, so their rollups below must not be deleted either
+                cursor.execute("SELECT month FROM archive_partitions WHERE month BETWEEN ? AND ? ORDER BY month",
+                               (start_date[:7], end_date[:7]))
+                archived = [row[0] for row in cursor.fetchall()]
+                if archived:
+                    return False, f"Cannot void sales in archived months: {', '.join(archived)}"
+
+                # One aggregate row per item sold in the range
+                cursor.execute('DROP TABLE IF EXISTS temp.voided_sales')
+                cursor.execute('''
+                    CREATE TEMP TABLE voided_sales AS
+                    SELECT category, meal, SUM(quantity) AS quantity,
+                           SUM(amount) AS amount, SUM(profit) AS profit
+                    FROM sales
+                    WHERE date >= ? AND date <= ?
+                    GROUP BY category, meal
+                ''', (start_date, end_date))
+
+                # Restore stock and roll back the sales metrics in one statement
+                cursor.execute('''
+                    UPDATE meals
+                    SET current_stock = current_stock + v.quantity,
+                        total_sold = total_sold - v.quantity,
+                        total_revenue = total_revenue - v.amount,
+                        total_profit = total_profit - v.profit,
+                        last_updated = datetime('now')
+                    FROM temp.voided_sales AS v
+                    WHERE meals.category = v.category AND meals.name = v.meal
+                ''')
+                items_restored = cursor.rowcount
 
-                # Now delete the sales records
-                self.cursor.execute('DELETE FROM sales WHERE date=?', (date,))
-                self.cursor.execute('DELETE FROM daily_summaries WHERE date=?', (date,))
+                # Record the restored stock in history
+                cursor.execute('''
+                    INSERT INTO stock_history 
+                    (date, time, item_name, category, change_type, quantity, 
+                     previous_stock, new_stock, buying_price, selling_price, user, notes)
+                    SELECT ?, ?, v.meal, v.category, 'adjust', v.quantity,
+                           m.current_stock - v.quantity, m.current_stock,
+                           m.buying_price, m.selling_price, ?, ?
+                    FROM temp.voided_sales AS v
+                    JOIN meals AS m ON m.category = v.category AND m.name = v.meal
+                ''', (
+                    datetime.now().strftime('%Y-%m-%d'),
+                    datetime.now().strftime('%H:%M:%S'),
+                    user,
+                    notes
+                ))
 
-                # Record in stock history
-                for category, meal, quantity in sales:
-                    self.cursor.execute('''
-                        INSERT INTO stock_history 
-                        (date, time, item_name, category, change_type, quantity, 
-                         previous_stock, new_stock, buying_price, selling_price, user, notes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        datetime.now().strftime('%Y-%m-%d'),
-                        datetime.now().strftime('%H:%M:%S'),
-                        meal,
-                        category,
-                        'adjust',
-                        quantity,
-                        self.get_current_stock_for_item(category, meal),
-                        self.get_current_stock_for_item(category, meal) + quantity,
-                        self.get_buying_price(category, meal),
-                        self.get_selling_price(category, meal),
-                        'system',
-                        'Stock restored from cleared sales'
-                    ))
+                # Leave tombstones so the incremental export passes the deletes on
+                cursor.execute('''
+                    INSERT INTO export_tombstones (table_name, row_id, deleted_at)
+                    SELECT 'sales', id, datetime('now') FROM sales WHERE date >= ? AND date <= ?
+                ''', (start_date, end_date))
+
+                # Now delete the sales records and everything derived from them
+                cursor.execute('DELETE FROM sales WHERE date >= ? AND date <= ?', (start_date, end_date))
+                sales_voided = cursor.rowcount
+                cursor.execute('DELETE FROM daily_summaries WHERE date >= ? AND date <= ?', (start_date, end_date))
+                cursor.execute('DELETE FROM daily_item_totals WHERE date >= ? AND date <= ?', (start_date, end_date))
+                cursor.execute('DELETE FROM sales_hourly WHERE date >= ? AND date <= ?', (start_date, end_date))
+                cursor.execute('SELECT category, meal, quantity FROM temp.voided_sales')
+                restored = {(category, meal): quantity for category, meal, quantity in cursor.fetchall()}
+                cursor.execute('DROP TABLE temp.voided_sales')
+
+            self.catalog.adjust_stock(restored)
+            self.publish(DayCleared(start_date, end_date),
+                         StockChanged({key: self.catalog.stock(*key) for key in restored}))
+            return True, f"Voided {sales_voided} sales across {items_restored} items"
+        except ValueError as e:
+            return False, f"Invalid date: {str(e)}"
+        except sqlite3.Error as e:
+            return False, f"Database error: {str(e)}"
 
-                self.conn.commit()
-                return True
+    def rebuild_sales_hourly(self, start_date, end_date=None):
+        """Recompute the hourly rollup for a date range from sales, archived months included"""
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        try:
+            # Hold the write lock across the read so no sale lands between it and the swap
+            with self.pool.write_lock:
+                source = self.range_source('sales', start_date, end_date)
+                try:
+                    cursor = (self.range_connection(source) or self.conn).cursor()
+                    cursor.execute(self.HOURLY_ROLLUP_SELECT.format(source=source), (start_date, end_date))
+                    rows = cursor.fetchall()
+                finally:
+                    self.drop_range_source(source)
+                with self.pool.transaction() as cursor:
+                    cursor.execute('DELETE FROM sales_hourly WHERE date >= ? AND date <= ?', (start_date, end_date))
+                    cursor.executemany(self.HOURLY_ROLLUP_UPSERT, rows)
+            return True, f"Rebuilt {len(rows)} hourly rows from {start_date} to {end_date}"
         except Exception as e:
-            print(f"Error clearing daily sales: {str(e)}")
-            return False
+            print(f"Error rebuilding hourly sales: {str(e)}")
+            return False, str(e)
+
+    def purge_user_activity(self, older_than_days=30):
+        """Delete activity log entries older than a number of days; returns how many went"""
+        cutoff = f"-{int(older_than_days)} days"
+        with self.pool.transaction() as cursor:
+            # Leave tombstones so the incremental export passes the deletes on
+            cursor.execute('''
+                INSERT INTO export_tombstones (table_name, row_id, deleted_at)
+                SELECT 'user_activity', id, datetime('now') FROM user_activity WHERE timestamp < date('now', ?)
+            ''', (cutoff,))
+            cursor.execute("DELETE FROM user_activity WHERE timestamp < date('now', ?)", (cutoff,))
+            deleted = cursor.rowcount
+        self.publish(HistoryPurged('user_activity'))
+        return deleted
+
+    def purge_stock_history(self, older_than_months=None):
+        """Delete stock history older than a number of months, or all of it for None; returns how many went"""
+        with self.pool.transaction() as cursor:
+            if older_than_months is None:
+                cursor.execute("DELETE FROM stock_history")
+            else:
+                cursor.execute("DELETE FROM stock_history WHERE date < date('now', ?)",
+                               (f"-{int(older_than_months)} months",))
+            deleted = cursor.rowcount
+        self.publish(HistoryPurged('stock_history'))
+        return deleted
+
+    def optimize(self):
+        """VACUUM, ANALYZE and PRAGMA optimize on the writer connection"""
+        # VACUUM cannot run inside a transaction, so hold the write lock instead
+        with self.pool.write_lock:
+            writer = self.pool.writer
+            writer.execute("VACUUM")
+            writer.execute("ANALYZE")
+            writer.execute("PRAGMA optimize")
 
     def get_current_stock_for_item(self, category, name):
         """Get current stock level for a specific item"""
-        self.cursor.execute('''
-            SELECT current_stock FROM meals WHERE category=? AND name=?
-        ''', (category, name))
-        result = self.cursor.fetchone()
-        return result[0] if result else 0
+        return self.catalog.stock(category, name)
 
     def get_buying_price(self, category, name):
         """Get buying price for a specific item"""
-        self.cursor.execute('''
-            SELECT buying_price FROM meals WHERE category=? AND name=?
-        ''', (category, name))
-        result = self.cursor.fetchone()
-        return result[0] if result else 0
+        return self.catalog.buying_price(category, name)
 
     def get_selling_price(self, category, name):
         """Get selling price for a specific item"""
-        self.cursor.execute('''
-            SELECT selling_price FROM meals WHERE category=? AND name=?
-        ''', (category, name))
-        result = self.cursor.fetchone()
-        return result[0] if result else 0
+        return self.catalog.selling_price(category, name)
 
     def get_all_meals(self):
         """Get all active meals with full details from database"""
@@ -549,36 +2087,37 @@ class DatabaseManager:
             return []
 
     def add_meal(self, category, name, description, buying_price, selling_price, stock):
-        """Add a new meal to the database with full details"""
+        """Add a new meal to the database with full details (prices in cents)"""
         try:
-            self.cursor.execute('''
-                INSERT INTO meals 
-                (category, name, description, buying_price, selling_price, current_stock, last_updated) 
-                VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
-            ''', (category, name, description, buying_price, selling_price, stock))
+            with self.pool.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO meals 
+                    (category, name, description, buying_price, selling_price, current_stock, last_updated) 
+                    VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+                ''', (category, name, description, buying_price, selling_price, stock))
 
-            # Record in stock history
-            self.cursor.execute('''
-                INSERT INTO stock_history 
-                (date, time, item_name, category, change_type, quantity, 
-                 previous_stock, new_stock, buying_price, selling_price, user, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().strftime('%Y-%m-%d'),
-                datetime.now().strftime('%H:%M:%S'),
-                name,
-                category,
-                'add',
-                stock,
-                0,
-                stock,
-                buying_price,
-                selling_price,
-                'system',
-                'Initial stock addition'
-            ))
-
-            self.conn.commit()
+                # Record in stock history
+                cursor.execute('''
+                    INSERT INTO stock_history 
+                    (date, time, item_name, category, change_type, quantity, 
+                     previous_stock, new_stock, buying_price, selling_price, user, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    datetime.now().strftime('%Y-%m-%d'),
+                    datetime.now().strftime('%H:%M:%S'),
+                    name,
+                    category,
+                    'add',
+                    stock,
+                    0,
+                    stock,
+                    buying_price,
+                    selling_price,
+                    'system',
+                    'Initial stock addition'
+                ))
+            self.catalog.put(category, name, description, buying_price, selling_price, stock)
+            self.publish(MealAdded(category, name))
             return True
         except sqlite3.IntegrityError:
             print(f"Meal '{name}' already exists in category '{category}'")
@@ -590,192 +2129,189 @@ class DatabaseManager:
     def remove_meal(self, category, name):
         """Mark a meal as inactive (soft delete) with proper history"""
         try:
-            # First get current stock
-            current_stock = self.get_current_stock_for_item(category, name)
+            with self.pool.transaction() as cursor:
+                # First get current stock
+                current_stock = self.get_current_stock_for_item(category, name)
 
-            self.cursor.execute('''
-                UPDATE meals 
-                SET is_active = 0,
-                    last_updated = datetime('now')
-                WHERE category=? AND name=?
-            ''', (category, name))
-
-            if self.cursor.rowcount == 0:
-                print(f"No active meal found with name '{name}' in category '{category}'")
-                return False
+                cursor.execute('''
+                    UPDATE meals 
+                    SET is_active = 0,
+                        last_updated = datetime('now')
+                    WHERE category=? AND name=?
+                ''', (category, name))
 
-            # Record in stock history
-            self.cursor.execute('''
-                INSERT INTO stock_history 
-                (date, time, item_name, category, change_type, quantity, 
-                 previous_stock, new_stock, buying_price, selling_price, user, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().strftime('%Y-%m-%d'),
-                datetime.now().strftime('%H:%M:%S'),
-                name,
-                category,
-                'remove',
-                current_stock,
-                current_stock,
-                0,
-                self.get_buying_price(category, name),
-                self.get_selling_price(category, name),
-                'system',
-                'Item deactivated'
-            ))
-
-            self.conn.commit()
+                if cursor.rowcount == 0:
+                    print(f"No active meal found with name '{name}' in category '{category}'")
+                    return False
+
+                # Record in stock history
+                cursor.execute('''
+                    INSERT INTO stock_history 
+                    (date, time, item_name, category, change_type, quantity, 
+                     previous_stock, new_stock, buying_price, selling_price, user, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    datetime.now().strftime('%Y-%m-%d'),
+                    datetime.now().strftime('%H:%M:%S'),
+                    name,
+                    category,
+                    'remove',
+                    current_stock,
+                    current_stock,
+                    0,
+                    self.get_buying_price(category, name),
+                    self.get_selling_price(category, name),
+                    'system',
+                    'Item deactivated'
+                ))
+            self.catalog.update(category, name, is_active=False)
+            self.publish(MealRemoved(category, name))
             return True
         except Exception as e:
             print(f"Error removing meal: {str(e)}")
             return False
 
     def update_stock(self, category, name, quantity, buying_price=None, selling_price=None, user="system", notes=""):
-        """Update stock levels for an item with comprehensive tracking"""
+        """Update stock levels for an item with comprehensive tracking (prices in cents)"""
         try:
-            # First get current values
-            self.cursor.execute('''
-                SELECT current_stock, buying_price, selling_price FROM meals 
-                WHERE category=? AND name=? AND is_active=1
-            ''', (category, name))
-            result = self.cursor.fetchone()
-            if not result:
-                return False, "Item not found or not active"
+            with self.pool.transaction() as cursor:
+                # First get current values
+                cursor.execute('''
+                    SELECT current_stock, buying_price, selling_price FROM meals 
+                    WHERE category=? AND name=? AND is_active=1
+                ''', (category, name))
+                result = cursor.fetchone()
+                if not result:
+                    return False, "Item not found or not active"
 
-            current_stock, current_buying, current_selling = result
+                current_stock, current_buying, current_selling = result
 
-            # Use provided prices or current ones
-            buying_price = buying_price if buying_price is not None else current_buying
-            selling_price = selling_price if selling_price is not None else current_selling
+                # Use provided prices or current ones
+                buying_price = buying_price if buying_price is not None else current_buying
+                selling_price = selling_price if selling_price is not None else current_selling
 
-            # Calculate new stock
-            new_stock = current_stock + quantity
+                # Calculate new stock
+                new_stock = current_stock + quantity
 
-            # Update stock and prices
-            self.cursor.execute('''
-                UPDATE meals 
-                SET current_stock = ?,
-                    buying_price = ?,
-                    selling_price = ?,
-                    last_updated = datetime('now')
-                WHERE category=? AND name=? AND is_active=1
-            ''', (new_stock, buying_price, selling_price, category, name))
-
-            if self.cursor.rowcount == 0:
-                return False, "Item not found or not active"
-
-            # Determine change type
-            if quantity > 0:
-                change_type = "add"
-            elif quantity < 0:
-                change_type = "remove"
-            else:
-                change_type = "adjust"
+                # Update stock and prices
+                cursor.execute('''
+                    UPDATE meals 
+                    SET current_stock = ?,
+                        buying_price = ?,
+                        selling_price = ?,
+                        last_updated = datetime('now')
+                    WHERE category=? AND name=? AND is_active=1
+                ''', (new_stock, buying_price, selling_price, category, name))
 
-            # Record in stock history
-            self.cursor.execute('''
-                INSERT INTO stock_history 
-                (date, time, item_name, category, change_type, quantity, 
-                 previous_stock, new_stock, buying_price, selling_price, user, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().strftime('%Y-%m-%d'),
-                datetime.now().strftime('%H:%M:%S'),
-                name,
-                category,
-                change_type,
-                abs(quantity),
-                current_stock,
-                new_stock,
-                buying_price,
-                selling_price,
-                user,
-                notes
-            ))
+                if cursor.rowcount == 0:
+                    return False, "Item not found or not active"
 
-            # Record user activity if not system
-            if user != "system":
-                self.cursor.execute('''
-                    INSERT INTO user_activity 
-                    (user, activity_type, description)
-                    VALUES (?, ?, ?)
+                # Determine change type
+                if quantity > 0:
+                    change_type = "add"
+                elif quantity < 0:
+                    change_type = "remove"
+                else:
+                    change_type = "adjust"
+
+                # Record in stock history
+                cursor.execute('''
+                    INSERT INTO stock_history 
+                    (date, time, item_name, category, change_type, quantity, 
+                     previous_stock, new_stock, buying_price, selling_price, user, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
+                    datetime.now().strftime('%Y-%m-%d'),
+                    datetime.now().strftime('%H:%M:%S'),
+                    name,
+                    category,
+                    change_type,
+                    abs(quantity),
+                    current_stock,
+                    new_stock,
+                    buying_price,
+                    selling_price,
                     user,
-                    'stock_update',
-                    f"Updated stock for {name} by {quantity} units (new stock: {new_stock})"
+                    notes
                 ))
 
-            self.conn.commit()
+            self.catalog.update(category, name, current_stock=new_stock,
+                                buying_price=buying_price, selling_price=selling_price)
+            self.publish(StockChanged({(category, name): new_stock}))
+            # Record user activity if not system
+            if user != "system":
+                self.activity.log(user, 'stock_update',
+                                  f"Updated stock for {name} by {quantity} units (new stock: {new_stock})")
             return True, "Stock updated successfully"
         except Exception as e:
             print(f"Error updating stock: {str(e)}")
             return False, str(e)
 
+    def page_stock_history(self, days=30, item_filter=None, category_filter=None, page_size=PAGE_SIZE):
+        """KeysetCursor over stock history with filtering options, newest first"""
+        date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        where = "date >= ?"
+        params = [date_limit]
+
+        source = self.range_source('stock_history', date_limit)
+
+        # Add filters if provided. They match anywhere in the text ("ice" finds "Rice"),
+        # live and archived alike; ranked word search is search_stock_history's job.
+        for column, text in (("item_name", item_filter), ("category", category_filter)):
+            if text and text.strip():
+                where += f" AND {column} LIKE ?"
+                params.append(f"%{text}%")
+
+        return KeysetCursor(
+            self,
+            '''date, time, item_name, category, change_type, quantity,
+               previous_stock, new_stock, buying_price, selling_price, user, notes''',
+            source, where, params, page_size=page_size
+        )
+
+    @reporting
     def get_stock_history(self, days=30, item_filter=None, category_filter=None):
         """Get detailed stock history with filtering options"""
         try:
-            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            query = '''
-                SELECT date, time, item_name, category, change_type, quantity, 
-                       previous_stock, new_stock, buying_price, selling_price, user, notes
-                FROM stock_history
-                WHERE date >= ?
-            '''
-            params = [date_limit]
-
-            # Add filters if provided
-            if item_filter:
-                query += " AND item_name LIKE ?"
-                params.append(f"%{item_filter}%")
-            if category_filter:
-                query += " AND category LIKE ?"
-                params.append(f"%{category_filter}%")
-
-            query += " ORDER BY date DESC, time DESC"
-
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            pager = self.page_stock_history(days, item_filter, category_filter)
+            try:
+                return list(pager)
+            finally:
+                pager.close()
         except Exception as e:
             print(f"Error getting stock history: {str(e)}")
             return []
 
+    def page_current_stock(self, page_size=PAGE_SIZE):
+        """KeysetCursor over active meals with full details, by category and name"""
+        return KeysetCursor(
+            self,
+            '''category, name, description, buying_price, selling_price,
+               current_stock, total_sold, total_revenue, total_profit, last_updated''',
+            "meals", "is_active = 1", key=("category", "name"), descending=False, page_size=page_size
+        )
+
+    @reporting
     def get_current_stock(self):
         """Get current stock levels with full details"""
         try:
-            self.cursor.execute('''
-                SELECT category, name, description, buying_price, selling_price, 
-                       current_stock, total_sold, total_revenue, total_profit, last_updated
-                FROM meals 
-                WHERE is_active = 1
-                ORDER BY category, name
-            ''')
-            return self.cursor.fetchall()
+            return list(self.page_current_stock())
         except Exception as e:
             print(f"Error getting current stock: {str(e)}")
             return []
 
     def get_low_stock_items(self, threshold=10):
         """Get items with stock below threshold"""
-        try:
-            self.cursor.execute('''
-                SELECT category, name, current_stock 
-                FROM meals 
-                WHERE current_stock <= ? AND is_active = 1
-                ORDER BY current_stock ASC
-            ''', (threshold,))
-            return self.cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting low stock items: {str(e)}")
-            return []
+        return self.catalog.low_stock(threshold)
 
+    @reporting
     def get_top_selling_items(self, limit=5, days=30):
         """Get top selling items by quantity"""
         try:
             date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             self.cursor.execute('''
                 SELECT category, meal, SUM(quantity) as total_qty
-                FROM sales
+                FROM sales_hourly
                 WHERE date >= ?
                 GROUP BY category, meal
                 ORDER BY total_qty DESC
@@ -786,54 +2322,799 @@ class DatabaseManager:
             print(f"Error getting top selling items: {str(e)}")
             return []
 
+    def page_user_sales(self, user, days=30, page_size=PAGE_SIZE):
+        """KeysetCursor over one user's individual sales, newest first"""
+        date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        return KeysetCursor(
+            self,
+            '''date, time, customer_name, category, meal, quantity,
+               selling_price, amount, profit, payment_method''',
+            self.range_source('sales', date_limit), "user = ? AND date >= ?", (user, date_limit),
+            page_size=page_size
+        )
+
+    @reporting
     def get_user_sales_summary(self, user=None, days=30):
         """Get sales summary for a user or all users"""
         try:
             date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             if user:
                 self.cursor.execute('''
-                    SELECT user, COUNT(*) as sales_count, SUM(amount) as total_sales, 
-                    SUM(profit) as total_profit, (SUM(profit)/NULLIF(SUM(amount),0))*100 as avg_margin
-                    FROM sales
+                    SELECT user, SUM(transactions) as sales_count, SUM(amount) as total_sales, 
+                    SUM(profit) as total_profit, SUM(profit) * 100.0 / NULLIF(SUM(amount), 0) as avg_margin
+                    FROM sales_hourly
                     WHERE date >= ? AND user = ?
                     GROUP BY user
                 ''', (date_limit, user))
             else:
                 self.cursor.execute('''
-                    SELECT user, COUNT(*) as sales_count, SUM(amount) as total_sales, 
-                    SUM(profit) as total_profit, (SUM(profit)/NULLIF(SUM(amount),0))*100 as avg_margin
-                    FROM sales
+                    SELECT user, SUM(transactions) as sales_count, SUM(amount) as total_sales, 
+                    SUM(profit) as total_profit, SUM(profit) * 100.0 / NULLIF(SUM(amount), 0) as avg_margin
+                    FROM sales_hourly
                     WHERE date >= ?
                     GROUP BY user
                     ORDER BY total_sales DESC
                 ''', (date_limit,))
             return self.cursor.fetchall()
         except Exception as e:
-            print(f"Error getting user sales summary: {str(e)}")
+            print(f"Error getting user sales summary: {str(e)}")
+            return []
+
+    def page_user_activity(self, user=None, days=30, page_size=PAGE_SIZE):
+        """KeysetCursor over user activity logs, newest first"""
+        date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        source = self.range_source('user_activity', date_limit)
+        if user:
+            return KeysetCursor(self, "activity_type, description, timestamp", source,
+                                "timestamp >= ? AND user = ?", (date_limit, user),
+                                key=("timestamp", "id"), page_size=page_size)
+        return KeysetCursor(self, "user, activity_type, description, timestamp", source,
+                            "timestamp >= ?", (date_limit,), key=("timestamp", "id"), page_size=page_size)
+
+    @reporting
+    def get_user_activity(self, user=None, days=30):
+        """Get user activity logs"""
+        try:
+            pager = self.page_user_activity(user, days)
+            try:
+                return list(pager)
+            finally:
+                pager.close()
+        except Exception as e:
+            print(f"Error getting user activity: {str(e)}")
+            return []
+
+    # Full-text search
+
+    @staticmethod
+    def fts_query(text):
+        """FTS5 query for what a user typed: "quoted phrases" match as phrases, other words as prefixes
+
+        Every term has to match. Each one is quoted, so FTS5 operators in the
+        input are searched for rather than obeyed.
+        """
+        terms = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+            word = word.replace('"', '')
+            if phrase.strip():
+                terms.append(f'"{phrase}"')
+            elif word:
+                terms.append(f'"{word}"*')
+        return " ".join(terms) or '""'
+
+    def _search(self, table, columns, text, date_column, days, limit):
+        """Best-ranked matches for text in a table's search index, live and archived"""
+        query = self.fts_query(text)
+        where = f"{table}_fts MATCH ?"
+        params = [query]
+        if days is not None:
+            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+            where += f" AND t.{date_column} >= ?"
+            params.append(date_limit)
+        sql = f'''
+            SELECT {", ".join(f"t.{column}" for column in columns)}, bm25({table}_fts) AS rank
+            FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid
+            WHERE {where}
+            ORDER BY rank, t.{date_column} DESC
+            LIMIT ?
+        '''
+        params.append(limit)
+
+        matches = self.conn.execute(sql, params).fetchall()
+
+        # Each archived month has its own index; read them over separate read-only
+        # connections so nothing attached to the shared connection is disturbed
+        months = "" if days is None else params[1][:7]
+        self.cursor.execute("SELECT file_path FROM archive_partitions WHERE month >= ? ORDER BY month DESC",
+                            (months,))
+        for (path,) in self.cursor.fetchall():
+            if not os.path.exists(path):
+                continue
+            archive = sqlite3.connect(self.pool.read_only_uri(path), uri=True)
+            try:
+                matches.extend(archive.execute(sql, params).fetchall())
+            except sqlite3.OperationalError as e:
+                print(f"Error searching archive {path}: {str(e)}")
+            finally:
+                archive.close()
+
+        # bm25 is lower for better matches; scores from different files are comparable enough to merge
+        matches.sort(key=lambda row: row[-1])
+        return [row[:-1] for row in matches[:limit]]
+
+    @reporting
+    def search_stock_history(self, text, days=None, limit=100):
+        """Stock history entries whose item, category or notes match text, best match first"""
+        try:
+            return self._search(
+                "stock_history",
+                ("date", "time", "item_name", "category", "change_type", "quantity",
+                 "previous_stock", "new_stock", "buying_price", "selling_price", "user", "notes"),
+                text, "date", days, limit)
+        except Exception as e:
+            print(f"Error searching stock history: {str(e)}")
+            return []
+
+    @reporting
+    def search_user_activity(self, text, days=None, limit=100):
+        """Activity log entries whose description matches text, best match first"""
+        try:
+            return self._search("user_activity", ("user", "activity_type", "description", "timestamp"),
+                                text, "timestamp", days, limit)
+        except Exception as e:
+            print(f"Error searching user activity: {str(e)}")
+            return []
+
+    # Monthly archive partitions
+
+    @staticmethod
+    def _month_bounds(month):
+        """First day of a YYYY-MM month and of the month after it"""
+        year, mon = int(month[:4]), int(month[5:7])
+        next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+        return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
+
+    @staticmethod
+    def _archive_schema(month):
+        """Schema name an archive month is attached under"""
+        return "arch_" + month.replace('-', '_')
+
+    @staticmethod
+    def _table_columns(cursor, table, schema="main"):
+        cursor.execute(f"PRAGMA {schema}.table_info({table})")
+        return [row[1] for row in cursor.fetchall()]
+
+    def get_archive_partitions(self):
+        """List archived months with their file and row counts, oldest first"""
+        try:
+            self.cursor.execute('''
+                SELECT month, file_path, sales_rows, stock_history_rows, user_activity_rows, archived_at
+                FROM archive_partitions
+                ORDER BY month
+            ''')
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"Error getting archive partitions: {str(e)}")
             return []
 
-    def get_user_activity(self, user=None, days=30):
-        """Get user activity logs"""
+    def archive_month(self, month):
+        """Move one closed month of sales, stock history and user activity into its own archive file"""
+        start, end = self._month_bounds(month)
+        if end > datetime.now().strftime('%Y-%m-01'):
+            return False, f"{month} is not a closed month"
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(ARCHIVE_DIR, f"hotel_archive_{month.replace('-', '_')}.db")
+        schema = self._archive_schema(month)
         try:
-            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            if user:
-                self.cursor.execute('''
-                    SELECT activity_type, description, timestamp
-                    FROM user_activity
-                    WHERE date(timestamp) >= ? AND user = ?
-                    ORDER BY timestamp DESC
-                ''', (date_limit, user))
+            with self.pool.write_lock:
+                writer = self.pool.writer
+                # ATTACH is not allowed inside a transaction, so it wraps both phases
+                writer.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                try:
+                    # Phase 1: copy the month into the archive. The archive only becomes
+                    # visible to range queries once phase 2 registers it, so a crash in
+                    # between leaves the rows counted once, in the live database.
+                    with self.pool.transaction() as cursor:
+                        for table, column in ARCHIVED_TABLES.items():
+                            cursor.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?",
+                                           (table,))
+                            ddl = cursor.fetchone()[0]
+                            # Tables rebuilt by a migration have their name quoted in sqlite_master
+                            cursor.execute(re.sub(rf'^CREATE TABLE "?{table}"?',
+                                                  f"CREATE TABLE IF NOT EXISTS {schema}.{table}", ddl, count=1))
+                            cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{column} "
+                                           f"ON {table}({column})")
+                            columns = ", ".join(self._table_columns(cursor, table))
+                            # Ids are kept, so re-running after a crash does not duplicate rows
+                            cursor.execute(f'''
+                                INSERT OR IGNORE INTO {schema}.{table} ({columns})
+                                SELECT {columns} FROM main.{table}
+                                WHERE {column} >= ? AND {column} < ?
+                            ''', (start, end))
+                        for table in self.SEARCH_INDEXES:
+                            self._create_search_index(cursor, table, schema)
+                        cursor.execute(f"PRAGMA {schema}.user_version = {ARCHIVE_SCHEMA_VERSION}")
+
+                    # Phase 2: drop the month from the live tables and register the partition
+                    with self.pool.transaction() as cursor:
+                        counts = {}
+                        for table, column in ARCHIVED_TABLES.items():
+                            cursor.execute(f"DELETE FROM main.{table} WHERE {column} >= ? AND {column} < ?",
+                                           (start, end))
+                            counts[table] = cursor.rowcount
+                        cursor.execute('''
+                            INSERT INTO archive_partitions
+                                (month, file_path, sales_rows, stock_history_rows, user_activity_rows, archived_at)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(month) DO UPDATE SET
+                                file_path = excluded.file_path,
+                                sales_rows = sales_rows + excluded.sales_rows,
+                                stock_history_rows = stock_history_rows + excluded.stock_history_rows,
+                                user_activity_rows = user_activity_rows + excluded.user_activity_rows,
+                                archived_at = excluded.archived_at
+                        ''', (month, path, counts['sales'], counts['stock_history'], counts['user_activity'],
+                              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                finally:
+                    writer.execute(f"DETACH DATABASE {schema}")
+            return True, f"Archived {month}: {sum(counts.values())} rows"
+        except Exception as e:
+            print(f"Error archiving {month}: {str(e)}")
+            return False, str(e)
+
+    def archive_closed_months(self, keep_months=ARCHIVE_KEEP_MONTHS):
+        """Archive every month older than the newest keep_months; returns the months moved"""
+        now = datetime.now()
+        index = now.year * 12 + now.month - 1 - (max(keep_months, 1) - 1)
+        cutoff = f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+        months = set()
+        for table, column in ARCHIVED_TABLES.items():
+            self.cursor.execute(f"SELECT DISTINCT substr({column}, 1, 7) FROM {table} WHERE {column} < ?",
+                                (cutoff,))
+            months.update(row[0] for row in self.cursor.fetchall())
+
+        archived = []
+        for month in sorted(months):
+            success, _ = self.archive_month(month)
+            if success:
+                archived.append(month)
+        return archived
+
+    def range_source(self, table, start_date, end_date=None):
+        """Name to select from for table rows between two dates, live and archived
+
+        Only the archive months overlapping the range are attached. The result is
+        the table itself when nothing in the range has been archived; otherwise it
+        is a temp view or table under a name of its own, readable only through
+        range_connection(name) and kept until drop_range_source(name). Inside a
+        snapshot it is made on the snapshot connection from the months already
+        attached there; otherwise on a read connection of its own, so attaching
+        the months it needs never detaches those another open range reads.
+        """
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        cursor = self.cursor
+        cursor.execute("SELECT month, file_path FROM archive_partitions WHERE month BETWEEN ? AND ? ORDER BY month",
+                       (start_date[:7], end_date[:7]))
+        partitions = cursor.fetchall()
+        if not partitions:
+            return table
+
+        column = ARCHIVED_TABLES[table]
+        columns = ", ".join(self._table_columns(cursor, table))
+        source = f"{table}_range_{next(self._range_ids)}"
+        wanted = {self._archive_schema(month): path for month, path in partitions}
+
+        if self.pool.in_snapshot():
+            conn = self.conn
+            cursor.execute("PRAGMA database_list")
+            attached = {row[1] for row in cursor.fetchall() if row[1].startswith("arch_")}
+            if set(wanted) <= attached:
+                selects = [f"SELECT {columns} FROM main.{table}"]
+                selects += [f"SELECT {columns} FROM {name}.{table}" for name in wanted]
+                cursor.execute(f"CREATE TEMP VIEW {source} AS " + " UNION ALL ".join(selects))
+                self.range_sources[source] = (conn, set(wanted), False)
+                return source
+            self.range_sources[source] = (conn, set(), False)
+            # Months older than the ones attached up front are copied in through
+            # their own connections, as nothing can be attached mid-snapshot
+            end_exclusive = (datetime.strptime(end_date[:10], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+            select = f"SELECT {columns} FROM {{schema}}{table} WHERE {column} >= ? AND {column} < ?"
+            cursor.execute(f"CREATE TEMP TABLE {source} AS " + select.format(schema="main."),
+                           (start_date, end_exclusive))
+            insert = f"INSERT INTO temp.{source} ({columns}) "
+            for name, path in wanted.items():
+                if name in attached:
+                    cursor.execute(insert + select.format(schema=f"{name}."), (start_date, end_exclusive))
+                    continue
+                archive = sqlite3.connect(self.pool.read_only_uri(path), uri=True)
+                try:
+                    rows = archive.execute(select.format(schema=""), (start_date, end_exclusive))
+                    placeholders = ", ".join("?" * len(columns.split(", ")))
+                    for batch in iter(lambda: rows.fetchmany(EXPORT_BATCH_SIZE), []):
+                        cursor.executemany(insert + f"VALUES ({placeholders})", batch)
+                finally:
+                    archive.close()
+            return source
+
+        conn = self.pool.open_reader()
+        cursor = conn.cursor()
+        attached = set()
+        self.range_sources[source] = (conn, set(wanted), True)
+
+        def attach(schemas):
+            for name in attached - set(schemas):
+                cursor.execute(f"DETACH DATABASE {name}")
+                attached.discard(name)
+            for name in schemas:
+                if name not in attached:
+                    cursor.execute(f"ATTACH DATABASE ? AS {name}", (self.pool.read_only_uri(wanted[name]),))
+                    attached.add(name)
+
+        try:
+            if len(wanted) <= MAX_ATTACHED_PARTITIONS:
+                attach(list(wanted))
+                selects = [f"SELECT {columns} FROM main.{table}"]
+                selects += [f"SELECT {columns} FROM {name}.{table}" for name in wanted]
+                cursor.execute(f"CREATE TEMP VIEW {source} AS " + " UNION ALL ".join(selects))
             else:
-                self.cursor.execute('''
-                    SELECT user, activity_type, description, timestamp
-                    FROM user_activity
-                    WHERE date(timestamp) >= ?
-                    ORDER BY timestamp DESC
-                ''', (date_limit,))
-            return self.cursor.fetchall()
+                # Too many months to attach at once: gather the range into a temp table in batches
+                end_exclusive = (datetime.strptime(end_date[:10], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+                cursor.execute(f'''
+                    CREATE TEMP TABLE {source} AS
+                    SELECT {columns} FROM main.{table} WHERE {column} >= ? AND {column} < ?
+                ''', (start_date, end_exclusive))
+                names = list(wanted)
+                for i in range(0, len(names), MAX_ATTACHED_PARTITIONS):
+                    batch = names[i:i + MAX_ATTACHED_PARTITIONS]
+                    attach(batch)
+                    for name in batch:
+                        cursor.execute(f'''
+                            INSERT INTO temp.{source} ({columns})
+                            SELECT {columns} FROM {name}.{table} WHERE {column} >= ? AND {column} < ?
+                        ''', (start_date, end_exclusive))
+                    # Only temp is written here; committing lets the next batch ATTACH
+                    conn.commit()
+        except BaseException:
+            self.drop_range_source(source)
+            raise
+        return source
+
+    def range_connection(self, source):
+        """Connection holding a temp range from range_source, or None for any other source"""
+        held = self.range_sources.get(source)
+        return held[0] if held else None
+
+    def drop_range_source(self, source):
+        """Drop a temp range made by range_source; anything else is left alone"""
+        held = self.range_sources.pop(source, None)
+        if held is None:
+            return
+        conn, _, owned = held
+        if owned:
+            self.pool.discard(conn)
+            return
+        try:
+            kind = conn.execute("SELECT type FROM temp.sqlite_master WHERE name=?", (source,)).fetchone()
+            if kind:
+                conn.execute(f"DROP {kind[0].upper()} temp.{source}")
+        except sqlite3.Error:
+            pass  # Its connection is closed already, and the temp object went with it
+
+    # Incremental (change data capture) export
+
+    # Tables the incremental export follows: new rows are found by id, changed meals by last_updated
+    CHANGE_CAPTURE = {"sales": "id", "user_activity": "id", "meals": "last_updated"}
+
+    def get_export_watermarks(self):
+        """Last exported marks per table: {table: (last_rowid, last_updated, last_tombstone, exported_at)}"""
+        self.cursor.execute('''
+            SELECT table_name, last_rowid, last_updated, last_tombstone, exported_at FROM export_watermarks
+        ''')
+        return {row[0]: tuple(row[1:]) for row in self.cursor.fetchall()}
+
+    def change_capture_jobs(self):
+        """ExportJobs for everything added, changed or deleted since the last incremental export
+
+        Returns (jobs, marks). Each job writes an "op" column ("upsert" or "delete")
+        ahead of the table's own columns; deletes carry only the id. The new marks
+        are read before the jobs run, so rows committed meanwhile wait for the next
+        export, and should be saved with advance_export_watermarks once the job for
+        that table has succeeded.
+        """
+        watermarks = self.get_export_watermarks()
+        captured_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor = self.cursor
+        jobs, marks = [], {}
+        for table, key in self.CHANGE_CAPTURE.items():
+            last_rowid, last_updated, last_tombstone, exported_at = watermarks.get(table, (0, '', 0, None))
+            columns = self._table_columns(cursor, table)
+
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM export_tombstones WHERE table_name=?", (table,))
+            new_tombstone = cursor.fetchone()[0]
+            deletes = ", ".join(["row_id AS id"] + [f"NULL AS {column}" for column in columns if column != "id"])
+            delete_sql = f'''
+                SELECT 'delete' AS op, {deletes} FROM export_tombstones
+                WHERE table_name = ? AND id > ? AND id <= ?
+            '''
+
+            if key == "id":
+                # AUTOINCREMENT ids never go backwards, so the sequence is the high-water mark
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,))
+                row = cursor.fetchone()
+                new_rowid, new_updated = (row[0] if row else 0), ''
+                # Months archived since the last export may hold rows it never saw
+                if exported_at is None:
+                    start_date = '0000-01-01'
+                else:
+                    cursor.execute("SELECT MIN(month) FROM archive_partitions WHERE archived_at >= ?",
+                                   (exported_at,))
+                    month = cursor.fetchone()[0]
+                    start_date = f"{month}-01" if month else datetime.now().strftime('%Y-%m-%d')
+                archived = (table, start_date) if table in ARCHIVED_TABLES else None
+                source = "{source}" if archived else table
+                upsert_sql = f"SELECT 'upsert' AS op, {', '.join(columns)} FROM {source} WHERE id > ? AND id <= ?"
+                params = (last_rowid, new_rowid)
+            else:
+                # Edits and soft deletes both stamp last_updated. Rows stamped in the
+                # second of the old mark are sent again rather than risk missing one.
+                cursor.execute(f"SELECT COALESCE(MAX({key}), '') FROM {table}")
+                new_rowid, new_updated = 0, cursor.fetchone()[0]
+                archived = None
+                upsert_sql = f'''
+                    SELECT 'upsert' AS op, {', '.join(columns)} FROM {table}
+                    WHERE COALESCE({key}, '') >= ? AND COALESCE({key}, '') <= ?
+                '''
+                params = (last_updated, new_updated)
+
+            jobs.append(ExportJob(f"{table}_changes", f"{upsert_sql} UNION ALL {delete_sql}",
+                                  params + (table, last_tombstone, new_tombstone), archived=archived))
+            marks[f"{table}_changes"] = (table, new_rowid, new_updated, new_tombstone, captured_at)
+        return jobs, marks
+
+    def advance_export_watermarks(self, marks):
+        """Record marks from change_capture_jobs and drop the tombstones they cover"""
+        try:
+            with self.pool.transaction() as cursor:
+                for table, last_rowid, last_updated, last_tombstone, exported_at in marks:
+                    cursor.execute('''
+                        INSERT INTO export_watermarks (table_name, last_rowid, last_updated, last_tombstone, exported_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(table_name) DO UPDATE SET
+                            last_rowid = excluded.last_rowid,
+                            last_updated = excluded.last_updated,
+                            last_tombstone = excluded.last_tombstone,
+                            exported_at = excluded.exported_at
+                    ''', (table, last_rowid, last_updated, last_tombstone, exported_at))
+                    cursor.execute("DELETE FROM export_tombstones WHERE table_name=? AND id <= ?",
+                                   (table, last_tombstone))
+            return True
         except Exception as e:
-            print(f"Error getting user activity: {str(e)}")
+            print(f"Error advancing export watermarks: {str(e)}")
+            return False
+
+
+class BackupRepository:
+    """Deduplicated, compressed store of database snapshots
+
+    Each snapshot is split into page-aligned chunks that are stored once,
+    zlib-compressed, under their SHA-256. A snapshot manifest lists its
+    chunk hashes and index.json summarises every snapshot for listing.
+    """
+
+    PAGES_PER_CHUNK = 64
+
+    def __init__(self, root=BACKUP_DIR):
+        self.root = root
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        self.index_file = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _write_json(self, path, data):
+        """Write JSON atomically so a crash never leaves a half-written manifest"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _read_index(self):
+        if not os.path.exists(self.index_file):
             return []
+        with open(self.index_file, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _page_size(path):
+        """Read the page size from the SQLite file header"""
+        with open(path, "rb") as f:
+            header = f.read(100)
+        if len(header) < 18 or not header.startswith(b"SQLite format 3\x00"):
+            return 4096
+        page_size = int.from_bytes(header[16:18], "big")
+        return 65536 if page_size == 1 else page_size
+
+    def create_snapshot(self, source_path, label="manual"):
+        """Add a consistent database copy as a new snapshot; returns its index entry"""
+        # Held throughout so garbage collection never races a snapshot being written
+        with self.lock:
+            created = datetime.now()
+            chunk_size = self._page_size(source_path) * self.PAGES_PER_CHUNK
+            chunks = []
+            size = 0
+            new_bytes = 0
+            with open(source_path, "rb") as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if not data:
+                        break
+                    size += len(data)
+                    digest = hashlib.sha256(data).hexdigest()
+                    chunks.append(digest)
+                    chunk_path = self._chunk_path(digest)
+                    if os.path.exists(chunk_path):
+                        continue
+                    # Only chunks not already in the store cost disk space
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    compressed = zlib.compress(data, 6)
+                    tmp_path = chunk_path + ".tmp"
+                    with open(tmp_path, "wb") as chunk_file:
+                        chunk_file.write(compressed)
+                    os.replace(tmp_path, chunk_path)
+                    new_bytes += len(compressed)
+
+            index = self._read_index()
+            snapshot_id = created.strftime("%Y%m%d_%H%M%S")
+            existing = {entry["id"] for entry in index}
+            suffix = 1
+            while snapshot_id in existing:
+                suffix += 1
+                snapshot_id = f"{created.strftime('%Y%m%d_%H%M%S')}_{suffix}"
+
+            entry = {
+                "id": snapshot_id,
+                "created": created.isoformat(timespec="seconds"),
+                "label": label,
+                "size": size,
+                "chunk_count": len(chunks),
+                "new_bytes": new_bytes
+            }
+            self._write_json(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"),
+                             dict(entry, chunk_size=chunk_size, chunks=chunks))
+            index.append(entry)
+            self._write_json(self.index_file, index)
+            return entry
+
+    def list_snapshots(self):
+        """Snapshot summaries, newest first, straight from the index"""
+        with self.lock:
+            index = self._read_index()
+        return sorted(index, key=lambda entry: (entry["created"], entry["id"]), reverse=True)
+
+    def restore_to(self, snapshot_id, dest_path):
+        """Reassemble a snapshot into dest_path, streaming one chunk at a time"""
+        with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), "r") as f:
+            manifest = json.load(f)
+        tmp_path = dest_path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            for digest in manifest["chunks"]:
+                with open(self._chunk_path(digest), "rb") as chunk_file:
+                    data = zlib.decompress(chunk_file.read())
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"Backup chunk {digest[:12]} is corrupted")
+                out.write(data)
+        os.replace(tmp_path, dest_path)
+        return manifest["size"]
+
+    def apply_retention(self, policy, max_age_days=None):
+        """Keep the newest snapshot per hour/day/week for the counts in policy, drop the rest
+
+        policy is a dict such as {"hourly": 24, "daily": 7, "weekly": 4}.
+        Returns the number of snapshots deleted.
+        """
+        bucket_formats = {"hourly": "%Y%m%d%H", "daily": "%Y%m%d", "weekly": "%G%V"}
+        with self.lock:
+            index = sorted(self._read_index(), key=lambda entry: (entry["created"], entry["id"]), reverse=True)
+            if not index:
+                return 0
+
+            keep = {index[0]["id"]}  # Never delete the newest snapshot
+            for period, count in policy.items():
+                bucket_format = bucket_formats.get(period)
+                if not bucket_format or count <= 0:
+                    continue
+                buckets = set()
+                for entry in index:
+                    bucket = datetime.fromisoformat(entry["created"]).strftime(bucket_format)
+                    if bucket in buckets:
+                        continue
+                    if len(buckets) >= count:
+                        break
+                    buckets.add(bucket)
+                    keep.add(entry["id"])
+
+            if max_age_days:
+                cutoff = datetime.now() - timedelta(days=max_age_days)
+                keep = {entry["id"] for entry in index
+                        if entry["id"] in keep and (entry is index[0] or datetime.fromisoformat(entry["created"]) >= cutoff)}
+
+            removed = [entry for entry in index if entry["id"] not in keep]
+            if not removed:
+                return 0
+            for entry in removed:
+                try:
+                    os.remove(os.path.join(self.snapshots_dir, f"{entry['id']}.json"))
+                except OSError:
+                    pass
+            self._write_json(self.index_file, [entry for entry in index if entry["id"] in keep])
+            self._collect_garbage(keep)
+            return len(removed)
+
+    def _collect_garbage(self, snapshot_ids):
+        """Delete chunks no longer referenced by any remaining snapshot"""
+        referenced = set()
+        for snapshot_id in snapshot_ids:
+            with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), "r") as f:
+                referenced.update(json.load(f)["chunks"])
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    os.remove(os.path.join(prefix_dir, digest))
+
+
+class ExportJob:
+    """One query (or ready-made rows) to stream into one export file"""
+    __slots__ = ("name", "sql", "params", "headers", "transform", "rows", "archived", "total_from")
+
+    def __init__(self, name, sql=None, params=(), headers=None, transform=None, rows=None, archived=None,
+                 total_from=None):
+        self.name = name
+        self.sql = sql
+        self.params = tuple(params)
+        self.headers = headers  # defaults to the query's column names; none for bare rows
+        self.transform = transform  # applied to each row before it is written
+        self.rows = rows  # used instead of sql for small results already in hand
+        # (table, start_date): sql names its table as {source}, filled in by range_source
+        # so months moved out to archive files are exported too
+        self.archived = archived
+        # Table whose trigger-kept row count stands in for the progress total, for
+        # jobs that export that whole table; other queries report no total until done
+        self.total_from = total_from
+
+
+class DataExporter:
+    """Streams query results into gzip-compressed CSV or JSONL files on worker threads
+
+    Rows are pulled with fetchmany and written as they arrive, so memory stays flat
+    however large the table is. Every job runs on its own thread, and so on its own
+    pooled read connection, which lets several tables export at the same time.
+    """
+    FORMATS = {"csv": ".csv", "jsonl": ".jsonl"}
+
+    def __init__(self, db, export_dir, fmt="csv", compress=True, batch_size=EXPORT_BATCH_SIZE):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.db = db
+        self.export_dir = export_dir
+        self.fmt = fmt
+        self.compress = compress
+        self.batch_size = batch_size
+
+    @staticmethod
+    def stream(cursor, batch_size=EXPORT_BATCH_SIZE):
+        """Yield the rows of an executed cursor, one fetchmany batch in memory at a time"""
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def path_for(self, name, timestamp):
+        suffix = self.FORMATS[self.fmt] + (".gz" if self.compress else "")
+        return os.path.join(self.export_dir, f"{name}_{timestamp}{suffix}")
+
+    def _open(self, path):
+        if self.compress:
+            return gzip.open(path, "wt", encoding="utf-8", newline="")
+        return open(path, "w", encoding="utf-8", newline="")
+
+    def export(self, job, path, on_progress=None):
+        """Write one job to path on the calling thread; returns the number of rows written
+
+        on_progress(name, rows_written, total_rows) is called after every batch.
+        total_rows is the job's total_from row count, an estimate read without
+        scanning anything, or None; the last call always has the real total.
+        """
+        source = None
+        if job.rows is not None:
+            rows, headers, total = iter(job.rows), job.headers, None
+        else:
+            sql = job.sql
+            if job.archived:
+                table, start_date = job.archived
+                source = self.db.range_source(table, start_date)
+                sql = sql.format(source=source)
+            cursor = (self.db.range_connection(source) or self.db.conn).cursor()
+            total = None
+            if on_progress and job.total_from:
+                total = self.db.stats.current()["row_counts"].get(job.total_from)
+            try:
+                cursor.execute(sql, job.params)
+            except BaseException:
+                self.db.drop_range_source(source)
+                raise
+            headers = job.headers or [description[0] for description in cursor.description]
+            rows = self.stream(cursor, self.batch_size)
+        if job.transform:
+            rows = map(job.transform, rows)
+
+        # Written under a temporary name so a failed export never looks complete
+        partial = path + ".part"
+        written = 0
+        try:
+            with self._open(partial) as f:
+                if self.fmt == "csv":
+                    writer = csv.writer(f)
+                    if headers:
+                        writer.writerow(headers)
+                    write = writer.writerow
+                else:
+                    def write(row):
+                        record = dict(zip(headers, row)) if headers else list(row)
+                        f.write(json.dumps(record, default=str) + "\n")
+                for row in rows:
+                    write(row)
+                    written += 1
+                    if on_progress and written % self.batch_size == 0:
+                        on_progress(job.name, written, total)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        finally:
+            self.db.drop_range_source(source)
+        if on_progress:
+            on_progress(job.name, written, written)
+        return written
+
+    def start(self, jobs, on_progress=None, on_complete=None):
+        """Export every job in parallel, one worker thread each
+
+        Callbacks come from the worker threads: on_progress as in export(), and
+        on_complete({name: (path, rows, error)}) once, when the last job finishes.
+        """
+        os.makedirs(self.export_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results = {}
+        results_lock = threading.Lock()
+
+        def run(job):
+            path = self.path_for(job.name, timestamp)
+            try:
+                result = (path, self.export(job, path, on_progress), None)
+            except Exception as e:
+                result = (path, 0, str(e))
+            finally:
+                # The thread's read connection would otherwise stay open in the pool
+                self.db.pool.release()
+            with results_lock:
+                results[job.name] = result
+                finished = len(results) == len(jobs)
+            if finished and on_complete:
+                on_complete(results)
+
+        threads = [threading.Thread(target=run, args=(job,), name=f"Export-{job.name}", daemon=True)
+                   for job in jobs]
+        for thread in threads:
+            thread.start()
+        return threads
 
 
 class Marquee(tk.Label):
@@ -1197,7 +3478,7 @@ class HomePage:
             if hasattr(self.main_app, 'db'):
                 try:
                     total_meals = self.main_app.db.cursor.execute("SELECT COUNT(*) FROM meals WHERE is_active=1").fetchone()[0]
-                    total_sales = self.main_app.db.cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+                    total_sales = self.main_app.db.stats.current()["row_counts"].get("sales", 0)
                     db_stats = f"• Active Meals: {total_meals}\n• Total Sales: {total_sales:,}"
                 except:
                     db_stats = "• Database: Not accessible"
@@ -1256,13 +3537,13 @@ class HomePage:
             stats = f"""
 📈 Today's Statistics ({today})
 
-• Total Sales: Ksh {total_sales:,.2f}
+• Total Sales: Ksh {format_money(total_sales, grouped=True)}
 • Items Sold: {total_items}
 • Transactions: {len(sales_data)}
 • Active Cashiers: {len(cashiers)}
 
 💰 Performance Metrics:
-• Average Sale: Ksh {total_sales/len(sales_data) if sales_data else 0:,.2f}
+• Average Sale: Ksh {format_money(total_sales / len(sales_data) if sales_data else 0, grouped=True)}
 • Items per Transaction: {total_items/len(sales_data) if sales_data else 0:.1f}
 
 💡 Tip: Check individual portals for detailed reports.
@@ -1320,11 +3601,9 @@ class HomePage:
             # Record exit activity if database is available
             if hasattr(self.main_app, 'db'):
                 try:
-                    self.main_app.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', ('system', 'system', 'Application closed from homepage'))
-                    self.main_app.db.conn.commit()
+                    self.main_app.db.log_activity('system', 'system', 'Application closed from homepage')
+                    # Stop the write-behind logger so nothing queued is lost
+                    self.main_app.db.activity.close()
                 except:
                     pass
             
@@ -1697,6 +3976,370 @@ class ScrolledFrame:
     @property
     def frame(self):
         return self.scrollable_frame
+
+
+class TabLoader:
+    """Fills notebook tabs with data computed on worker threads, each tab the first time it is shown
+
+    add() puts a scrollable tab holding a loading skeleton into the notebook at once.
+    When the tab is first selected its load() runs on a worker thread inside
+    db.snapshot(), so on that thread's own read-only connection, and the result
+    comes back through a queue polled with after() to build(frame, data) on the Tk
+    thread. Tabs nobody opens never query; destroying the notebook cancels the rest.
+    """
+
+    def __init__(self, notebook, db, bg=BG_COLOR, poll_interval=100):
+        self.notebook = notebook
+        self.db = db
+        self.bg = bg
+        self.poll_interval = poll_interval  # milliseconds between checks for finished tabs
+        self.tabs = {}  # notebook tab id -> tab state
+        self.results = queue.Queue()
+        self._polling = False
+        notebook.bind("<<NotebookTabChanged>>", lambda e: self._start(notebook.select()), add="+")
+        notebook.bind("<Destroy>", self._on_destroy, add="+")
+
+    def add(self, title, load, build):
+        """Add a tab showing build(frame, load()), loaded when the tab is first shown"""
+        scrolled = ScrolledFrame(self.notebook, bg=self.bg)
+        self.notebook.add(scrolled.main_frame, text=title)
+        tab_id = str(scrolled.main_frame)
+        self.tabs[tab_id] = {
+            "title": title, "frame": scrolled.frame, "skeleton": self._skeleton(scrolled.frame, title),
+            "load": load, "build": build, "state": "idle", "cancelled": threading.Event(), "conn": None,
+        }
+        if self.notebook.select() == tab_id:
+            self._start(tab_id)
+
+    def cancel(self, tab_id=None):
+        """Cancel one tab, or every tab, still loading; a query in flight is interrupted"""
+        tabs = [self.tabs[tab_id]] if tab_id else self.tabs.values()
+        for tab in tabs:
+            if tab["state"] != "loading":
+                continue
+            tab["cancelled"].set()
+            tab["state"] = "cancelled"
+            conn = tab["conn"]
+            if conn is not None:
+                try:
+                    conn.interrupt()
+                except sqlite3.Error:
+                    pass
+
+    def _skeleton(self, parent, title):
+        """Grey placeholder lines shown until the tab's data arrives"""
+        skeleton = tk.Frame(parent, bg=self.bg)
+        skeleton.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        tk.Label(skeleton, text=f"Loading {title}...", font=FONT_SMALL,
+                 bg=self.bg, fg=FG_COLOR).pack(anchor=tk.W, pady=(0, 10))
+        for width in (420, 360, 300, 380, 240, 320):
+            tk.Frame(skeleton, bg=BUTTON_COLOR, width=width, height=14).pack(anchor=tk.W, pady=4)
+        return skeleton
+
+    def _start(self, tab_id):
+        tab = self.tabs.get(str(tab_id))
+        if tab is None or tab["state"] != "idle":
+            return
+        tab["state"] = "loading"
+        threading.Thread(target=self._work, args=(tab,), name="TabLoader", daemon=True).start()
+        if not self._polling:
+            self._polling = True
+            self.notebook.after(self.poll_interval, self._poll)
+
+    def _work(self, tab):
+        data, error = None, None
+        try:
+            with self.db.snapshot():
+                tab["conn"] = self.db.conn
+                if not tab["cancelled"].is_set():
+                    data = tab["load"]()
+        except Exception as e:
+            error = e
+        finally:
+            tab["conn"] = None
+            self.db.pool.release()
+        if not tab["cancelled"].is_set():
+            self.results.put((tab, data, error))
+
+    def _poll(self):
+        if not self.notebook.winfo_exists():
+            self._polling = False
+            return
+        while True:
+            try:
+                tab, data, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            tab["state"] = "done"
+            tab["skeleton"].destroy()
+            if error is None:
+                try:
+                    tab["build"](tab["frame"], data)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                print(f"Error loading {tab['title']}: {str(error)}")
+                tk.Label(tab["frame"], text=f"Error loading data: {str(error)}", font=FONT_SMALL,
+                         bg=self.bg, fg=ERROR_COLOR).pack(padx=10, pady=10)
+
+        if any(tab["state"] == "loading" for tab in self.tabs.values()):
+            self.notebook.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+
+    def _on_destroy(self, event):
+        if event.widget is self.notebook:
+            self.cancel()
+
+
+class VirtualGrid:
+    """Shows a QueryRows or ListRows in a Treeview, holding only the rows in view as tree items
+
+    The tree keeps one item per visible line; scrolling rewrites their values from
+    the row source instead of inserting and deleting items, so the size of the
+    result only costs what the source holds. The scrollbar drives the grid rather
+    than the tree. Clicking a sortable heading sorts the source by that column,
+    again to reverse it, and a third time back to the source's own order.
+    """
+    ARROWS = {False: " ▲", True: " ▼"}
+
+    def __init__(self, tree, scrollbar=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.rows = None
+        self.to_values = None
+        self.items = []
+        self.top = 0
+        self.selected = None  # position of the selected row in the source
+        self.sorted_by = None
+        self._rendering = False
+        if scrollbar is not None:
+            scrollbar.configure(command=self.on_scrollbar)
+        tree.configure(yscrollcommand=lambda first, last: None)
+        tree.bind("<Configure>", lambda e: self.render(), add="+")
+        tree.bind("<MouseWheel>", self.on_wheel, add="+")
+        tree.bind("<Button-4>", self.on_wheel, add="+")
+        tree.bind("<Button-5>", self.on_wheel, add="+")
+        tree.bind("<Prior>", lambda e: self.scroll(-self.visible_rows()), add="+")
+        tree.bind("<Next>", lambda e: self.scroll(self.visible_rows()), add="+")
+        tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        tree.bind("<Destroy>", lambda e: self.close(), add="+")
+
+    def show(self, rows, to_values):
+        """Show rows from the top; to_values turns a source row into tree values"""
+        if self.rows is not None and self.rows is not rows:
+            self.rows.close()
+        self.rows = rows
+        self.to_values = to_values
+        self.top = 0
+        self.selected = None
+        # A column sort carries over to new rows (a new filter, a reload) if they allow it
+        if self.sorted_by and rows.sortable(self.sorted_by[0]):
+            rows.sort(*self.sorted_by)
+        else:
+            self.sorted_by = None
+        self._headings()
+        self.render()
+
+    def _headings(self):
+        for column in self.tree["columns"]:
+            text = self.tree.heading(column, "text")
+            for arrow in self.ARROWS.values():
+                if text.endswith(arrow):
+                    text = text[:-len(arrow)]
+            if self.sorted_by and self.sorted_by[0] == column:
+                text += self.ARROWS[self.sorted_by[1]]
+            command = functools.partial(self.sort_by, column) if self.rows.sortable(column) else ""
+            self.tree.heading(column, text=text, command=command)
+
+    def close(self):
+        """Release the rows shown, once the tree is gone"""
+        if self.rows is not None:
+            self.rows.close()
+            self.rows = None
+
+    def refresh(self):
+        """Show the rows again after the data changed, keeping position, sort and selection"""
+        if self.rows is None:
+            return
+        try:
+            self.rows.reload()
+        except sqlite3.Error as e:
+            print(f"Error reloading rows: {str(e)}")
+        self.render()
+
+    def sort_by(self, column):
+        if self.sorted_by is None or self.sorted_by[0] != column:
+            self.sorted_by = (column, False)
+        elif not self.sorted_by[1]:
+            self.sorted_by = (column, True)
+        else:
+            self.sorted_by = None
+        try:
+            self.rows.sort(*(self.sorted_by or (None, False)))
+        except sqlite3.Error as e:
+            print(f"Error sorting rows: {str(e)}")
+        self.top = 0
+        self.selected = None
+        self._headings()
+        self.render()
+
+    def visible_rows(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Not mapped yet: the height it asked for
+            return int(self.tree.cget("height"))
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or 20
+        # Less the heading row
+        return max(1, height // int(row_height) - 1)
+
+    def render(self):
+        """Fill the tree's items with the rows at the current position"""
+        if self.rows is None or self._rendering or not self.tree.winfo_exists():
+            return
+        self._rendering = True
+        try:
+            try:
+                total = len(self.rows)
+                count = self.visible_rows()
+                self.top = max(0, min(self.top, total - count))
+                window = self.rows.window(self.top, count)
+            except sqlite3.Error as e:
+                print(f"Error loading rows: {str(e)}")
+                total, window = 0, []
+            while len(self.items) < len(window):
+                self.items.append(self.tree.insert("", tk.END))
+            while len(self.items) > len(window):
+                self.tree.delete(self.items.pop())
+            for item, row in zip(self.items, window):
+                self.tree.item(item, values=self.to_values(row))
+            # Keep the selection on its row rather than on the tree line it was on
+            selected = self.selected
+            if selected is not None and self.top <= selected < self.top + len(window):
+                self.tree.selection_set(self.items[selected - self.top])
+            else:
+                self.tree.selection_set(())
+            self.tree.yview_moveto(0)
+            if self.scrollbar is not None:
+                if total:
+                    self.scrollbar.set(self.top / total, (self.top + len(window)) / total)
+                else:
+                    self.scrollbar.set(0, 1)
+        finally:
+            self._rendering = False
+
+    def scroll(self, lines):
+        self.top += lines
+        self.render()
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if self.rows is None:
+            return
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.rows))
+            self.render()
+        else:
+            self.scroll(int(amount) * (self.visible_rows() if unit == "pages" else 1))
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            return self.scroll(-3)
+        return self.scroll(3)
+
+    def on_select(self, event):
+        # Selections the grid makes itself while rendering report the same position back;
+        # an empty one only means the selected row is out of view
+        selection = self.tree.selection()
+        if selection and selection[0] in self.items:
+            self.selected = self.top + self.items.index(selection[0])
+
+
+class DataChanges:
+    """DataEvents merged into one batch, so a burst of them updates each view once"""
+
+    def __init__(self):
+        self.stock = {}  # (category, name) -> latest stock
+        self.sold = {}  # (category, meal) -> quantity sold
+        self.sale_dates = set()
+        self.meals = set()  # (category, name) added or removed
+        self.cleared = []  # (start_date, end_date) ranges voided
+        self.purged = set()  # log tables rows were deleted from
+        self.reloaded = False
+
+    def add(self, event):
+        if isinstance(event, SaleRecorded):
+            self.sale_dates.update(event.dates)
+            for key, quantity in event.items.items():
+                self.sold[key] = self.sold.get(key, 0) + quantity
+        elif isinstance(event, StockChanged):
+            self.stock.update(event.items)
+        elif isinstance(event, (MealAdded, MealRemoved)):
+            self.meals.add((event.category, event.name))
+        elif isinstance(event, DayCleared):
+            self.cleared.append((event.start_date, event.end_date))
+        elif isinstance(event, HistoryPurged):
+            self.purged.add(event.table)
+        elif isinstance(event, DataReloaded):
+            self.reloaded = True
+
+    def empty(self):
+        return not (self.stock or self.sold or self.meals or self.cleared or self.purged or self.reloaded)
+
+    def sales_on(self, date):
+        """Whether sales on date were recorded or voided"""
+        return date in self.sale_dates or any(start <= date <= end for start, end in self.cleared)
+
+
+class UiEventDispatcher:
+    """Brings DataEvents published on any thread to Tk-thread handlers, a burst at a time
+
+    Each event is queued as it is published. The first one queued schedules a flush
+    through call_later (HotelApp.call_on_ui_thread), and everything queued by the
+    time it runs reaches the handlers merged into one DataChanges. A handler
+    subscribed with a widget is dropped once that widget is destroyed.
+    """
+
+    def __init__(self, bus, call_later):
+        self.call_later = call_later
+        self.events = queue.Queue()
+        self.handlers = []  # (handler, widget or None)
+        self.lock = threading.Lock()
+        self.scheduled = False
+        bus.subscribe(DataEvent, self.post)
+
+    def subscribe(self, handler, widget=None):
+        """Call handler(changes) on the Tk thread for every batch of changes"""
+        self.handlers.append((handler, widget))
+
+    def post(self, event):
+        self.events.put(event)
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.call_later(self.flush)
+
+    def flush(self):
+        with self.lock:
+            self.scheduled = False
+        changes = DataChanges()
+        while True:
+            try:
+                changes.add(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if changes.empty():
+            return
+        self.handlers = [(handler, widget) for handler, widget in self.handlers
+                         if widget is None or widget.winfo_exists()]
+        for handler, _ in list(self.handlers):
+            try:
+                handler(changes)
+            except Exception as e:
+                print(f"Error updating view: {str(e)}")
+
+
 class HotelApp:
     def __init__(self, root):
         self.root = root
@@ -1713,8 +4356,14 @@ class HotelApp:
         self.manager_mode = False
         self.meal_frames = {}
         self.meal_entries = {}
+        self.stock_labels = {}  # (category, item) -> (POS stock label, stock it shows)
+        self.stock_labels_version = 0  # catalog version the stock labels were last brought up to
         self.receipt_items = []
         self.receipt_total = 0
+        self.tree_grids = {}  # Treeview -> VirtualGrid for views that only hold the rows in view
+        # Status window frame -> ({(section, item): (indicator, status label, (status, color) shown)},
+        # last-updated label), so a refresh only reconfigures the labels whose status changed
+        self.status_displays = {}
         
         self.BG_COLOR = "#1a1a2e"  # Dark navy blue
         self.FG_COLOR = "#e6e6e6"  # Light gray
@@ -1731,19 +4380,73 @@ class HotelApp:
     # Load default appearance settings
 
 
-        # Initialize menu_items from database
-        self.menu_items = {}
-        db_meals = self.db.get_all_meals()
-        for category, name, _, _, selling_price, _, _, _, _, _ in db_meals:
-            if category not in self.menu_items:
-                self.menu_items[category] = {}
-            self.menu_items[category][name] = selling_price
-            self.deducted_items = set()
-            self.deducted_items.add(name)
-        
         # Start with homepage instead of login page
         self.homepage = HomePage(self.root, self)
+
+        # Work handed over from background threads, run on the Tk thread
+        self.ui_calls = queue.Queue()
+        self.root.after(100, self.process_ui_calls)
+        # Committed data changes, from any thread, patch the open views a burst at a time
+        self.data_events = UiEventDispatcher(self.db.events, self.call_on_ui_thread)
+        self.data_events.subscribe(self.apply_data_changes)
+
+        # Automatic backups run in the background while the till is open
+        self.backup_repo = BackupRepository()
+        self.schedule_auto_backup()
         
+    def call_on_ui_thread(self, callback, *args):
+        """Queue callback to run on the Tk thread; safe to call from any thread"""
+        self.ui_calls.put((callback, args))
+
+    def process_ui_calls(self):
+        """Run callbacks queued by background threads"""
+        while True:
+            try:
+                callback, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback: {str(e)}")
+        self.root.after(100, self.process_ui_calls)
+
+    def apply_data_changes(self, changes):
+        """Update the open views for a batch of committed changes, each only where it is affected"""
+        if changes.reloaded:
+            self.refresh_after_reload()
+            return
+
+        if changes.stock:
+            self.refresh_stock_indicators()
+
+        stock_affected = bool(changes.stock or changes.meals)
+        history_affected = stock_affected or 'stock_history' in changes.purged
+        views = [
+            ('stock_tree', stock_affected or bool(changes.sold or changes.cleared)),
+            ('history_tree', history_affected),
+            ('sales_tree', bool(changes.sold or changes.cleared)),
+            ('low_stock_tree', stock_affected)
+        ]
+        for tree_name, affected in views:
+            tree = getattr(self, tree_name, None)
+            if affected and tree in self.tree_grids and tree.winfo_exists():
+                self.tree_grids[tree].refresh()
+        history_tree = getattr(self, 'history_tree', None)
+        if history_affected and history_tree in self.tree_grids and history_tree.winfo_exists():
+            self.show_history_count(self.tree_grids[history_tree].rows)
+
+    def refresh_after_reload(self):
+        """Bring the open screens in line with data that was replaced underneath them"""
+        # Rebuild the POS screen so its menu, stock labels and entries match the restored data
+        if hasattr(self, 'customer_name_entry') and self.customer_name_entry.winfo_exists():
+            self.show_main_system()
+        self.reload_data_views()
+
+    @property
+    def menu_items(self):
+        """Active menu as {category: {name: selling_price}}, served from the database catalog"""
+        return self.db.catalog.menu()
        
     def update_clock(self):
         """Update the date and time display"""
@@ -1771,10 +4474,13 @@ class HotelApp:
 
     def confirm_exit(self):
         if messagebox.askyesno("Exit", "Are you sure you want to exit?", parent=self.root):
+            # Write out queued activity before the process goes away
+            self.db.activity.close()
             self.root.destroy()
 
     def confirm_logout(self):
         if messagebox.askyesno("Logout", "Are you sure you want to logout?", parent=self.root):
+            self.db.activity.flush()
             was_manager = self.manager_mode
             self.current_user = None
             self.manager_mode = False
@@ -2414,8 +5120,9 @@ Clin-Tech Technologies
             if hasattr(self, 'db'):
                 today = datetime.now().strftime('%Y-%m-%d')
                 count = self.db.cursor.execute(
-                    "SELECT COUNT(*) FROM user_activity WHERE date(timestamp)=? AND activity_type='login'",
-                    (today,)
+                    "SELECT COUNT(*) FROM user_activity WHERE activity_type='login' "
+                    "AND timestamp >= ? AND timestamp < date(?, '+1 day')",
+                    (today, today)
                 ).fetchone()[0]
                 return count
         except:
@@ -2840,29 +5547,27 @@ Need assistance? Contact system administrator.
         tk.Label(main_frame, text="📊 Quick Reports Dashboard", 
                  font=('Poppins', 16, 'bold'), bg=BG_COLOR, fg=ACCENT_COLOR).pack(pady=10)
 
-        # Today's sales summary
-        today = datetime.now().strftime('%Y-%m-%d')
-        sales_data = self.db.get_daily_sales(today)
-        total_today = sum(amt for _, _, _, amt, _, _, _ in sales_data) if sales_data else 0
-
-        # Create report cards
+        # Create report cards; their values are filled in by show_reports below
         report_cards = [
-            ("💰 Today's Sales", f"Ksh {total_today:.2f}", SUCCESS_COLOR),
-            ("📦 Low Stock Items", f"{len(self.db.get_low_stock_items(10))} items", ERROR_COLOR),
-            ("👥 Active Users", f"{len(set(user for user, _, _, _, _, _, _ in sales_data))} users", ACCENT_COLOR),
-            ("📈 Total Profit", f"Ksh {sum(profit for _, _, _, _, _, profit, _ in sales_data) if sales_data else 0:.2f}", HIGHLIGHT_COLOR)
+            ("💰 Today's Sales", SUCCESS_COLOR),
+            ("📦 Low Stock Items", ERROR_COLOR),
+            ("👥 Active Users", ACCENT_COLOR),
+            ("📈 Total Profit", HIGHLIGHT_COLOR)
         ]
 
         cards_frame = tk.Frame(main_frame, bg=BG_COLOR)
         cards_frame.pack(fill=tk.X, pady=10)
 
-        for i, (title, value, color) in enumerate(report_cards):
+        value_labels = []
+        for i, (title, color) in enumerate(report_cards):
             card = tk.Frame(cards_frame, bg=color, relief=tk.RAISED, bd=1)
             card.grid(row=0, column=i, padx=5, sticky="nsew")
             cards_frame.grid_columnconfigure(i, weight=1)
 
             tk.Label(card, text=title, font=FONT_SMALL, bg=color, fg=FG_COLOR).pack(pady=5)
-            tk.Label(card, text=value, font=('Poppins', 12, 'bold'), bg=color, fg=FG_COLOR).pack(pady=5)
+            value_label = tk.Label(card, text="", font=('Poppins', 12, 'bold'), bg=color, fg=FG_COLOR)
+            value_label.pack(pady=5)
+            value_labels.append(value_label)
 
         # Recent sales table
         tk.Label(main_frame, text="Recent Sales Today", font=FONT_MEDIUM, 
@@ -2883,28 +5588,52 @@ Need assistance? Contact system administrator.
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        # Populate with recent sales
-        for row in sales_data[:20]:  # Last 20 sales
-            # Support both aggregated rows (from get_daily_sales) and full sales rows (SELECT *)
-            if isinstance(row, (list, tuple)) and len(row) == 7:
-                # category, meal, quantity_sum, amount_sum, payment_method, profit_sum, profit_margin
-                customer = "-"
-                category, meal, qty, amt = row[0], row[1], row[2], row[3]
-            else:
-                # Expected order from SELECT * on sales table:
-                # id, user, date, time, customer_name, category, meal, quantity, buying_price, selling_price, amount, profit, payment_method, payment_details, timestamp
-                customer = row[4] if len(row) > 4 else "-"
-                category = row[5] if len(row) > 5 else ""
-                meal = row[6] if len(row) > 6 else ""
-                qty = row[7] if len(row) > 7 else 0
-                amt = row[10] if len(row) > 10 else 0
-            tree.insert("", tk.END, values=(
-                datetime.now().strftime('%H:%M:%S'),
-                customer[:15] + "..." if len(customer) > 15 else customer,
-                f"{meal[:12]}..." if len(meal) > 12 else meal,
-                qty,
-                f"Ksh {amt:.2f}"
-            ))
+        def show_reports(sales_data):
+            total_today = sum(amt for _, _, _, amt, _, _, _ in sales_data) if sales_data else 0
+            values = [
+                f"Ksh {format_money(total_today)}",
+                f"{len(self.db.get_low_stock_items(10))} items",
+                f"{len(set(user for user, _, _, _, _, _, _ in sales_data))} users",
+                f"Ksh {format_money(sum(profit for _, _, _, _, _, profit, _ in sales_data))}"
+            ]
+            for value_label, value in zip(value_labels, values):
+                if value_label['text'] != value:
+                    value_label.config(text=value)
+
+            # Populate with recent sales
+            for item in tree.get_children():
+                tree.delete(item)
+            for row in sales_data[:20]:  # Last 20 sales
+                # Support both aggregated rows (from get_daily_sales) and full sales rows (SELECT *)
+                if isinstance(row, (list, tuple)) and len(row) == 7:
+                    # category, meal, quantity_sum, amount_sum, payment_method, profit_sum, profit_margin
+                    customer = "-"
+                    category, meal, qty, amt = row[0], row[1], row[2], row[3]
+                else:
+                    # Expected order from SELECT * on sales table:
+                    # id, user, date, time, customer_name, category, meal, quantity, buying_price, selling_price, amount, profit, payment_method, payment_details, timestamp
+                    customer = row[4] if len(row) > 4 else "-"
+                    category = row[5] if len(row) > 5 else ""
+                    meal = row[6] if len(row) > 6 else ""
+                    qty = row[7] if len(row) > 7 else 0
+                    amt = row[10] if len(row) > 10 else 0
+                tree.insert("", tk.END, values=(
+                    datetime.now().strftime('%H:%M:%S'),
+                    customer[:15] + "..." if len(customer) > 15 else customer,
+                    f"{meal[:12]}..." if len(meal) > 12 else meal,
+                    qty,
+                    f"Ksh {format_money(amt)}"
+                ))
+
+        # Today's sales summary, shown now and again whenever today's sales or stock change
+        today = datetime.now().strftime('%Y-%m-%d')
+        show_reports(self.db.get_daily_sales(today))
+
+        def on_changes(changes):
+            if changes.sales_on(today) or changes.stock or changes.meals or changes.reloaded:
+                show_reports(self.db.get_daily_sales(today))
+
+        self.data_events.subscribe(on_changes, reports_window)
 
     def _open_audit_logs(self):
         """Open audit logs viewer"""
@@ -2924,9 +5653,6 @@ Need assistance? Contact system administrator.
         tk.Label(main_frame, text="🔍 Audit Logs - User Activity", 
                  font=('Poppins', 16, 'bold'), bg=BG_COLOR, fg=ACCENT_COLOR).pack(pady=10)
 
-        # Get recent activity
-        activity_data = self.db.get_user_activity(days=7)
-
         # Create treeview for audit logs
         columns = ("Timestamp", "User", "Activity", "Description")
         tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=15)
@@ -2943,70 +5669,75 @@ Need assistance? Contact system administrator.
 
         # Add scrollbar
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        self.virtual_grid(tree, scrollbar)
 
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Populate with audit data
-        for user, activity_type, description, timestamp in activity_data:
-            tree.insert("", tk.END, values=(
-                timestamp,
-                user,
-                activity_type,
-                description
-            ))
+        self._refresh_audit_logs(tree)
 
         # Add filter options
         filter_frame = tk.Frame(main_frame, bg=BG_COLOR)
         filter_frame.pack(fill=tk.X, pady=10)
 
+        # Searches every logged description, archived months included
+        search_var = tk.StringVar()
+        search_entry = tk.Entry(filter_frame, textvariable=search_var, font=FONT_SMALL, width=30)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<Return>", lambda e: self._refresh_audit_logs(tree, search_var.get()))
+
+        tk.Button(filter_frame, text="Search", font=FONT_SMALL,
+                  bg=ACCENT_COLOR, fg=FG_COLOR,
+                  command=lambda: self._refresh_audit_logs(tree, search_var.get())).pack(side=tk.LEFT, padx=5)
+
         tk.Button(filter_frame, text="Refresh", font=FONT_SMALL,
                   bg=BUTTON_COLOR, fg=FG_COLOR, 
-                  command=lambda: self._refresh_audit_logs(tree)).pack(side=tk.LEFT, padx=5)
+                  command=lambda: self._refresh_audit_logs(tree, search_var.get())).pack(side=tk.LEFT, padx=5)
 
         tk.Button(filter_frame, text="Export Logs", font=FONT_SMALL,
                   bg=SUCCESS_COLOR, fg=FG_COLOR,
                   command=self._export_audit_logs).pack(side=tk.LEFT, padx=5)
 
-    def _refresh_audit_logs(self, tree):
-        """Refresh audit logs treeview"""
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        activity_data = self.db.get_user_activity(days=7)
-        for user, activity_type, description, timestamp in activity_data:
-            tree.insert("", tk.END, values=(
+    def _refresh_audit_logs(self, tree, search=""):
+        """Refresh audit logs treeview with the last week, or the best matches for search"""
+        def to_values(row):
+            user, activity_type, description, timestamp = row
+            return (
                 timestamp,
                 user,
                 activity_type,
                 description
-            ))
-
-    def _export_audit_logs(self):
-        """Export audit logs to file"""
-        try:
-            export_dir = "audit_exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"audit_logs_export_{timestamp}.csv"
-            filepath = os.path.join(export_dir, filename)
+            )
 
-            activity_data = self.db.get_user_activity(days=30)
-            
-            with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                import csv
-                writer = csv.writer(f)
-                writer.writerow(["Timestamp", "User", "Activity Type", "Description"])
-                writer.writerows(activity_data)
+        if search.strip():
+            # Best match first until a column is sorted
+            rows = ListRows(self.db.search_user_activity(search, limit=500),
+                            {"Timestamp": 3, "User": 0, "Activity": 1, "Description": 2})
+        else:
+            rows = QueryRows.from_cursor(self.db.page_user_activity(days=7), {
+                "Timestamp": ("timestamp",), "User": ("user",),
+                "Activity": ("activity_type",), "Description": ("description",),
+            })
+        self.show_rows(tree, rows, to_values)
 
-            messagebox.showinfo("Export Successful", 
-                              f"Audit logs exported to:\n{filepath}", 
-                              parent=self.root)
-        except Exception as e:
-            messagebox.showerror("Export Failed", f"Failed to export audit logs:\n{str(e)}", parent=self.root)
+    def _export_audit_logs(self):
+        """Export the last 30 days of audit logs to file"""
+        # Entries still queued for the log writer belong in the export
+        self.db.activity.flush()
+        date_limit = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        self.run_export([ExportJob(
+            "audit_logs_export",
+            '''
+                SELECT timestamp, user, activity_type, description
+                FROM {source}
+                WHERE timestamp >= ?
+                ORDER BY timestamp DESC
+            ''',
+            (date_limit,),
+            headers=["Timestamp", "User", "Activity Type", "Description"],
+            archived=("user_activity", date_limit)
+        )], "audit_exports", title="Exporting Audit Logs")
 
     def _open_system_settings(self):
         """Open system settings quick access"""
@@ -3294,6 +6025,7 @@ Need assistance? Contact system administrator.
         maintenance_buttons = [
             ("Check Updates", self.check_for_updates, BUTTON_COLOR),
             ("Export Data", self.export_system_data, SUCCESS_COLOR),
+            ("Export Changes", self.export_changes, SUCCESS_COLOR),
             ("Clear Cache", self.clear_cache, ACCENT_COLOR),
             ("Test Printer", self.test_printer, BUTTON_COLOR)
         ]
@@ -3365,13 +6097,9 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
             # Initial status display
             self.update_status_display(status_frame)
 
-            # Auto-refresh every 30 seconds
-            def auto_refresh():
-                if status_window.winfo_exists():
-                    self.update_status_display(status_frame)
-                    status_window.after(30000, auto_refresh)  # Refresh every 30 seconds
-
-            status_window.after(30000, auto_refresh)
+            # Refresh whenever data changes rather than on a timer; a burst of changes refreshes once,
+            # and only the labels whose status changed are touched
+            self.data_events.subscribe(lambda changes: self.update_status_display(status_frame), status_window)
 
             # Close button
             tk.Button(main_frame, text="Close", font=FONT_MEDIUM,
@@ -3395,10 +6123,13 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
 
     def confirm_exit(self):
         if messagebox.askyesno("Exit", "Are you sure you want to exit?", parent=self.root):
+            # Write out queued activity before the process goes away
+            self.db.activity.close()
             self.root.destroy()
 
     def confirm_logout(self):
         if messagebox.askyesno("Logout", "Are you sure you want to logout?", parent=self.root):
+            self.db.activity.flush()
             was_manager = self.manager_mode
             self.current_user = None
             self.manager_mode = False
@@ -3417,63 +6148,48 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
 
 
     def update_status_display(self, status_frame):
-        """Update the status display with current system information"""
-        try:
-            # Clear previous status display
-            for widget in status_frame.winfo_children():
-                widget.destroy()
+        """Update the status display with current system information
 
+        The widgets are built once; later refreshes only reconfigure the labels whose
+        status changed, unless the set of rows itself changed.
+        """
+        try:
             # Get current timestamp
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # Create status sections
-            sections = [
-                ("🖥️ SYSTEM STATUS", self.get_system_status()),
-                ("💾 DATABASE STATUS", self.get_database_status()),
-              
-               
-                ("📦 STOCK STATUS", self.get_stock_status()),
-                ("👥 USER ACTIVITY", self.get_user_activity_status())
-            ]
-
-            for section_title, section_data in sections:
-                # Section header
-                section_header = tk.Frame(status_frame, bg=BG_COLOR)
-                section_header.pack(fill=tk.X, pady=(10, 5))
-                
-                tk.Label(section_header, text=section_title, font=('Poppins', 12, 'bold'),
-                        bg=BG_COLOR, fg=ACCENT_COLOR).pack(anchor=tk.W)
+            # Create status sections, all read from one snapshot
+            with self.db.snapshot():
+                sections = [
+                    ("🖥️ SYSTEM STATUS", self.get_system_status()),
+                    ("💾 DATABASE STATUS", self.get_database_status()),
+                    ("📦 STOCK STATUS", self.get_stock_status()),
+                    ("👥 USER ACTIVITY", self.get_user_activity_status())
+                ]
 
-                # Section content
-                section_content = tk.Frame(status_frame, bg=BG_COLOR)
-                section_content.pack(fill=tk.X, padx=10, pady=(0, 10))
+            keys = [(section_title, item_text) for section_title, section_data in sections
+                    for item_text, _, _ in section_data]
+            display = self.status_displays.get(status_frame)
+            if display is None or list(display[0]) != keys:
+                display = self.build_status_display(status_frame, sections)
 
+            rows, update_label = display
+            for section_title, section_data in sections:
                 for item_text, item_status, item_color in section_data:
-                    item_frame = tk.Frame(section_content, bg=BG_COLOR)
-                    item_frame.pack(fill=tk.X, pady=2)
-
-                    # Status indicator
-                    status_circle = tk.Label(item_frame, text="●", font=('Arial', 12),
-                                           bg=BG_COLOR, fg=item_color)
-                    status_circle.pack(side=tk.LEFT, padx=(0, 10))
-
-                    # Item text
-                    tk.Label(item_frame, text=item_text, font=FONT_SMALL,
-                            bg=BG_COLOR, fg=FG_COLOR, anchor=tk.W).pack(side=tk.LEFT)
-
-                    # Status text (right-aligned)
-                    tk.Label(item_frame, text=item_status, font=FONT_SMALL,
-                            bg=BG_COLOR, fg=item_color, anchor=tk.E).pack(side=tk.RIGHT)
+                    key = (section_title, item_text)
+                    status_circle, status_label, shown = rows[key]
+                    if shown == (item_status, item_color):
+                        continue
+                    status_circle.config(fg=item_color)
+                    status_label.config(text=item_status, fg=item_color)
+                    rows[key] = (status_circle, status_label, (item_status, item_color))
 
-            # Last update time
-            update_frame = tk.Frame(status_frame, bg=BG_COLOR)
-            update_frame.pack(fill=tk.X, pady=10)
-            
-            tk.Label(update_frame, text=f"Last Updated: {current_time}", 
-                    font=('Poppins', 10, 'italic'), bg=BG_COLOR, fg=FG_COLOR).pack()
+            update_label.config(text=f"Last Updated: {current_time}")
 
         except Exception as e:
-            # Error display
+            # Error display, replacing the rows; the next refresh builds them again
+            self.status_displays.pop(status_frame, None)
+            for widget in status_frame.winfo_children():
+                widget.destroy()
             error_frame = tk.Frame(status_frame, bg=BG_COLOR)
             error_frame.pack(fill=tk.BOTH, expand=True)
             
@@ -3482,6 +6198,54 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
             tk.Label(error_frame, text=str(e), font=FONT_SMALL, 
                     bg=BG_COLOR, fg=FG_COLOR, wraplength=500).pack(pady=5)
 
+    def build_status_display(self, status_frame, sections):
+        """Lay out the status rows in status_frame and register their labels; statuses are filled in after"""
+        # Clear previous status display, and forget frames whose window has closed
+        for widget in status_frame.winfo_children():
+            widget.destroy()
+        self.status_displays = {frame: display for frame, display in self.status_displays.items()
+                                if frame.winfo_exists()}
+
+        rows = {}
+        for section_title, section_data in sections:
+            # Section header
+            section_header = tk.Frame(status_frame, bg=BG_COLOR)
+            section_header.pack(fill=tk.X, pady=(10, 5))
+            
+            tk.Label(section_header, text=section_title, font=('Poppins', 12, 'bold'),
+                    bg=BG_COLOR, fg=ACCENT_COLOR).pack(anchor=tk.W)
+
+            # Section content
+            section_content = tk.Frame(status_frame, bg=BG_COLOR)
+            section_content.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+            for item_text, _, _ in section_data:
+                item_frame = tk.Frame(section_content, bg=BG_COLOR)
+                item_frame.pack(fill=tk.X, pady=2)
+
+                # Status indicator
+                status_circle = tk.Label(item_frame, text="●", font=('Arial', 12), bg=BG_COLOR)
+                status_circle.pack(side=tk.LEFT, padx=(0, 10))
+
+                # Item text
+                tk.Label(item_frame, text=item_text, font=FONT_SMALL,
+                        bg=BG_COLOR, fg=FG_COLOR, anchor=tk.W).pack(side=tk.LEFT)
+
+                # Status text (right-aligned)
+                status_label = tk.Label(item_frame, font=FONT_SMALL, bg=BG_COLOR, anchor=tk.E)
+                status_label.pack(side=tk.RIGHT)
+                rows[(section_title, item_text)] = (status_circle, status_label, None)
+
+        # Last update time
+        update_frame = tk.Frame(status_frame, bg=BG_COLOR)
+        update_frame.pack(fill=tk.X, pady=10)
+        
+        update_label = tk.Label(update_frame, font=('Poppins', 10, 'italic'), bg=BG_COLOR, fg=FG_COLOR)
+        update_label.pack()
+
+        self.status_displays[status_frame] = (rows, update_label)
+        return rows, update_label
+
     def get_system_status(self):
         """Get current system status information"""
         try:
@@ -3524,16 +6288,16 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
                 size_mb = os.path.getsize(db_file) / (1024 * 1024)
                 status_items.append(("File Size", f"{size_mb:.2f} MB", ACCENT_COLOR))
                 
-                # Table counts
-                tables = self.db.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
-                status_items.append(("Tables", str(len(tables)), SUCCESS_COLOR))
-                
-                # Total records
-                total_records = 0
-                for table in tables:
-                    count = self.db.cursor.execute(f"SELECT COUNT(*) FROM {table[0]}").fetchone()[0]
-                    total_records += count
-                status_items.append(("Total Records", f"{total_records:,}", ACCENT_COLOR))
+                # Record counts, kept current by triggers rather than counted here
+                stats = self.db.stats.current()
+                status_items.append(("Tables", str(stats["table_count"]), SUCCESS_COLOR))
+                status_items.append(("Total Records", f"{sum(stats['row_counts'].values()):,}", ACCENT_COLOR))
+
+                # Pages left empty by deletes, which only VACUUM gives back to the disk
+                free_mb = stats["freelist_count"] * stats["page_size"] / (1024 * 1024)
+                free_share = stats["freelist_count"] / stats["page_count"] if stats["page_count"] else 0
+                status_items.append(("Free Space", f"{free_mb:.2f} MB ({free_share:.0%})",
+                                     ERROR_COLOR if free_share > 0.25 else ACCENT_COLOR))
                 
                 # Last activity
                 last_activity = self.db.cursor.execute(
@@ -3560,8 +6324,10 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
             if not hasattr(self, 'db'):
                 return [("Stock Data", "Database not available", ERROR_COLOR)]
             
+            active_items = [item for item in self.db.catalog.items.values() if item.is_active]
+
             # Total items
-            total_items = self.db.cursor.execute("SELECT COUNT(*) FROM meals WHERE is_active=1").fetchone()[0]
+            total_items = len(active_items)
             status_items.append(("Active Items", str(total_items), SUCCESS_COLOR))
             
             # Low stock items
@@ -3572,10 +6338,8 @@ Regular Maintenance Hours: 8:00 AM - 6:00 PM
           
             
             # Total stock value (approximate)
-            stock_value = self.db.cursor.execute(
-                "SELECT SUM(current_stock * buying_price) FROM meals WHERE is_active=1"
-            ).fetchone()[0] or 0
-            status_items.append(("Stock Value", f"Ksh {stock_value:.2f}", ACCENT_COLOR))
+            stock_value = sum(item.current_stock * item.buying_price for item in active_items)
+            status_items.append(("Stock Value", f"Ksh {format_money(stock_value)}", ACCENT_COLOR))
             
             return status_items
             
@@ -3856,8 +6620,7 @@ Permissions:
     def optimize_database(self):
         """Optimize database performance"""
         try:
-            self.db.conn.execute("VACUUM")
-            self.db.conn.commit()
+            self.db.optimize()
             messagebox.showinfo("Database Optimized", "Database optimization completed successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to optimize database: {str(e)}")
@@ -3866,71 +6629,178 @@ Permissions:
         """Clear system logs with confirmation"""
         if messagebox.askyesno("Clear Logs", "Are you sure you want to clear all system logs?"):
             try:
-                self.db.cursor.execute("DELETE FROM user_activity WHERE timestamp < date('now', '-30 days')")
-                self.db.conn.commit()
+                self.db.purge_user_activity(30)
                 messagebox.showinfo("Logs Cleared", "System logs cleared successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to clear logs: {str(e)}")
 
     def backup_database(self):
-        """Create a backup of the database with timestamp"""
+        """Create a backup of the database with timestamp while the till stays online"""
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Backing Up Database")
+        progress_window.geometry("400x150")
+        progress_window.configure(bg=BG_COLOR)
+        progress_window.transient(self.root)
+
+        tk.Label(progress_window, text="Backing up database...", 
+                 font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=10)
+
+        progress = ttk.Progressbar(progress_window, mode='determinate', length=300)
+        progress.pack(pady=10)
+
+        status_label = tk.Label(progress_window, text="Starting...", font=FONT_SMALL,
+                                bg=BG_COLOR, fg=FG_COLOR)
+        status_label.pack()
+
+        def on_progress(copied, total):
+            if progress_window.winfo_exists():
+                progress['value'] = (copied / total) * 100 if total else 100
+                status_label.config(text=f"{copied} of {total} pages copied")
+
+        def on_complete(snapshot, error):
+            if progress_window.winfo_exists():
+                progress_window.destroy()
+            if error:
+                messagebox.showerror("Backup Failed", 
+                                    f"Failed to create database backup:\n{error}")
+            else:
+                messagebox.showinfo("Backup Successful", 
+                                   f"Database backup created successfully!\n\n"
+                                   f"Snapshot: {snapshot['id']}\n"
+                                   f"Database size: {snapshot['size'] / (1024*1024):.2f} MB\n"
+                                   f"New data stored: {snapshot['new_bytes'] / (1024*1024):.2f} MB\n"
+                                   f"Location: {BACKUP_DIR}")
+
         try:
-            import shutil
-            from datetime import datetime
-            
-            # Create backups directory if it doesn't exist
-            backups_dir = "database_backups"
-            if not os.path.exists(backups_dir):
-                os.makedirs(backups_dir)
-            
-            # Create timestamped backup filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"hotel_backup_{timestamp}.db"
-            backup_path = os.path.join(backups_dir, backup_filename)
-            
-            # Close database connection temporarily
-            self.db.conn.close()
-            
-            # Copy database file
-            shutil.copy2(DATABASE_FILE, backup_path)
-            
-            # Reopen database connection
-            self.db.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-            self.db.cursor = self.db.conn.cursor()
-            
-            # Record backup activity
-            self.db.cursor.execute('''
-                INSERT INTO user_activity (user, activity_type, description)
-                VALUES (?, ?, ?)
-            ''', (self.current_user or 'system', 'system', f'Database backup created: {backup_filename}'))
-            self.db.conn.commit()
-            
-            messagebox.showinfo("Backup Successful", 
-                               f"Database backup created successfully!\n\n"
-                               f"Backup file: {backup_filename}\n"
-                               f"Location: {backups_dir}")
-                               
+            self.start_backup(on_progress, on_complete)
         except Exception as e:
+            progress_window.destroy()
             messagebox.showerror("Backup Failed", 
                                 f"Failed to create database backup:\n{str(e)}")
-            # Reopen database connection if it failed
+
+    def start_backup(self, on_progress=None, on_complete=None, automatic=False):
+        """Run an online backup into the backup repository on a worker thread
+
+        Callbacks are delivered on the Tk thread: on_progress(copied, total)
+        while pages are copied and on_complete(snapshot, error) at the end.
+        """
+        label = "auto" if automatic else "manual"
+        # Consistent copy of the live database, ingested into the repository and then removed
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        copy_path = os.path.join(BACKUP_DIR, f".snapshot_{timestamp}_{label}.db")
+
+        events = queue.Queue()
+
+        def perform_backup():
+            try:
+                self.db.backup_to(copy_path, progress=lambda status, remaining, total:
+                                  events.put(("progress", total - remaining, total)))
+                snapshot = self.backup_repo.create_snapshot(copy_path, label)
+                # Every backup, manual or automatic, applies the retention schedule
+                self.prune_backups()
+                events.put(("done", None, snapshot))
+            except Exception as e:
+                events.put(("done", str(e), None))
+            finally:
+                try:
+                    os.remove(copy_path)
+                except OSError:
+                    pass
+
+        def poll_events():
+            while True:
+                try:
+                    kind, value, total = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    if on_progress:
+                        on_progress(value, total)
+                    continue
+
+                error, snapshot = value, total
+                if not error:
+                    # Record backup activity
+                    kind_text = "Automatic database backup" if automatic else "Database backup"
+                    try:
+                        self.db.log_activity(self.current_user or 'system', 'system', f'{kind_text} created: snapshot {snapshot["id"]}')
+                    except sqlite3.Error as e:
+                        print(f"Error recording backup activity: {str(e)}")
+                if on_complete:
+                    on_complete(snapshot, error)
+                return
+            self.root.after(100, poll_events)
+
+        threading.Thread(target=perform_backup, daemon=True).start()
+        self.root.after(100, poll_events)
+
+    def schedule_auto_backup(self):
+        """Arm the automatic backup timer from the backup settings"""
+        if getattr(self, '_auto_backup_job', None):
+            self.root.after_cancel(self._auto_backup_job)
+            self._auto_backup_job = None
+        if not self.config.get("auto_backup", False):
+            return
+        # Check once a minute whether a backup is due
+        self._auto_backup_job = self.root.after(60000, self.run_auto_backup_if_due)
+
+    def run_auto_backup_if_due(self):
+        """Take an automatic backup when the configured interval has passed, then re-arm"""
+        self._auto_backup_job = None
+        interval = BACKUP_INTERVALS.get(self.config.get("backup_frequency", "daily"), BACKUP_INTERVALS["daily"])
+        last_backup = self.config.get("last_auto_backup")
+        due = not last_backup or datetime.now() - datetime.fromisoformat(last_backup) >= interval
+
+        if due:
+            def on_complete(snapshot, error):
+                if error:
+                    print(f"Automatic backup failed: {error}")
+                    return
+                self.config["last_auto_backup"] = datetime.now().isoformat(timespec='seconds')
+                save_full_config(self.config)
+
+            try:
+                self.start_backup(on_complete=on_complete, automatic=True)
+            except Exception as e:
+                print(f"Automatic backup failed: {str(e)}")
+
+        self.schedule_auto_backup()
+
+    def prune_backups(self):
+        """Apply the retention schedule to the backup repository and legacy backup files"""
+        retention_days = self.config.get("backup_retention", 30)
+        policy = self.config.get("backup_retention_policy", DEFAULT_RETENTION_POLICY)
+        try:
+            self.backup_repo.apply_retention(policy, retention_days)
+        except (OSError, ValueError) as e:
+            print(f"Error applying backup retention: {str(e)}")
+
+        # Full-copy backups taken before the repository existed
+        cutoff = time.time() - retention_days * 86400
+        for backup_file in os.listdir(BACKUP_DIR):
+            if not (backup_file.startswith('hotel_backup_') and backup_file.endswith('.db')):
+                continue
+            file_path = os.path.join(BACKUP_DIR, backup_file)
             try:
-                self.db.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-                self.db.cursor = self.db.conn.cursor()
-            except:
-                pass
+                if os.path.getmtime(file_path) < cutoff:
+                    os.remove(file_path)
+            except OSError as e:
+                print(f"Error pruning backup {backup_file}: {str(e)}")
 
     def restore_database(self):
         """Restore database from backup with confirmation and validation"""
         try:
-            backups_dir = "database_backups"
+            backups_dir = BACKUP_DIR
             if not os.path.exists(backups_dir):
                 messagebox.showwarning("No Backups", "No backup directory found.")
                 return
             
-            # Get list of backup files
-            backup_files = [f for f in os.listdir(backups_dir) if f.endswith('.db') and f.startswith('hotel_backup_')]
-            if not backup_files:
+            # Repository snapshots first, then any full-copy backups from before the repository
+            snapshots = self.backup_repo.list_snapshots()
+            backup_files = sorted((f for f in os.listdir(backups_dir)
+                                   if f.endswith('.db') and f.startswith('hotel_backup_')), reverse=True)
+            backups = [("snapshot", entry) for entry in snapshots] + [("file", f) for f in backup_files]
+            if not backups:
                 messagebox.showwarning("No Backups", "No backup files found.")
                 return
             
@@ -3957,13 +6827,18 @@ Permissions:
             scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
             listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             
-            # Add backup files to listbox with file info
-            for backup_file in sorted(backup_files, reverse=True):
-                file_path = os.path.join(backups_dir, backup_file)
-                file_time = os.path.getmtime(file_path)
-                file_date = datetime.fromtimestamp(file_time).strftime("%Y-%m-%d %H:%M:%S")
-                file_size = os.path.getsize(file_path) / (1024*1024)  # Size in MB
-                listbox.insert(tk.END, f"{backup_file} ({file_date}) - {file_size:.2f} MB")
+            # Add backups to listbox from the index, without touching the backup data
+            for kind, backup in backups:
+                if kind == "snapshot":
+                    created = backup["created"].replace("T", " ")
+                    size = backup["size"] / (1024*1024)  # Size in MB
+                    listbox.insert(tk.END, f"{backup['id']} [{backup['label']}] ({created}) - {size:.2f} MB")
+                else:
+                    file_path = os.path.join(backups_dir, backup)
+                    file_time = os.path.getmtime(file_path)
+                    file_date = datetime.fromtimestamp(file_time).strftime("%Y-%m-%d %H:%M:%S")
+                    file_size = os.path.getsize(file_path) / (1024*1024)  # Size in MB
+                    listbox.insert(tk.END, f"{backup} ({file_date}) - {file_size:.2f} MB (full copy)")
             
             def perform_restore():
                 selection = listbox.curselection()
@@ -3971,8 +6846,8 @@ Permissions:
                     messagebox.showwarning("No Selection", "Please select a backup file to restore.")
                     return
                 
-                backup_file = backup_files[selection[0]]
-                backup_path = os.path.join(backups_dir, backup_file)
+                kind, backup = backups[selection[0]]
+                backup_file = backup["id"] if kind == "snapshot" else backup
                 
                 # Confirm restoration
                 if not messagebox.askyesno("Confirm Restore", 
@@ -3981,40 +6856,71 @@ Permissions:
                                          f"All current data will be lost. Continue?"):
                     return
                 
-                try:
-                    # Close current database connection
-                    self.db.conn.close()
-                    
-                    # Create backup of current database before restore
-                    current_backup = f"pre_restore_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                    shutil.copy2(DATABASE_FILE, os.path.join(backups_dir, current_backup))
-                    
-                    # Restore from selected backup
-                    shutil.copy2(backup_path, DATABASE_FILE)
-                    
-                    # Reinitialize database connection
-                    self.db.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-                    self.db.cursor = self.db.conn.cursor()
-                    
-                    messagebox.showinfo("Restore Successful", 
-                                       f"Database restored successfully from:\n{backup_file}\n\n"
-                                       f"Current database backed up as: {current_backup}")
-                    
-                    restore_window.destroy()
-                    
-                    # Restart application to reload data
-                    if messagebox.askyesno("Restart Required", "Application needs to restart to load restored data. Restart now?"):
-                        self.root.destroy()
-                        # Note: In a real application, you'd restart the app here
-                        
-                except Exception as e:
-                    messagebox.showerror("Restore Failed", f"Failed to restore database:\n{str(e)}")
-                    # Try to reconnect to original database
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                restore_path = os.path.join(backups_dir, f".restore_{timestamp}.db")
+                copy_path = os.path.join(backups_dir, f".snapshot_{timestamp}_pre-restore.db")
+
+                restore_window.destroy()
+                progress_window = tk.Toplevel(self.root)
+                progress_window.title("Restoring Database")
+                progress_window.geometry("400x150")
+                progress_window.configure(bg=BG_COLOR)
+                progress_window.transient(self.root)
+                progress_window.grab_set()
+
+                tk.Label(progress_window, text=f"Restoring {backup_file}...",
+                         font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=10)
+                progress = ttk.Progressbar(progress_window, mode='determinate', length=300)
+                progress.pack(pady=10)
+                status_label = tk.Label(progress_window, text="Saving current database...",
+                                        font=FONT_SMALL, bg=BG_COLOR, fg=FG_COLOR)
+                status_label.pack()
+
+                def show_progress(text, copied, total):
+                    if progress_window.winfo_exists():
+                        status_label.config(text=text)
+                        progress['value'] = (copied / total) * 100 if total else 100
+
+                def finish_restore(current_backup, error):
+                    if progress_window.winfo_exists():
+                        progress_window.destroy()
+                    if error:
+                        messagebox.showerror("Restore Failed", f"Failed to restore database:\n{error}")
+                    else:
+                        messagebox.showinfo("Restore Successful", 
+                                           f"Database restored successfully from:\n{backup_file}\n\n"
+                                           f"Current database backed up as snapshot: {current_backup}")
+
+                def perform_hot_restore():
+                    current_backup = None
                     try:
-                        self.db.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-                        self.db.cursor = self.db.conn.cursor()
-                    except:
-                        pass
+                        # Create backup of current database before restore
+                        self.db.backup_to(copy_path)
+                        current_backup = self.backup_repo.create_snapshot(copy_path, "pre-restore")["id"]
+
+                        # Reassemble the snapshot, or use the full-copy file directly
+                        if kind == "snapshot":
+                            self.backup_repo.restore_to(backup["id"], restore_path)
+                            backup_path = restore_path
+                        else:
+                            backup_path = os.path.join(backups_dir, backup)
+
+                        # Copy the backup into the live database; the DataReloaded it publishes
+                        # refreshes the open screens through apply_data_changes
+                        self.db.restore_from(backup_path, progress=lambda status, remaining, total:
+                                             self.call_on_ui_thread(show_progress, "Restoring pages...",
+                                                                    total - remaining, total))
+                        self.call_on_ui_thread(finish_restore, current_backup, None)
+                    except Exception as e:
+                        self.call_on_ui_thread(finish_restore, current_backup, str(e))
+                    finally:
+                        for temp_path in (restore_path, copy_path):
+                            try:
+                                os.remove(temp_path)
+                            except OSError:
+                                pass
+
+                threading.Thread(target=perform_hot_restore, daemon=True).start()
             
             button_frame = tk.Frame(restore_window, bg=BG_COLOR)
             button_frame.pack(pady=10)
@@ -4047,27 +6953,19 @@ Permissions:
             
             def perform_optimization():
                 try:
-                    # Perform VACUUM to defragment database
-                    self.db.conn.execute("VACUUM")
-                    
-                    # Analyze for better query performance
-                    self.db.conn.execute("ANALYZE")
-                    
-                    # Update statistics
-                    self.db.conn.execute("PRAGMA optimize")
-                    
-                    self.db.conn.commit()
+                    # Move closed months out to their archive files so VACUUM has less to rewrite
+                    archived = self.db.archive_closed_months()
+
+                    # Defragment, then refresh the query planner statistics
+                    self.db.optimize()
                     
                     # Record optimization activity
-                    self.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_user or 'system', 'system', 'Database optimization performed'))
-                    self.db.conn.commit()
+                    self.db.log_activity(self.current_user or 'system', 'system', 'Database optimization performed')
                     
                     progress_window.destroy()
                     messagebox.showinfo("Optimization Complete", 
                                        "Database optimization completed successfully!\n\n"
+                                       f"• {len(archived)} closed month(s) archived\n"
                                        "• Database defragmented\n"
                                        "• Query statistics updated\n"
                                        "• Performance optimized")
@@ -4170,9 +7068,7 @@ Permissions:
                     cleared_counts = {}
                     
                     if log_vars['user_activity'].get():
-                        cleared_counts['user_activity'] = self.db.cursor.execute(
-                            "DELETE FROM user_activity WHERE timestamp < date('now', '-30 days')"
-                        ).rowcount
+                        cleared_counts['user_activity'] = self.db.purge_user_activity(30)
                     
                     if log_vars['old_sales'].get():
                         # For sales, we might want to archive instead of delete
@@ -4185,18 +7081,10 @@ Permissions:
                         messagebox.showinfo("Note", "Sales records are preserved for historical reporting.")
                     
                     if log_vars['stock_history'].get():
-                        cleared_counts['stock_history'] = self.db.cursor.execute(
-                            "DELETE FROM stock_history WHERE date < date('now', '-6 months')"
-                        ).rowcount
-                    
-                    self.db.conn.commit()
+                        cleared_counts['stock_history'] = self.db.purge_stock_history(6)
                     
                     # Record the activity
-                    self.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_user or 'system', 'system', 'System logs cleared'))
-                    self.db.conn.commit()
+                    self.db.log_activity(self.current_user or 'system', 'system', 'System logs cleared', durable=True)
                     
                     summary = "Log clearing completed:\n"
                     for log_type, count in cleared_counts.items():
@@ -5119,6 +8007,8 @@ Permissions:
         freq_frame = tk.Frame(self.backup_settings_frame, bg=BG_COLOR)
         freq_frame.pack(fill=tk.X, pady=2)
         
+        tk.Radiobutton(freq_frame, text="Hourly", variable=self.backup_freq_var,
+                      value="hourly", bg=BG_COLOR, fg=FG_COLOR, font=FONT_SMALL).pack(side=tk.LEFT)
         tk.Radiobutton(freq_frame, text="Daily", variable=self.backup_freq_var,
                       value="daily", bg=BG_COLOR, fg=FG_COLOR, font=FONT_SMALL).pack(side=tk.LEFT)
         tk.Radiobutton(freq_frame, text="Weekly", variable=self.backup_freq_var,
@@ -5141,6 +8031,23 @@ Permissions:
         tk.Radiobutton(retention_frame, text="90 days", variable=self.backup_retention_var,
                       value=90, bg=BG_COLOR, fg=FG_COLOR, font=FONT_SMALL).pack(side=tk.LEFT)
 
+        # Retention schedule: how many hourly/daily/weekly snapshots to keep
+        tk.Label(self.backup_settings_frame, text="Snapshots To Keep:", font=FONT_SMALL,
+                 bg=BG_COLOR, fg=FG_COLOR).pack(anchor="w", pady=2)
+
+        policy = self.config.get("backup_retention_policy", DEFAULT_RETENTION_POLICY)
+        schedule_frame = tk.Frame(self.backup_settings_frame, bg=BG_COLOR)
+        schedule_frame.pack(fill=tk.X, pady=2)
+
+        self.backup_policy_vars = {}
+        for period in ("hourly", "daily", "weekly"):
+            tk.Label(schedule_frame, text=f"{period.title()}:", font=FONT_SMALL,
+                     bg=BG_COLOR, fg=FG_COLOR).pack(side=tk.LEFT, padx=(0, 2))
+            var = tk.IntVar(value=policy.get(period, DEFAULT_RETENTION_POLICY[period]))
+            tk.Spinbox(schedule_frame, from_=0, to=365, width=4, textvariable=var,
+                       font=FONT_SMALL).pack(side=tk.LEFT, padx=(0, 10))
+            self.backup_policy_vars[period] = var
+
         # Backup location
         tk.Label(self.backup_settings_frame, text="Backup Location:", font=FONT_SMALL,
                  bg=BG_COLOR, fg=FG_COLOR).pack(anchor="w", pady=2)
@@ -5165,8 +8072,16 @@ Permissions:
             self.config["backup_frequency"] = self.backup_freq_var.get()
             self.config["backup_retention"] = self.backup_retention_var.get()
             self.config["backup_location"] = self.backup_loc_var.get()
+            try:
+                self.config["backup_retention_policy"] = {
+                    period: var.get() for period, var in self.backup_policy_vars.items()
+                }
+            except tk.TclError:
+                messagebox.showerror("Invalid Value", "Snapshot counts must be whole numbers.", parent=backup_window)
+                return
             
             save_full_config(self.config)
+            self.schedule_auto_backup()
             messagebox.showinfo("Saved", "Backup settings saved successfully!", parent=backup_window)
             backup_window.destroy()
 
@@ -5381,14 +8296,11 @@ Permissions:
             
             # Log security settings application
             if hasattr(self, 'db'):
-                self.db.cursor.execute('''
-                    INSERT INTO user_activity (user, activity_type, description)
-                    VALUES (?, ?, ?)
-                ''', (self.current_user or 'system', 'security', 
-                      f'Security settings updated: timeout={timeout_minutes}min, '
-                      f'max_attempts={max_attempts}, lockout={lockout_duration}min, '
-                      f'strong_passwords={strong_passwords}, auto_logout={auto_logout}'))
-                self.db.conn.commit()
+                self.db.log_activity(self.current_user or 'system', 'security', 
+                                     f'Security settings updated: timeout={timeout_minutes}min, '
+                                     f'max_attempts={max_attempts}, lockout={lockout_duration}min, '
+                                     f'strong_passwords={strong_passwords}, auto_logout={auto_logout}',
+                                     durable=True)
             
             print(f"Security settings applied system-wide:")
             print(f"  - Session timeout: {timeout_minutes} minutes")
@@ -5467,90 +8379,118 @@ Permissions:
             raise Exception(f"Printing failed: {str(e)}")
 
     def export_system_data(self):
-        """Export system data to CSV files with proper error handling"""
+        """Export sales, inventory and user activity, streamed in parallel to compressed files"""
+        self.db.activity.flush()
+        self.run_export([
+            ExportJob("sales_export", "SELECT * FROM sales ORDER BY date DESC, time DESC", total_from="sales"),
+            ExportJob("inventory_export", "SELECT * FROM meals WHERE is_active=1 ORDER BY category, name",
+                      total_from="meals"),
+            ExportJob("activity_export", "SELECT * FROM user_activity ORDER BY timestamp DESC",
+                      total_from="user_activity"),
+        ], "system_exports", title="Exporting System Data", activity="System data exported")
+
+    def export_changes(self):
+        """Export only the sales, activity and meal changes made since the last incremental export"""
+        self.db.activity.flush()
         try:
-            # Create exports directory
-            export_dir = "system_exports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
+            jobs, marks = self.db.change_capture_jobs()
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Failed to prepare incremental export: {str(e)}")
+            return
 
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            exported_files = []
+        def advance(results):
+            # A failed table keeps its old watermark and is sent again next time
+            done = [marks[name] for name, (_, _, error) in results.items() if not error]
+            if done:
+                self.db.advance_export_watermarks(done)
 
-            # Export sales data
-            try:
-                self.db.cursor.execute("SELECT * FROM sales ORDER BY date DESC, time DESC")
-                sales_data = self.db.cursor.fetchall()
-                if sales_data:
-                    filename = f"sales_export_{timestamp}.csv"
-                    filepath = os.path.join(export_dir, filename)
-                    
-                    with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                        import csv
-                        writer = csv.writer(f)
-                        # Write headers
-                        column_names = [description[0] for description in self.db.cursor.description]
-                        writer.writerow(column_names)
-                        # Write data
-                        writer.writerows(sales_data)
-                    exported_files.append(f"Sales: {len(sales_data)} records")
-            except Exception as e:
-                exported_files.append(f"Sales: Error - {str(e)}")
+        self.run_export(jobs, "system_exports", title="Exporting Changes",
+                        activity="Incremental changes exported", on_complete=advance)
 
-            # Export inventory data
-            try:
-                self.db.cursor.execute("SELECT * FROM meals WHERE is_active=1 ORDER BY category, name")
-                inventory_data = self.db.cursor.fetchall()
-                if inventory_data:
-                    filename = f"inventory_export_{timestamp}.csv"
-                    filepath = os.path.join(export_dir, filename)
-                    
-                    with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                        import csv
-                        writer = csv.writer(f)
-                        column_names = [description[0] for description in self.db.cursor.description]
-                        writer.writerow(column_names)
-                        writer.writerows(inventory_data)
-                    exported_files.append(f"Inventory: {len(inventory_data)} items")
-            except Exception as e:
-                exported_files.append(f"Inventory: Error - {str(e)}")
+    def run_export(self, jobs, export_dir, title="Exporting Data", activity=None, on_complete=None):
+        """Stream ExportJobs into export_dir on worker threads behind a progress window
 
-            # Export user activity
-            try:
-                self.db.cursor.execute("SELECT * FROM user_activity ORDER BY timestamp DESC")
-                activity_data = self.db.cursor.fetchall()
-                if activity_data:
-                    filename = f"activity_export_{timestamp}.csv"
-                    filepath = os.path.join(export_dir, filename)
-                    
-                    with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                        import csv
-                        writer = csv.writer(f)
-                        column_names = [description[0] for description in self.db.cursor.description]
-                        writer.writerow(column_names)
-                        writer.writerows(activity_data)
-                    exported_files.append(f"User Activity: {len(activity_data)} records")
-            except Exception as e:
-                exported_files.append(f"User Activity: Error - {str(e)}")
+        The format comes from the "export_format" setting ("csv" or "jsonl"); files
+        are gzip-compressed. activity, if given, is logged once the export finishes,
+        and on_complete(results) is called on the UI thread before the summary shows.
+        """
+        try:
+            exporter = DataExporter(self.db, export_dir, fmt=self.config.get("export_format", "csv"))
+        except ValueError as e:
+            messagebox.showerror("Export Error", str(e))
+            return
 
-            # Record export activity
-            try:
-                self.db.cursor.execute('''
-                    INSERT INTO user_activity (user, activity_type, description)
-                    VALUES (?, ?, ?)
-                ''', (self.current_user or 'system', 'export', 
-                      f'System data exported: {len(exported_files)} files'))
-                self.db.conn.commit()
-            except Exception as e:
-                print(f"Error recording export activity: {str(e)}")
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title(title)
+        progress_window.geometry("400x150")
+        progress_window.configure(bg=BG_COLOR)
+        progress_window.transient(self.root)
+
+        tk.Label(progress_window, text=f"{title}...",
+                 font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=10)
+
+        progress = ttk.Progressbar(progress_window, mode='determinate', length=300)
+        progress.pack(pady=10)
+
+        status_label = tk.Label(progress_window, text="Starting...", font=FONT_SMALL,
+                                bg=BG_COLOR, fg=FG_COLOR)
+        status_label.pack()
+
+        events = queue.Queue()
+        job_progress = {job.name: (0, None) for job in jobs}
+
+        def poll_events():
+            results = None
+            while True:
+                try:
+                    kind, value = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    name, written, total = value
+                    job_progress[name] = (written, total)
+                else:
+                    results = value
+
+            if progress_window.winfo_exists():
+                written = sum(rows for rows, _ in job_progress.values())
+                known = [(rows, total) for rows, total in job_progress.values() if total is not None]
+                expected = sum(total for _, total in known)
+                # Totals can be estimates, so a job may run a little past its own
+                progress['value'] = sum(min(rows, total) for rows, total in known) / expected * 100 if expected else 0
+                status_label.config(text=f"{written:,} rows written")
+
+            if results is None:
+                self.root.after(100, poll_events)
+                return
+
+            if progress_window.winfo_exists():
+                progress_window.destroy()
+            exported_files = []
+            for job in jobs:
+                path, rows, error = results[job.name]
+                if error:
+                    exported_files.append(f"{job.name}: Error - {error}")
+                else:
+                    exported_files.append(f"{os.path.basename(path)}: {rows:,} records")
+
+            if on_complete:
+                on_complete(results)
+
+            if activity:
+                try:
+                    self.db.log_activity(self.current_user or 'system', 'export',
+                                         f'{activity}: {len(jobs)} files')
+                except Exception as e:
+                    print(f"Error recording export activity: {str(e)}")
 
-            # Show results
             result_text = f"Export Completed!\n\nLocation: {os.path.abspath(export_dir)}\n\nFiles:\n• " + "\n• ".join(exported_files)
-            
             messagebox.showinfo("Export Complete", result_text)
 
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export data:\n{str(e)}")
+        exporter.start(jobs,
+                       on_progress=lambda *value: events.put(("progress", value)),
+                       on_complete=lambda results: events.put(("done", results)))
+        self.root.after(100, poll_events)
 
 
     def clear_cache(self):
@@ -5703,12 +8643,8 @@ Permissions:
                     # Record activity
                     if hasattr(self, 'db'):
                         try:
-                            self.db.cursor.execute('''
-                                INSERT INTO user_activity (user, activity_type, description)
-                                VALUES (?, ?, ?)
-                            ''', (self.current_user or 'system', 'maintenance', 
-                                  f'System cache cleared: {cleared_items} items'))
-                            self.db.conn.commit()
+                            self.db.log_activity(self.current_user or 'system', 'maintenance', 
+                                                 f'System cache cleared: {cleared_items} items')
                             update_results("✓ Activity logged in database")
                         except Exception as e:
                             update_results(f"✗ Database logging failed: {str(e)}")
@@ -6143,28 +9079,15 @@ Permissions:
                         time.sleep(0.5)  # Simulate work
 
                     # Actual service restart operations
-                    # Close and reopen database connection
-                    self.db.conn.close()
+                    # Close the pooled database connections; they reopen on next use
+                    self.db.close()
                     time.sleep(0.2)
-                    self.db.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-                    self.db.cursor = self.db.conn.cursor()
-
-                    # Clear any cached data
-                    if hasattr(self, 'menu_items'):
-                        self.menu_items.clear()
-                        # Reload menu items from database
-                        db_meals = self.db.get_all_meals()
-                        for category, name, _, _, selling_price, _, _, _, _, _ in db_meals:
-                            if category not in self.menu_items:
-                                self.menu_items[category] = {}
-                            self.menu_items[category][name] = selling_price
+
+                    # Reload the menu catalog from the database
+                    self.db.reload_catalog()
 
                     # Record the restart activity
-                    self.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_user or 'system', 'system', 'System services restarted'))
-                    self.db.conn.commit()
+                    self.db.log_activity(self.current_user or 'system', 'system', 'System services restarted')
 
                     update_log("✓ All services restarted successfully!")
                     status_label.config(text="Restart completed successfully!")
@@ -6352,12 +9275,8 @@ Permissions:
                     
                     # Record test activity
                     if hasattr(self, 'db'):
-                        self.db.cursor.execute('''
-                            INSERT INTO user_activity (user, activity_type, description)
-                            VALUES (?, ?, ?)
-                        ''', (self.current_user or 'system', 'system', 
-                              f'Printer test completed: {test_type_val}'))
-                        self.db.conn.commit()
+                        self.db.log_activity(self.current_user or 'system', 'system', 
+                                             f'Printer test completed: {test_type_val}')
                     
                     # Auto-close after success
                     test_window.after(2000, test_window.destroy)
@@ -6957,7 +9876,7 @@ Permissions:
 
         # Add scrollbar
         scrollbar = ttk.Scrollbar(stock_frame, orient="vertical", command=self.stock_tree.yview)
-        self.stock_tree.configure(yscrollcommand=scrollbar.set)
+        self.virtual_grid(self.stock_tree, scrollbar)
 
         # Pack treeview and scrollbar
         self.stock_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -7004,6 +9923,10 @@ Permissions:
                 self.history_tree, int(days_var.get()), item_var.get(), category_var.get()))
         filter_btn.pack(side=tk.LEFT, padx=5)
 
+        # Size of the filtered history; rows themselves load a page at a time
+        self.history_count_label = tk.Label(filter_frame, text="", font=FONT_SMALL, bg=BG_COLOR, fg=FG_COLOR)
+        self.history_count_label.pack(side=tk.LEFT, padx=5)
+
         # NEW: Delete History Button
         delete_history_btn = tk.Button(filter_frame, text="Delete History", font=FONT_SMALL,
                                      bg=ERROR_COLOR, fg=FG_COLOR, command=self.authenticate_and_delete_history,
@@ -7047,7 +9970,7 @@ Permissions:
 
         # Add scrollbar
         history_scrollbar = ttk.Scrollbar(history_frame, orient="vertical", command=self.history_tree.yview)
-        self.history_tree.configure(yscrollcommand=history_scrollbar.set)
+        self.virtual_grid(self.history_tree, history_scrollbar)
 
         # Pack treeview and scrollbar
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -7111,7 +10034,7 @@ Permissions:
 
         # Add scrollbar
         sales_scrollbar = ttk.Scrollbar(sales_frame, orient="vertical", command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=sales_scrollbar.set)
+        self.virtual_grid(self.sales_tree, sales_scrollbar)
 
         # Pack treeview and scrollbar
         self.sales_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -7145,7 +10068,7 @@ Permissions:
 
         # Add scrollbar
         low_stock_scrollbar = ttk.Scrollbar(low_stock_frame, orient="vertical", command=self.low_stock_tree.yview)
-        self.low_stock_tree.configure(yscrollcommand=low_stock_scrollbar.set)
+        self.virtual_grid(self.low_stock_tree, low_stock_scrollbar)
 
         # Pack treeview and scrollbar
         self.low_stock_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -7217,155 +10140,233 @@ Permissions:
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill=tk.BOTH, expand=True)
 
+        # The shell shows at once; each tab queries on its own worker thread when first opened
+        loader = TabLoader(notebook, self.db, bg=self.BG_COLOR)
+        loader.add("💰 Profit Analysis", self._load_profit_analysis,
+                   lambda frame, data: self.setup_profit_analysis_tab(frame, *data))
+        loader.add("📈 Sales Performance", self._load_sales_performance,
+                   lambda frame, data: self.setup_sales_performance_tab(frame, *data))
+        loader.add("📦 Inventory Intelligence", self._load_inventory_intelligence,
+                   lambda frame, data: self.setup_inventory_intelligence_tab(frame, *data))
+        loader.add("👥 Customer Analytics", self._load_customer_analytics,
+                   lambda frame, data: self.setup_customer_analytics_tab(frame, *data))
+        loader.add("🔮 Financial Forecasting", self._load_financial_forecasting,
+                   lambda frame, data: self.setup_financial_forecasting_tab(frame, *data))
+        loader.add("📊 Performance Metrics", self._load_performance_metrics,
+                   lambda frame, data: self.setup_performance_metrics_tab(frame, *data))
+
+    # Analytics datasets. These run on TabLoader worker threads, where self.db.cursor
+    # is that thread's own snapshot cursor; totals come from the hourly rollup,
+    # which also covers archived months.
+
+    def _analytics_overall_metrics(self):
+        self.db.cursor.execute('''
+            SELECT 
+                SUM(total_revenue) as total_revenue,
+                SUM(total_profit) as total_profit,
+                SUM(total_profit) * 100.0 / NULLIF(SUM(total_revenue), 0) as overall_margin,
+                COUNT(*) as total_items
+            FROM meals 
+            WHERE is_active=1
+        ''')
+        return self.db.cursor.fetchone()
+
+    def _analytics_sales_trends(self):
+        month_start = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        self.db.cursor.execute('''
+            SELECT date, SUM(amount) as daily_sales, SUM(transactions) as transactions
+            FROM sales_hourly 
+            WHERE date >= ?
+            GROUP BY date
+            ORDER BY date
+        ''', (month_start,))
+        return self.db.cursor.fetchall()
+
+    def _analytics_customer_behavior(self):
+        # Customer spending patterns; the rollup has no customer, so these read sales,
+        # including any archived month the window reaches into
+        month_start = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        sales = self.db.range_source('sales', month_start)
         try:
-            # Get comprehensive data for all tabs
-            # Overall profit metrics
-            self.db.cursor.execute('''
-                SELECT 
-                    SUM(total_revenue) as total_revenue,
-                    SUM(total_profit) as total_profit,
-                    (SUM(total_profit)/NULLIF(SUM(total_revenue), 0))*100 as overall_margin,
-                    COUNT(*) as total_items
-                FROM meals 
-                WHERE is_active=1
-            ''')
-            overall_metrics = self.db.cursor.fetchone()
-            
-            # Top profitable items
-            self.db.cursor.execute('''
-                SELECT name, category, total_revenue, total_profit, 
-                       (total_profit/NULLIF(total_revenue, 0))*100 as profit_margin,
-                       total_sold
-                FROM meals 
-                WHERE is_active=1 AND total_revenue > 0
-                ORDER BY total_profit DESC
-                LIMIT 20
-            ''')
-            top_profitable = self.db.cursor.fetchall()
-
-            # Sales trends
-            self.db.cursor.execute('''
-                SELECT date, SUM(amount) as daily_sales, COUNT(*) as transactions
-                FROM sales 
-                WHERE date >= date('now', '-30 days')
-                GROUP BY date
-                ORDER BY date
-            ''')
-            sales_trends = self.db.cursor.fetchall()
-
-            # Customer spending patterns
-            self.db.cursor.execute('''
+            cursor = (self.db.range_connection(sales) or self.db.conn).cursor()
+            cursor.execute(f'''
                 SELECT customer_name, COUNT(*) as visits, 
                        SUM(amount) as total_spent, AVG(amount) as avg_spent
-                FROM sales 
-                WHERE date >= date('now', '-30 days') AND customer_name != 'Walk-in Customer'
+                FROM {sales} 
+                WHERE date >= ? AND customer_name != 'Walk-in Customer'
                 GROUP BY customer_name
                 HAVING visits > 1
                 ORDER BY total_spent DESC
                 LIMIT 20
-            ''')
-            customer_behavior = self.db.cursor.fetchall()
-
-            # Payment method analysis
-            self.db.cursor.execute('''
-                SELECT payment_method, COUNT(*) as transaction_count,
-                       SUM(amount) as total_amount, AVG(amount) as avg_amount
-                FROM sales 
-                WHERE date >= date('now', '-30 days')
-                GROUP BY payment_method
-                ORDER BY total_amount DESC
-            ''')
-            payment_analysis = self.db.cursor.fetchall()
-
-            # Seasonal trends
-            self.db.cursor.execute('''
-                SELECT strftime('%H', time) as hour, 
-                       COUNT(*) as transactions, SUM(amount) as revenue
-                FROM sales 
-                WHERE date >= date('now', '-30 days')
-                GROUP BY hour
-                ORDER BY hour
-            ''')
-            hourly_trends = self.db.cursor.fetchall()
+            ''', (month_start,))
+            return cursor.fetchall()
+        finally:
+            self.db.drop_range_source(sales)
+
+    def _load_profit_analysis(self):
+        """Overall metrics, top profitable items, the previous period and margin bands"""
+        overall_metrics = self._analytics_overall_metrics()
+
+        # Top profitable items
+        self.db.cursor.execute('''
+            SELECT name, category, total_revenue, total_profit, 
+                   total_profit * 100.0 / NULLIF(total_revenue, 0) as profit_margin,
+                   total_sold
+            FROM meals 
+            WHERE is_active=1 AND total_revenue > 0
+            ORDER BY total_profit DESC
+            LIMIT 20
+        ''')
+        top_profitable = self.db.cursor.fetchall()
+
+        # Comparative metrics (vs previous period)
+        self.db.cursor.execute('''
+            SELECT SUM(total_revenue), SUM(total_profit)
+            FROM meals 
+            WHERE is_active=1 AND last_updated >= date('now', '-60 days') 
+            AND last_updated < date('now', '-30 days')
+        ''')
+        prev_metrics = self.db.cursor.fetchone()
+
+        # Profitability categories
+        self.db.cursor.execute('''
+            SELECT 
+                CASE 
+                    WHEN total_profit * 100.0 / NULLIF(total_revenue, 0) >= 30 THEN 'High (30%+)'
+                    WHEN total_profit * 100.0 / NULLIF(total_revenue, 0) >= 20 THEN 'Medium (20-30%)'
+                    WHEN total_profit * 100.0 / NULLIF(total_revenue, 0) >= 10 THEN 'Low (10-20%)'
+                    ELSE 'Marginal (<10%)'
+                END as profit_category,
+                COUNT(*) as item_count,
+                SUM(total_revenue) as category_revenue,
+                SUM(total_profit) as category_profit
+            FROM meals 
+            WHERE is_active=1 AND total_revenue > 0
+            GROUP BY profit_category
+            ORDER BY category_profit DESC
+        ''')
+        profit_categories = self.db.cursor.fetchall()
+        return overall_metrics, top_profitable, prev_metrics, profit_categories
+
+    def _load_sales_performance(self):
+        """Daily and hourly trends, payment methods and weekly velocity"""
+        month_start = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        sales_trends = self._analytics_sales_trends()
+
+        # Payment method analysis
+        self.db.cursor.execute('''
+            SELECT payment_method, SUM(transactions) as transaction_count,
+                   SUM(amount) as total_amount, SUM(amount) * 1.0 / SUM(transactions) as avg_amount
+            FROM sales_hourly 
+            WHERE date >= ?
+            GROUP BY payment_method
+            ORDER BY total_amount DESC
+        ''', (month_start,))
+        payment_analysis = self.db.cursor.fetchall()
+
+        # Seasonal trends
+        self.db.cursor.execute('''
+            SELECT printf('%02d', hour) as hour, 
+                   SUM(transactions) as transactions, SUM(amount) as revenue
+            FROM sales_hourly 
+            WHERE date >= ?
+            GROUP BY hour
+            ORDER BY hour
+        ''', (month_start,))
+        hourly_trends = self.db.cursor.fetchall()
+
+        # Sales velocity
+        self.db.cursor.execute('''
+            SELECT 
+                strftime('%W', date) as week_number,
+                SUM(amount) as weekly_sales,
+                SUM(transactions) as weekly_transactions
+            FROM sales_hourly 
+            WHERE date >= date('now', '-30 days')
+            GROUP BY week_number
+            ORDER BY week_number
+        ''')
+        weekly_trends = self.db.cursor.fetchall()
+        return sales_trends, hourly_trends, payment_analysis, weekly_trends
+
+    def _load_inventory_intelligence(self):
+        """Stock health with weekly demand, and the ABC revenue analysis"""
+        week_start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        self.db.cursor.execute('''
+            SELECT 
+                m.name, m.category, m.current_stock, m.total_sold,
+                (m.total_sold / NULLIF(m.current_stock + m.total_sold, 0)) * 100 as turnover_rate,
+                CASE 
+                    WHEN m.current_stock = 0 THEN 'Out of Stock'
+                    WHEN m.current_stock <= 2 THEN 'Critical'
+                    WHEN m.current_stock <= 5 THEN 'Low'
+                    WHEN m.current_stock <= 10 THEN 'Adequate'
+                    ELSE 'Overstocked'
+                END as stock_status,
+                COALESCE(w.quantity, 0) as weekly_demand,
+                m.total_revenue,
+                m.total_profit
+            FROM meals m
+            -- One pass over the week's sales instead of a lookup per meal
+            LEFT JOIN (
+                SELECT meal, SUM(quantity) as quantity
+                FROM sales_hourly
+                WHERE date >= ?
+                GROUP BY meal
+            ) w ON w.meal = m.name
+            WHERE m.is_active = 1
+            ORDER BY turnover_rate DESC
+        ''', (week_start,))
+        inventory_data = self.db.cursor.fetchall()
+
+        # ABC Analysis (Pareto principle)
+        self.db.cursor.execute('''
+            SELECT name, total_revenue,
+                   SUM(total_revenue) OVER (ORDER BY total_revenue DESC) as running_total,
+                   (SUM(total_revenue) OVER (ORDER BY total_revenue DESC)) * 100.0 / 
+                   NULLIF(SUM(total_revenue) OVER (), 0) as cumulative_percent
+            FROM meals 
+            WHERE is_active=1 AND total_revenue > 0
+            ORDER BY total_revenue DESC
+        ''')
+        abc_analysis = self.db.cursor.fetchall()
+        return inventory_data, abc_analysis
+
+    def _load_customer_analytics(self):
+        """Repeat customers and retention"""
+        customer_behavior = self._analytics_customer_behavior()
+        self.db.cursor.execute('''
+            SELECT 
+                COUNT(DISTINCT customer_name) as total_customers,
+                COUNT(DISTINCT CASE WHEN date >= date('now', '-30 days') THEN customer_name END) as returning_customers
+            FROM sales 
+            WHERE customer_name != 'Walk-in Customer'
+        ''')
+        retention_data = self.db.cursor.fetchone()
+        return customer_behavior, retention_data
+
+    def _load_financial_forecasting(self):
+        """Daily trends to project from, and weekday patterns"""
+        sales_trends = self._analytics_sales_trends()
+        self.db.cursor.execute('''
+            SELECT 
+                strftime('%w', date) as weekday,
+                SUM(amount) * 1.0 / SUM(transactions) as avg_daily_sales,
+                SUM(transactions) as transactions
+            FROM sales_hourly 
+            WHERE date >= date('now', '-30 days')
+            GROUP BY weekday
+            ORDER BY weekday
+        ''')
+        weekday_patterns = self.db.cursor.fetchall()
+        return sales_trends, weekday_patterns
 
-            # Enhanced inventory data
-            self.db.cursor.execute('''
-                SELECT 
-                    m.name, m.category, m.current_stock, m.total_sold,
-                    (m.total_sold / NULLIF(m.current_stock + m.total_sold, 0)) * 100 as turnover_rate,
-                    CASE 
-                        WHEN m.current_stock = 0 THEN 'Out of Stock'
-                        WHEN m.current_stock <= 2 THEN 'Critical'
-                        WHEN m.current_stock <= 5 THEN 'Low'
-                        WHEN m.current_stock <= 10 THEN 'Adequate'
-                        ELSE 'Overstocked'
-                    END as stock_status,
-                    (SELECT COALESCE(SUM(quantity), 0) FROM sales s 
-                     WHERE s.meal = m.name AND s.date >= date('now', '-7 days')) as weekly_demand,
-                    m.total_revenue,
-                    m.total_profit
-                FROM meals m
-                WHERE m.is_active = 1
-                ORDER BY turnover_rate DESC
-            ''')
-            inventory_data = self.db.cursor.fetchall()
-
-            # ABC Analysis (Pareto principle)
-            self.db.cursor.execute('''
-                SELECT name, total_revenue,
-                       SUM(total_revenue) OVER (ORDER BY total_revenue DESC) as running_total,
-                       (SUM(total_revenue) OVER (ORDER BY total_revenue DESC)) / 
-                       NULLIF(SUM(total_revenue) OVER (), 0) * 100 as cumulative_percent
-                FROM meals 
-                WHERE is_active=1 AND total_revenue > 0
-                ORDER BY total_revenue DESC
-            ''')
-            abc_analysis = self.db.cursor.fetchall()
+    def _load_performance_metrics(self):
+        """Overall metrics, daily trends and repeat customers for the KPIs"""
+        return (self._analytics_overall_metrics(), self._analytics_sales_trends(),
+                self._analytics_customer_behavior())
 
-        except Exception as e:
-            print(f"Error fetching analytics data: {str(e)}")
-            # Set default values to prevent crashes
-            overall_metrics = (0, 0, 0, 0)
-            top_profitable = []
-            sales_trends = []
-            customer_behavior = []
-            payment_analysis = []
-            hourly_trends = []
-            inventory_data = []
-            abc_analysis = []
-
-        # All tabs will now use ScrolledFrame for smooth scrolling
-        # Tab 1: Profit Analysis
-        profit_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(profit_scrolled.main_frame, text="💰 Profit Analysis")
-        self.setup_profit_analysis_tab(profit_scrolled.frame, overall_metrics, top_profitable)
-
-        # Tab 2: Sales Performance
-        sales_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(sales_scrolled.main_frame, text="📈 Sales Performance")
-        self.setup_sales_performance_tab(sales_scrolled.frame, sales_trends, hourly_trends, payment_analysis)
-
-        # Tab 3: Inventory Intelligence
-        inventory_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(inventory_scrolled.main_frame, text="📦 Inventory Intelligence")
-        self.setup_inventory_intelligence_tab(inventory_scrolled.frame, inventory_data, abc_analysis)
-
-        # Tab 4: Customer Analytics
-        customer_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(customer_scrolled.main_frame, text="👥 Customer Analytics")
-        self.setup_customer_analytics_tab(customer_scrolled.frame, customer_behavior)
-
-        # Tab 5: Financial Forecasting
-        forecast_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(forecast_scrolled.main_frame, text="🔮 Financial Forecasting")
-        self.setup_financial_forecasting_tab(forecast_scrolled.frame, sales_trends)
-
-        # Tab 6: Performance Metrics
-        metrics_scrolled = ScrolledFrame(notebook, bg=self.BG_COLOR)
-        notebook.add(metrics_scrolled.main_frame, text="📊 Performance Metrics")
-        self.setup_performance_metrics_tab(metrics_scrolled.frame, overall_metrics, sales_trends, customer_behavior)
-
-    def setup_profit_analysis_tab(self, parent, overall_metrics, top_profitable):
+    def setup_profit_analysis_tab(self, parent, overall_metrics, top_profitable, prev_metrics, profit_categories):
         """Enhanced profit analysis with comparative metrics - now with smooth scrolling"""
         # Overall profit metrics
         metrics_frame = tk.LabelFrame(parent, text="Overall Profit Metrics", 
@@ -7377,13 +10378,6 @@ Permissions:
             
             # Comparative metrics (vs previous period)
             try:
-                self.db.cursor.execute('''
-                    SELECT SUM(total_revenue), SUM(total_profit)
-                    FROM meals 
-                    WHERE is_active=1 AND last_updated >= date('now', '-60 days') 
-                    AND last_updated < date('now', '-30 days')
-                ''')
-                prev_metrics = self.db.cursor.fetchone()
                 prev_revenue, prev_profit = prev_metrics if prev_metrics else (0, 0)
                 
                 revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
@@ -7394,11 +10388,11 @@ Permissions:
                 profit_growth = 0
 
             metrics_text = f"""
-    • Total Revenue: Ksh {total_revenue or 0:,.2f} ({revenue_growth:+.1f}%)
-    • Total Profit: Ksh {total_profit or 0:,.2f} ({profit_growth:+.1f}%)
+    • Total Revenue: Ksh {format_money(total_revenue or 0, grouped=True)} ({revenue_growth:+.1f}%)
+    • Total Profit: Ksh {format_money(total_profit or 0, grouped=True)} ({profit_growth:+.1f}%)
     • Overall Profit Margin: {overall_margin or 0:.1f}%
     • Active Items: {total_items}
-    • Average Profit per Item: Ksh {(total_profit/total_items) if total_items > 0 else 0:,.2f}
+    • Average Profit per Item: Ksh {format_money((total_profit/total_items) if total_items > 0 else 0, grouped=True)}
     • ROI: {(total_profit/(total_revenue-total_profit)*100) if (total_revenue-total_profit) > 0 else 0:.1f}%
             """
             tk.Label(metrics_frame, text=metrics_text.strip(), font=self.FONT_SMALL,
@@ -7411,28 +10405,10 @@ Permissions:
 
         # Create profitability categories
         try:
-            self.db.cursor.execute('''
-                SELECT 
-                    CASE 
-                        WHEN (total_profit/NULLIF(total_revenue, 0))*100 >= 30 THEN 'High (30%+)'
-                        WHEN (total_profit/NULLIF(total_revenue, 0))*100 >= 20 THEN 'Medium (20-30%)'
-                        WHEN (total_profit/NULLIF(total_revenue, 0))*100 >= 10 THEN 'Low (10-20%)'
-                        ELSE 'Marginal (<10%)'
-                    END as profit_category,
-                    COUNT(*) as item_count,
-                    SUM(total_revenue) as category_revenue,
-                    SUM(total_profit) as category_profit
-                FROM meals 
-                WHERE is_active=1 AND total_revenue > 0
-                GROUP BY profit_category
-                ORDER BY category_profit DESC
-            ''')
-            profit_categories = self.db.cursor.fetchall()
-            
             matrix_text = "📊 PROFITABILITY DISTRIBUTION:\n\n"
             for category, count, revenue, profit in profit_categories:
                 margin = (profit/revenue*100) if revenue > 0 else 0
-                matrix_text += f"• {category}: {count} items, Ksh {profit:,.2f} profit ({margin:.1f}% margin)\n"
+                matrix_text += f"• {category}: {count} items, Ksh {format_money(profit, grouped=True)} profit ({margin:.1f}% margin)\n"
             
             tk.Label(matrix_frame, text=matrix_text, font=self.FONT_SMALL,
                      bg=self.BG_COLOR, fg=self.FG_COLOR, justify=tk.LEFT).pack(padx=10, pady=10)
@@ -7442,7 +10418,7 @@ Permissions:
                                   font=self.FONT_SMALL, bg=self.BG_COLOR, fg='red')
             error_label.pack(padx=10, pady=10)
 
-    def setup_sales_performance_tab(self, parent, sales_trends, hourly_trends, payment_analysis):
+    def setup_sales_performance_tab(self, parent, sales_trends, hourly_trends, payment_analysis, weekly_trends):
         """Enhanced sales performance with trends and patterns - now with smooth scrolling"""
         # Sales trends visualization
         trends_frame = tk.LabelFrame(parent, text="Sales Trends & Patterns",
@@ -7461,16 +10437,16 @@ Permissions:
         trends_text = f"""
     📈 SALES PERFORMANCE METRICS:
 
-    • Total 30-Day Sales: Ksh {total_sales:,.2f}
-    • Average Daily Sales: Ksh {avg_daily_sales:,.2f}
-    • Best Day: {best_day[0] if best_day else 'N/A'} - Ksh {best_day[1] if best_day else 0:,.2f}
-    • Worst Day: {worst_day[0] if worst_day else 'N/A'} - Ksh {worst_day[1] if worst_day else 0:,.2f}
-    • Peak Hour: {peak_hour[0] if peak_hour else 'N/A'}:00 - Ksh {peak_hour[2] if peak_hour else 0:,.2f}
+    • Total 30-Day Sales: Ksh {format_money(total_sales, grouped=True)}
+    • Average Daily Sales: Ksh {format_money(avg_daily_sales, grouped=True)}
+    • Best Day: {best_day[0] if best_day else 'N/A'} - Ksh {format_money(best_day[1] if best_day else 0, grouped=True)}
+    • Worst Day: {worst_day[0] if worst_day else 'N/A'} - Ksh {format_money(worst_day[1] if worst_day else 0, grouped=True)}
+    • Peak Hour: {peak_hour[0] if peak_hour else 'N/A'}:00 - Ksh {format_money(peak_hour[2] if peak_hour else 0, grouped=True)}
 
     💳 PAYMENT METHOD ANALYSIS:
     """
         for method, count, amount, avg in payment_analysis:
-            trends_text += f"• {method}: {count} transactions, Ksh {amount:,.2f} total (avg: Ksh {avg:.2f})\n"
+            trends_text += f"• {method}: {count} transactions, Ksh {format_money(amount, grouped=True)} total (avg: Ksh {format_money(avg)})\n"
 
         tk.Label(trends_frame, text=trends_text, font=self.FONT_SMALL,
                  bg=self.BG_COLOR, fg=self.FG_COLOR, justify=tk.LEFT).pack(padx=10, pady=10)
@@ -7481,21 +10457,9 @@ Permissions:
         velocity_frame.pack(fill=tk.X, padx=10, pady=10)
 
         try:
-            self.db.cursor.execute('''
-                SELECT 
-                    strftime('%W', date) as week_number,
-                    SUM(amount) as weekly_sales,
-                    COUNT(*) as weekly_transactions
-                FROM sales 
-                WHERE date >= date('now', '-30 days')
-                GROUP BY week_number
-                ORDER BY week_number
-            ''')
-            weekly_trends = self.db.cursor.fetchall()
-            
             velocity_text = "🚀 WEEKLY SALES VELOCITY:\n\n"
             for week, sales, transactions in weekly_trends:
-                velocity_text += f"• Week {week}: Ksh {sales:,.2f} ({transactions} transactions)\n"
+                velocity_text += f"• Week {week}: Ksh {format_money(sales, grouped=True)} ({transactions} transactions)\n"
             
             tk.Label(velocity_frame, text=velocity_text, font=self.FONT_SMALL,
                      bg=self.BG_COLOR, fg=self.FG_COLOR, justify=tk.LEFT).pack(padx=10, pady=10)
@@ -7573,7 +10537,7 @@ Permissions:
             
             abc_text += f"🅰️ A-Items (Top 80% of revenue): {len(a_items)} items\n"
             for name, revenue in a_items[:5]:  # Show top 5 A items
-                abc_text += f"   • {name}: Ksh {revenue:,.2f}\n"
+                abc_text += f"   • {name}: Ksh {format_money(revenue, grouped=True)}\n"
             
             abc_text += f"\n🅱️ B-Items (Next 15% of revenue): {len(b_items)} items\n"
             abc_text += f"\n🅲️ C-Items (Bottom 5% of revenue): {len(c_items)} items\n"
@@ -7616,7 +10580,7 @@ Permissions:
         tk.Label(alert_frame, text=alert_text, font=self.FONT_SMALL,
                  bg=self.BG_COLOR, fg=self.FG_COLOR, justify=tk.LEFT).pack(padx=10, pady=10)
 
-    def setup_customer_analytics_tab(self, parent, customer_behavior):
+    def setup_customer_analytics_tab(self, parent, customer_behavior, retention_data):
         """Customer behavior and segmentation analysis - now with smooth scrolling"""
         # Customer segmentation
         segmentation_frame = tk.LabelFrame(parent, text="Customer Segmentation Analysis",
@@ -7629,9 +10593,9 @@ Permissions:
             return
 
         # Segment customers
-        vip_customers = [c for c in customer_behavior if c[2] > 1000]  # > 1000 Ksh total
-        regular_customers = [c for c in customer_behavior if 500 <= c[2] <= 1000]
-        occasional_customers = [c for c in customer_behavior if c[2] < 500]
+        vip_customers = [c for c in customer_behavior if c[2] > 100000]  # > 1000 Ksh total, in cents
+        regular_customers = [c for c in customer_behavior if 50000 <= c[2] <= 100000]
+        occasional_customers = [c for c in customer_behavior if c[2] < 50000]
 
         segmentation_text = f"""
     👥 CUSTOMER SEGMENTATION:
@@ -7639,7 +10603,7 @@ Permissions:
     🎯 VIP Customers (>Ksh 1,000): {len(vip_customers)} customers
     """
         for customer in vip_customers[:3]:  # Top 3 VIPs
-            segmentation_text += f"   • {customer[0]}: Ksh {customer[2]:,.2f} total, {customer[1]} visits\n"
+            segmentation_text += f"   • {customer[0]}: Ksh {format_money(customer[2], grouped=True)} total, {customer[1]} visits\n"
 
         segmentation_text += f"\n👍 Regular Customers (Ksh 500-1,000): {len(regular_customers)} customers"
         segmentation_text += f"\n👋 Occasional Customers (<Ksh 500): {len(occasional_customers)} customers"
@@ -7649,8 +10613,8 @@ Permissions:
         total_revenue = sum(c[2] for c in customer_behavior)
         avg_customer_value = total_revenue / len(customer_behavior) if customer_behavior else 0
         
-        segmentation_text += f"• Average Customer Value: Ksh {avg_customer_value:,.2f}\n"
-        segmentation_text += f"• Total Identified Customer Revenue: Ksh {total_revenue:,.2f}\n"
+        segmentation_text += f"• Average Customer Value: Ksh {format_money(avg_customer_value, grouped=True)}\n"
+        segmentation_text += f"• Total Identified Customer Revenue: Ksh {format_money(total_revenue, grouped=True)}\n"
         segmentation_text += f"• Repeat Customers: {len(customer_behavior)}"
 
         tk.Label(segmentation_frame, text=segmentation_text, font=self.FONT_SMALL,
@@ -7662,15 +10626,6 @@ Permissions:
         retention_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         try:
-            self.db.cursor.execute('''
-                SELECT 
-                    COUNT(DISTINCT customer_name) as total_customers,
-                    COUNT(DISTINCT CASE WHEN date >= date('now', '-30 days') THEN customer_name END) as returning_customers
-                FROM sales 
-                WHERE customer_name != 'Walk-in Customer'
-            ''')
-            retention_data = self.db.cursor.fetchone()
-            
             if retention_data:
                 total_customers, returning = retention_data
                 retention_rate = (returning / total_customers * 100) if total_customers > 0 else 0
@@ -7697,7 +10652,7 @@ Permissions:
                                   font=self.FONT_SMALL, bg=self.BG_COLOR, fg='red')
             error_label.pack(padx=10, pady=10)
 
-    def setup_financial_forecasting_tab(self, parent, sales_trends):
+    def setup_financial_forecasting_tab(self, parent, sales_trends, weekday_patterns):
         """Financial projections and forecasting - now with smooth scrolling"""
         forecast_frame = tk.LabelFrame(parent, text="Revenue Forecasting & Projections",
                                        font=self.FONT_MEDIUM, bg=self.BG_COLOR, fg=self.ACCENT_COLOR)
@@ -7729,9 +10684,9 @@ Permissions:
     🔮 FINANCIAL PROJECTIONS:
 
     📈 BASED ON LAST 7 DAYS TREND:
-    • Projected Daily Revenue: Ksh {daily_projection:,.2f}
-    • Projected Weekly Revenue: Ksh {weekly_projection:,.2f}
-    • Projected Monthly Revenue: Ksh {monthly_projection:,.2f}
+    • Projected Daily Revenue: Ksh {format_money(daily_projection, grouped=True)}
+    • Projected Weekly Revenue: Ksh {format_money(weekly_projection, grouped=True)}
+    • Projected Monthly Revenue: Ksh {format_money(monthly_projection, grouped=True)}
 
     📊 GROWTH ANALYSIS:
     • Current Growth Rate: {growth_rate:+.1f}%
@@ -7749,23 +10704,11 @@ Permissions:
         # Seasonality insights
         forecast_text += "\n\n🔄 SEASONALITY INSIGHTS:"
         try:
-            self.db.cursor.execute('''
-                SELECT 
-                    strftime('%w', date) as weekday,
-                    AVG(amount) as avg_daily_sales,
-                    COUNT(*) as transactions
-                FROM sales 
-                WHERE date >= date('now', '-30 days')
-                GROUP BY weekday
-                ORDER BY weekday
-            ''')
-            weekday_patterns = self.db.cursor.fetchall()
-            
             weekdays = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
             best_day = max(weekday_patterns, key=lambda x: x[1]) if weekday_patterns else None
             
             if best_day:
-                forecast_text += f"\n• Best Performing Day: {weekdays[int(best_day[0])]} - Ksh {best_day[1]:,.2f} average"
+                forecast_text += f"\n• Best Performing Day: {weekdays[int(best_day[0])]} - Ksh {format_money(best_day[1], grouped=True)} average"
                 
         except Exception as e:
             forecast_text += f"\n• Seasonality data unavailable"
@@ -7797,16 +10740,16 @@ Permissions:
     💵 FINANCIAL KPIs:
     • Gross Profit Margin: {(total_profit/total_revenue*100) if total_revenue > 0 else 0:.1f}%
     • Return on Investment: {(total_profit/(total_revenue-total_profit)*100) if (total_revenue-total_profit) > 0 else 0:.1f}%
-    • Revenue per Square Foot: Ksh {total_revenue/100:,.2f} (est.)
+    • Revenue per Square Foot: Ksh {format_money(total_revenue/100, grouped=True)} (est.)
 
     📊 SALES KPIs:
-    • Average Transaction Value: Ksh {avg_transaction_value:.2f}
+    • Average Transaction Value: Ksh {format_money(avg_transaction_value)}
     • Transactions per Day: {total_transactions/30:.1f}
-    • Sales per Square Foot: Ksh {total_revenue/100:,.2f} (est.)
+    • Sales per Square Foot: Ksh {format_money(total_revenue/100, grouped=True)} (est.)
 
     👥 CUSTOMER KPIs:
-    • Customer Acquisition Cost: Ksh {100:.2f} (est.)
-    • Customer Lifetime Value: Ksh {avg_customer_value:,.2f}
+    • Customer Acquisition Cost: Ksh {format_money(10000)} (est.)
+    • Customer Lifetime Value: Ksh {format_money(avg_customer_value, grouped=True)}
     • Repeat Customer Rate: {(unique_customers/total_transactions*100) if total_transactions > 0 else 0:.1f}%
 
     📈 OPERATIONAL KPIs:
@@ -7827,7 +10770,7 @@ Permissions:
         industry_benchmarks = {
             'Profit Margin': {'Your Business': (total_profit/total_revenue*100) if total_revenue > 0 else 0, 'Industry Avg': 15.0},
             'Inventory Turnover': {'Your Business': (total_revenue/(total_revenue-total_profit)) if (total_revenue-total_profit) > 0 else 0, 'Industry Avg': 8.0},
-            'Avg Transaction': {'Your Business': avg_transaction_value, 'Industry Avg': 450.0},
+            'Avg Transaction': {'Your Business': avg_transaction_value / 100, 'Industry Avg': 450.0},  # shillings
         }
 
         benchmark_text = "🏆 PERFORMANCE vs INDUSTRY BENCHMARKS:\n\n"
@@ -7847,44 +10790,46 @@ Permissions:
 
     def get_profit_summary(self, days=30):
         """Get comprehensive profit summary for the manager dashboard"""
-        try:
-            # Total profit and revenue
-            self.db.cursor.execute('''
-                SELECT 
-                    SUM(s.amount) as total_revenue,
-                    SUM(s.profit) as total_profit,
-                    (SUM(s.profit)/SUM(s.amount))*100 as profit_margin,
-                    COUNT(*) as total_transactions
-                FROM sales s
-                WHERE s.date >= date('now', ?)
-            ''', (f'-{days} days',))
-            
-            summary = self.db.cursor.fetchone()
-            
-            # Top performing categories
-            self.db.cursor.execute('''
-                SELECT 
-                    s.category,
-                    SUM(s.amount) as category_revenue,
-                    SUM(s.profit) as category_profit,
-                    (SUM(s.profit)/SUM(s.amount))*100 as category_margin
-                FROM sales s
-                WHERE s.date >= date('now', ?)
-                GROUP BY s.category
-                ORDER BY category_profit DESC
-            ''', (f'-{days} days',))
-            
-            categories = self.db.cursor.fetchall()
-            
-            return {
-                'summary': summary,
-                'categories': categories,
-                'period': days
-            }
+        # One snapshot, so the summary and the category split agree
+        with self.db.snapshot():
+            try:
+                # Total profit and revenue
+                self.db.cursor.execute('''
+                    SELECT 
+                        SUM(h.amount) as total_revenue,
+                        SUM(h.profit) as total_profit,
+                        SUM(h.profit) * 100.0 / NULLIF(SUM(h.amount), 0) as profit_margin,
+                        SUM(h.transactions) as total_transactions
+                    FROM sales_hourly h
+                    WHERE h.date >= date('now', ?)
+                ''', (f'-{days} days',))
+            
+                summary = self.db.cursor.fetchone()
+            
+                # Top performing categories
+                self.db.cursor.execute('''
+                    SELECT 
+                        h.category,
+                        SUM(h.amount) as category_revenue,
+                        SUM(h.profit) as category_profit,
+                        SUM(h.profit) * 100.0 / NULLIF(SUM(h.amount), 0) as category_margin
+                    FROM sales_hourly h
+                    WHERE h.date >= date('now', ?)
+                    GROUP BY h.category
+                    ORDER BY category_profit DESC
+                ''', (f'-{days} days',))
+            
+                categories = self.db.cursor.fetchall()
+            
+                return {
+                    'summary': summary,
+                    'categories': categories,
+                    'period': days
+                }
             
-        except Exception as e:
-            print(f"Error getting profit summary: {str(e)}")
-            return None
+            except Exception as e:
+                print(f"Error getting profit summary: {str(e)}")
+                return None
 
     def create_category_frame(self, category):
         """Create a new category frame in the main system"""
@@ -7931,45 +10876,53 @@ Permissions:
         if category not in self.meal_entries:
             self.meal_entries[category] = {}
 
-    def load_stock_data(self, tree):
-        """Load current stock data into the treeview with full details"""
-        # Clear existing data
-        for item in tree.get_children():
-            tree.delete(item)
+    def virtual_grid(self, tree, scrollbar=None):
+        """Make tree a VirtualGrid driven by scrollbar, so its loaders only fill the rows in view"""
+        for old in [old for old in self.tree_grids if not old.winfo_exists()]:
+            del self.tree_grids[old]
+        if tree in self.tree_grids:
+            self.tree_grids[tree].close()
+        self.tree_grids[tree] = VirtualGrid(tree, scrollbar)
+        return self.tree_grids[tree]
 
-        # Get current stock from database
-        stock_data = self.db.get_current_stock()
+    def show_rows(self, tree, rows, to_values):
+        """Show a QueryRows or ListRows in tree; to_values turns a row into tree values"""
+        grid = self.tree_grids.get(tree) or self.virtual_grid(tree)
+        grid.show(rows, to_values)
 
-        # Insert data into treeview
-        for category, name, description, buying_price, selling_price, stock, sold, revenue, profit, last_updated in stock_data:
+    def load_stock_data(self, tree):
+        """Load current stock data into the treeview with full details"""
+        def to_values(row):
+            category, name, description, buying_price, selling_price, stock, sold, revenue, profit, last_updated = row
             margin = (profit / revenue * 100) if revenue > 0 else 0
-            tree.insert("", tk.END, values=(
+            return (
                 category,
                 name,
                 description,
-                f"{buying_price:.2f}",
-                f"{selling_price:.2f}",
+                format_money(buying_price),
+                format_money(selling_price),
                 stock,
                 sold,
-                f"{revenue:.2f}",
-                f"{profit:.2f}",
+                format_money(revenue),
+                format_money(profit),
                 f"{margin:.1f}%",
                 last_updated
-            ))
+            )
+
+        sort_columns = {
+            "Category": ("category",), "Item": ("name",), "Description": ("description",),
+            "Buying": ("buying_price",), "Selling": ("selling_price",), "Stock": ("current_stock",),
+            "Sold": ("total_sold",), "Revenue": ("total_revenue",), "Profit": ("total_profit",),
+            "Margin": ("total_profit * 1.0 / NULLIF(total_revenue, 0)",), "Last Updated": ("last_updated",),
+        }
+        self.show_rows(tree, QueryRows.from_cursor(self.db.page_current_stock(), sort_columns), to_values)
 
     def load_history_data(self, tree, days=30, item_filter=None, category_filter=None):
-        """Load stock history data into the treeview with filtering"""
-        # Clear existing data
-        for item in tree.get_children():
-            tree.delete(item)
-
-        # Get history from database with filters
-        history_data = self.db.get_stock_history(days, item_filter, category_filter)
-
-        # Insert data into treeview
-        for (date, time, item, category, change_type, qty,
-             prev_stock, new_stock, buying, selling, user, notes) in history_data:
-            tree.insert("", tk.END, values=(
+        """Load stock history data into the treeview with filtering, only the rows in view"""
+        def to_values(row):
+            (date, time, item, category, change_type, qty,
+             prev_stock, new_stock, buying, selling, user, notes) = row
+            return (
                 date,
                 time,
                 item,
@@ -7978,18 +10931,30 @@ Permissions:
                 qty,
                 prev_stock,
                 new_stock,
-                f"{buying:.2f}",
-                f"{selling:.2f}",
+                format_money(buying),
+                format_money(selling),
                 user,
                 notes
-            ))
+            )
+
+        sort_columns = {
+            "Date": ("date", "time"), "Time": ("time",), "Item": ("item_name",), "Category": ("category",),
+            "Type": ("change_type",), "Qty": ("quantity",), "Prev Stock": ("previous_stock",),
+            "New Stock": ("new_stock",), "Buying": ("buying_price",), "Selling": ("selling_price",),
+            "User": ("user",), "Notes": ("notes",),
+        }
+        rows = QueryRows.from_cursor(self.db.page_stock_history(days, item_filter, category_filter), sort_columns)
+        self.show_rows(tree, rows, to_values)
+        self.show_history_count(rows)
+
+    def show_history_count(self, rows):
+        """Show the size of the filtered stock history next to its filters"""
+        count_label = getattr(self, 'history_count_label', None)
+        if count_label and count_label.winfo_exists():
+            count_label.config(text=f"{len(rows):,}{'' if rows.exact else '+'} records")
 
     def load_sales_report(self, tree, days=30, user=None):
         """Load sales report data into the treeview with detailed user sales"""
-        # Clear existing data
-        for item in tree.get_children():
-            tree.delete(item)
-
         # Configure treeview columns based on whether we're showing summary or detailed view
         if user and user != "All":
             # Show detailed sales records for specific user
@@ -8024,37 +10989,29 @@ Permissions:
             tree.column("Profit", width=90, anchor=tk.E)
             tree.column("Payment Method", width=100, anchor=tk.W)
 
-            # Get detailed sales data for the specific user
-            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            
-            # Query to get all sales records for the specific user within the date range
-            self.db.cursor.execute('''
-                SELECT date, time, customer_name, category, meal, quantity, 
-                       selling_price, amount, profit, payment_method
-                FROM sales 
-                WHERE user = ? AND date >= ?
-                ORDER BY date DESC, time DESC
-            ''', (user, date_limit))
-            
-            user_sales_data = self.db.cursor.fetchall()
-            
-            # Insert detailed sales data into treeview
-            for sale in user_sales_data:
+            # Detailed sales for the specific user, fetched only as they scroll into view
+            def to_values(sale):
                 date, time, customer, category, meal, quantity, price, amount, profit, payment_method = sale
-                profit_margin = (profit / amount * 100) if amount > 0 else 0
-                
-                tree.insert("", tk.END, values=(
+                return (
                     date,
                     time,
                     customer,
                     category,
                     meal,
                     quantity,
-                    f"{price:.2f}",
-                    f"{amount:.2f}",
-                    f"{profit:.2f}",
+                    format_money(price),
+                    format_money(amount),
+                    format_money(profit),
                     payment_method
-                ))
+                )
+
+            sort_columns = {
+                "Date": ("date", "time"), "Time": ("time",), "Customer": ("customer_name",),
+                "Category": ("category",), "Item": ("meal",), "Qty": ("quantity",), "Price": ("selling_price",),
+                "Amount": ("amount",), "Profit": ("profit",), "Payment Method": ("payment_method",),
+            }
+            rows = QueryRows.from_cursor(self.db.page_user_sales(user, days), sort_columns)
+            self.show_rows(tree, rows, to_values)
                 
         else:
             # Show summary view for all users
@@ -8079,18 +11036,22 @@ Permissions:
             tree.column("Total Profit", width=120, anchor=tk.E)
             tree.column("Avg Margin", width=100, anchor=tk.E)
 
-            # Get sales summary from database
-            sales_data = self.db.get_user_sales_summary(user, days)
+            # Get sales summary from database; a handful of rows, sorted in memory
+            def load_summary():
+                return self.db.get_user_sales_summary(user, days)
 
-            # Insert summary data into treeview
-            for user_name, count, sales, profit, margin in sales_data:
-                tree.insert("", tk.END, values=(
+            def to_values(row):
+                user_name, count, sales, profit, margin = row
+                return (
                     user_name,
                     count,
-                    f"{sales:.2f}",
-                    f"{profit:.2f}",
+                    format_money(sales),
+                    format_money(profit),
                     f"{margin:.1f}%"
-                ))
+                )
+
+            sort_columns = {"User": 0, "Sales Count": 1, "Total Sales": 2, "Total Profit": 3, "Avg Margin": 4}
+            self.show_rows(tree, ListRows(load_summary(), sort_columns, load_summary), to_values)
 
     def on_user_selection(self, event, tree, days_var, user_var):
         """Handle user selection in the sales report dropdown"""
@@ -8132,7 +11093,7 @@ Permissions:
         
         # Add scrollbar
         sales_scrollbar = ttk.Scrollbar(sales_frame, orient="vertical", command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=sales_scrollbar.set)
+        self.virtual_grid(self.sales_tree, sales_scrollbar)
 
         # Pack treeview and scrollbar
         self.sales_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -8153,104 +11114,86 @@ Permissions:
         export_btn.pack(side=tk.RIGHT, padx=5)
 
     def export_sales_report(self, user, days):
-        """Export sales report to CSV file"""
-        try:
-            export_dir = "sales_reports"
-            if not os.path.exists(export_dir):
-                os.makedirs(export_dir)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            if user and user != "All":
-                filename = f"sales_report_{user}_{days}days_{timestamp}.csv"
-            else:
-                filename = f"sales_report_all_users_{days}days_{timestamp}.csv"
-                
-            filepath = os.path.join(export_dir, filename)
+        """Export sales report to a compressed CSV file"""
+        date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
 
-            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            
-            if user and user != "All":
-                # Export detailed sales for specific user
-                self.db.cursor.execute('''
+        if user and user != "All":
+            # Export detailed sales for specific user, streamed straight from the query
+            job = ExportJob(
+                f"sales_report_{user}_{days}days",
+                '''
                     SELECT date, time, customer_name, category, meal, quantity, 
                            selling_price, amount, profit, payment_method
-                    FROM sales 
+                    FROM {source} 
                     WHERE user = ? AND date >= ?
                     ORDER BY date DESC, time DESC
-                ''', (user, date_limit))
-                sales_data = self.db.cursor.fetchall()
-                
-                with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    import csv
-                    writer = csv.writer(f)
-                    writer.writerow(["Date", "Time", "Customer", "Category", "Item", "Quantity", 
-                                   "Price", "Amount", "Profit", "Payment Method"])
-                    writer.writerows(sales_data)
-                    
-            else:
-                # Export summary for all users
-                sales_data = self.db.get_user_sales_summary(None, days)
-                
-                with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    import csv
-                    writer = csv.writer(f)
-                    writer.writerow(["User", "Sales Count", "Total Sales", "Total Profit", "Average Margin"])
-                    writer.writerows(sales_data)
+                ''',
+                (user, date_limit),
+                headers=["Date", "Time", "Customer", "Category", "Item", "Quantity",
+                         "Price", "Amount", "Profit", "Payment Method"],
+                transform=lambda row: row[:6] + tuple(format_money(v) for v in row[6:9]) + row[9:],
+                archived=("sales", date_limit)
+            )
+        else:
+            # Export summary for all users; one row per user, read from the hourly rollup
+            job = ExportJob(
+                f"sales_report_all_users_{days}days",
+                rows=self.db.get_user_sales_summary(None, days),
+                headers=["User", "Sales Count", "Total Sales", "Total Profit", "Average Margin"],
+                transform=lambda row: (row[0], row[1], format_money(row[2]), format_money(row[3]), row[4])
+            )
 
-            messagebox.showinfo("Export Successful", 
-                              f"Sales report exported to:\n{filepath}", 
-                              parent=self.root)
-                              
-        except Exception as e:
-            messagebox.showerror("Export Failed", f"Failed to export sales report:\n{str(e)}", parent=self.root)
+        self.run_export([job], "sales_reports", title="Exporting Sales Report")
 
     def load_low_stock_data(self, tree):
         """Load low stock items with estimated days left"""
-        # Clear existing data
-        for item in tree.get_children():
-            tree.delete(item)
-
-        # Get low stock items
-        low_stock_items = self.db.get_low_stock_items(threshold=10)
-
-        # Get average daily sales for each item
-        avg_sales = {}
-        top_selling = self.db.get_top_selling_items(limit=100, days=30)
-        for category, item, qty in top_selling:
-            avg_sales[(category, item)] = qty / 30  # Average per day over 30 days
-
-        # Insert data into treeview
-        for category, item, stock in low_stock_items:
-            avg_daily = avg_sales.get((category, item), 0.1)  # Default to 0.1 to avoid division by zero
-            days_left = stock / avg_daily if avg_daily > 0 else 999
-
-            tree.insert("", tk.END, values=(
+        def load_rows():
+            # Get low stock items
+            low_stock_items = self.db.get_low_stock_items(threshold=10)
+
+            # Get average daily sales for each item
+            avg_sales = {}
+            top_selling = self.db.get_top_selling_items(limit=100, days=30)
+            for category, item, qty in top_selling:
+                avg_sales[(category, item)] = qty / 30  # Average per day over 30 days
+
+            rows = []
+            for category, item, stock in low_stock_items:
+                avg_daily = avg_sales.get((category, item), 0.1)  # Default to 0.1 to avoid division by zero
+                days_left = stock / avg_daily if avg_daily > 0 else 999
+                rows.append((category, item, stock, avg_daily, days_left))
+            return rows
+
+        def to_values(row):
+            category, item, stock, avg_daily, days_left = row
+            return (
                 category,
                 item,
                 stock,
                 f"{avg_daily:.1f}",
                 f"{days_left:.1f}"
-            ))
+            )
+
+        sort_columns = {"Category": 0, "Item": 1, "Current Stock": 2, "Avg Daily Sales": 3, "Days Left": 4}
+        self.show_rows(tree, ListRows(load_rows(), sort_columns, load_rows), to_values)
+
+    def reload_data_views(self):
+        """Reload every open manager data view from the database"""
+        views = [
+            ('stock_tree', self.load_stock_data),
+            ('history_tree', self.load_history_data),
+            ('sales_tree', self.load_sales_report),
+            ('low_stock_tree', self.load_low_stock_data)
+        ]
+        for tree_name, loader in views:
+            tree = getattr(self, tree_name, None)
+            if tree and tree.winfo_exists():
+                loader(tree)
 
     def refresh_all_data(self):
         """Refresh all data views after successful authentication"""
         try:
-            # Refresh stock data
-            if hasattr(self, 'stock_tree') and self.stock_tree:
-                self.load_stock_data(self.stock_tree)
-            
-            # Refresh history data
-            if hasattr(self, 'history_tree') and self.history_tree:
-                self.load_history_data(self.history_tree)
-            
-            # Refresh sales report data
-            if hasattr(self, 'sales_tree') and self.sales_tree:
-                self.load_sales_report(self.sales_tree)
-            
-            # Refresh low stock data
-            if hasattr(self, 'low_stock_tree') and self.low_stock_tree:
-                self.load_low_stock_data(self.low_stock_tree)
+            self.reload_data_views()
             
             messagebox.showinfo("Refreshed", "All data has been refreshed successfully!", parent=self.root)
         except Exception as e:
@@ -8414,20 +11357,12 @@ Permissions:
             
             def perform_deletion():
                 try:
-                    # Get count of records to be deleted
-                    self.db.cursor.execute("SELECT COUNT(*) FROM stock_history")
-                    record_count = self.db.cursor.fetchone()[0]
-                    
                     # Delete all stock history records
-                    self.db.cursor.execute("DELETE FROM stock_history")
-                    self.db.conn.commit()
+                    record_count = self.db.purge_stock_history()
                     
                     # Record the activity
-                    self.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_user, 'system', f'Deleted all stock history records ({record_count} records)'))
-                    self.db.conn.commit()
+                    self.db.log_activity(self.current_user, 'system', f'Deleted all stock history records ({record_count} records)',
+                                         durable=True)
                     
                     progress_window.destroy()
                     
@@ -8438,9 +11373,7 @@ Permissions:
                         parent=self.root
                     )
                     
-                    # Refresh the history treeview
-                    if hasattr(self, 'history_tree') and self.history_tree:
-                        self.load_history_data(self.history_tree)
+                    # The history treeview follows the HistoryPurged event the delete published
                         
                 except Exception as e:
                     progress_window.destroy()
@@ -8554,8 +11487,8 @@ Permissions:
                 return
 
             try:
-                buying_price = float(buying_price) if buying_price else None
-                selling_price = float(selling_price) if selling_price else None
+                buying_price = to_cents(buying_price) if buying_price else None
+                selling_price = to_cents(selling_price) if selling_price else None
 
                 if buying_price is not None and buying_price <= 0:
                     raise ValueError("Buying price must be positive")
@@ -8576,7 +11509,6 @@ Permissions:
             if success:
                 messagebox.showinfo("Success", message, parent=add_dialog)
                 add_dialog.destroy()
-                self.load_stock_data(stock_tree)
             else:
                 messagebox.showerror("Error", message, parent=add_dialog)
 
@@ -8687,7 +11619,6 @@ Permissions:
             if success:
                 messagebox.showinfo("Success", message, parent=remove_dialog)
                 remove_dialog.destroy()
-                self.load_stock_data(stock_tree)
             else:
                 messagebox.showerror("Error", message, parent=remove_dialog)
 
@@ -8769,8 +11700,8 @@ Permissions:
                 return
 
             try:
-                buying_price = float(buying_price)
-                selling_price = float(selling_price)
+                buying_price = to_cents(buying_price)
+                selling_price = to_cents(selling_price)
                 stock = int(stock)
 
                 if buying_price <= 0:
@@ -8787,14 +11718,8 @@ Permissions:
                 return
 
             if self.db.add_meal(category, name, description, buying_price, selling_price, stock):
-                # Update the menu_items dictionary
-                if category not in self.menu_items:
-                    self.menu_items[category] = {}
-                self.menu_items[category][name] = selling_price
-
                 messagebox.showinfo("Success", f"{name} added to {category} category", parent=add_dialog)
                 add_dialog.destroy()
-                self.load_stock_data(stock_tree)
             else:
                 messagebox.showerror("Error", "Failed to add item. It may already exist.", parent=add_dialog)
 
@@ -8874,7 +11799,6 @@ Permissions:
                 if self.db.remove_meal(category, item):
                     messagebox.showinfo("Success", f"{item} removed from {category} category", parent=remove_dialog)
                     remove_dialog.destroy()
-                    self.load_stock_data(stock_tree)
                 else:
                     messagebox.showerror("Error", "Failed to remove item", parent=remove_dialog)
 
@@ -8958,17 +11882,12 @@ Permissions:
                                                                       pady=(10, 5))
 
 
-        # Load meals from database
-        db_meals = self.db.get_all_meals()
-        self.menu_items = {}
-        for category, name, _, _, selling_price, _, _, _, _, _ in db_meals:
-            if category not in self.menu_items:
-                self.menu_items[category] = {}
-            self.menu_items[category][name] = selling_price
-
         # Create meal category frames
         self.meal_frames = {}
         self.meal_entries = {}
+        self.stock_labels = {}
+        # Taken before the labels are filled, so changes made meanwhile still reach them
+        self.stock_labels_version = self.db.catalog.version
 
         # Left side frame (Food and Sauce)
         left_frame = tk.Frame(main_frame, bg="#1e1e2e")
@@ -9148,7 +12067,7 @@ Permissions:
                     item_label.pack(side=tk.LEFT, padx=5)
 
         # Price label
-                    price_label = tk.Label(item_frame, text=f"(ksh{price})", 
+                    price_label = tk.Label(item_frame, text=f"(ksh{format_money(price)})", 
                               font=FONT_SMALL, bg="#C2C2C8", fg="#000",
                               width=10, anchor="w")
                     price_label.pack(side=tk.LEFT, padx=5)
@@ -9158,6 +12077,7 @@ Permissions:
                               font=FONT_SMALL, bg="#C2C2C8", fg=stock_color,
                               width=5, anchor="w", name=f"stock_{category}_{item}")
                     stock_label.pack(side=tk.LEFT, padx=5)
+                    self.stock_labels[(category, item)] = (stock_label, current_stock)
 
         # Entry field
                     entry = tk.Entry(item_frame, bd=1, bg="#fff", fg="#2a2a40",
@@ -9303,7 +12223,7 @@ Permissions:
 
         try:
         # Get configured tax rate (default to 2% if not set)
-            tax_rate = self.config.get("tax_rate", 2.0) / 100.0
+            tax_percentage = self.config.get("tax_rate", 2.0)
             tax_enabled = self.config.get("tax_enabled", True)
         
             for category, items in self.menu_items.items():
@@ -9326,15 +12246,15 @@ Permissions:
                                                 parent=self.root)
                                 return
 
-                            cost = qty * price
+                            cost = qty * price  # cents
                             total_list.append(cost)
                     
                         # Add to items summary for QR code
-                            items_summary.append(f"{item}: {qty} x {price} = {cost}")
+                            items_summary.append(f"{item}: {qty} x {format_money(price)} = {format_money(cost)}")
                     
                         # Format item name to fit within 20 characters
                             item_display = item[:18] + ".." if len(item) > 18 else item
-                            self.bill_txt.insert(tk.END, f"{item_display:<20}{qty:>5}{price:>8.2f}{cost:>9.2f}\n")
+                            self.bill_txt.insert(tk.END, f"{item_display:<20}{qty:>5}{format_money(price):>8}{format_money(cost):>9}\n")
 
                         # Prepare sales data for recording (but don't record yet)
                             self.pending_sales.append({
@@ -9358,23 +12278,22 @@ Permissions:
             
             # Calculate tax based on configuration
                 if tax_enabled:
-                    tax = total_cost * tax_rate
-                    tax_percentage = self.config.get("tax_rate", 2.0)
+                    tax = percent_of(total_cost, tax_percentage)
                 else:
-                    tax = 0.0
+                    tax = 0
                     tax_percentage = 0.0
                 
                 grand_total = total_cost + tax
 
                 self.bill_txt.insert(tk.END, "-" * 55 + "\n")
-                self.bill_txt.insert(tk.END, f"{'Subtotal:':<20}{'':>5}ksh{total_cost:>12.2f}\n")
+                self.bill_txt.insert(tk.END, f"{'Subtotal:':<20}{'':>5}ksh{format_money(total_cost):>12}\n")
             
             # Show tax line only if tax is enabled
                 if tax_enabled:
-                    self.bill_txt.insert(tk.END, f"{f'Tax ({tax_percentage}%):':<20}{'':>5}ksh{tax:>12.2f}\n")
+                    self.bill_txt.insert(tk.END, f"{f'Tax ({tax_percentage}%):':<20}{'':>5}ksh{format_money(tax):>12}\n")
             
                 self.bill_txt.insert(tk.END, "-" * 55 + "\n")
-                self.bill_txt.insert(tk.END, f"{'GRAND TOTAL:':<20}{'':>5}ksh{grand_total:>12.2f}\n")
+                self.bill_txt.insert(tk.END, f"{'GRAND TOTAL:':<20}{'':>5}ksh{format_money(grand_total):>12}\n")
                 self.bill_txt.insert(tk.END, "=" * 55 + "\n")
 
             # Payment method info
@@ -9396,9 +12315,9 @@ Permissions:
                 self.bill_txt.insert(tk.END, "Tel: 0796939191/0707326661\n")
     
                 self.tax_btn_entry.delete(0, tk.END)
-                self.tax_btn_entry.insert(0, f"ksh{tax:.2f}")
+                self.tax_btn_entry.insert(0, f"ksh{format_money(tax)}")
                 self.total_btn_entry.delete(0, tk.END)
-                self.total_btn_entry.insert(0, f"ksh{grand_total:.2f}")
+                self.total_btn_entry.insert(0, f"ksh{format_money(grand_total)}")
             else:
                 self.bill_txt.insert(tk.END, "No items selected.\n")
                 self.tax_btn_entry.delete(0, tk.END)
@@ -9410,55 +12329,26 @@ Permissions:
             self.total_btn_entry.delete(0, tk.END)
 
     def refresh_stock_indicators(self):
-        """Refresh all stock indicators in the main system UI"""
-        if not hasattr(self, 'meal_frames') or not self.meal_frames:
+        """Refresh the stock indicators in the main system UI whose stock changed since the last refresh"""
+        if not self.stock_labels:
             return
-        
-        for category, frame in self.meal_frames.items():
-        # Find the scrollable frame within each category frame
-            scrollable_frame = None
-            for widget in frame.winfo_children():
-                if isinstance(widget, tk.Frame):  # This is the container
-                    for child in widget.winfo_children():
-                        if isinstance(child, tk.Canvas):
-                        # Get the scrollable frame from the canvas
-                            scrollable_frame = child.winfo_children()[0]
-                            break
-                    if scrollable_frame:
-                        break
-        
-            if not scrollable_frame:
+
+        catalog = self.db.catalog
+        version = catalog.version
+        changed = catalog.changed_since(self.stock_labels_version)
+        self.stock_labels_version = version
+        # Everything after a full catalog reload, otherwise only the items that changed
+        keys = list(self.stock_labels) if changed is None else [key for key in changed if key in self.stock_labels]
+
+        for key in keys:
+            stock_label, shown = self.stock_labels[key]
+            current_stock = catalog.stock(*key)
+            if current_stock == shown or not stock_label.winfo_exists():
                 continue
-            
-        # Update each item's stock indicator
-            for item_frame in scrollable_frame.winfo_children():
-                if not isinstance(item_frame, tk.Frame):
-                    continue
-                
-            # Find the item name label and stock label
-                item_name = None
-                stock_label = None
-            
-                for widget in item_frame.winfo_children():
-                    if isinstance(widget, tk.Label) and widget['text'] and '(' not in widget['text']:
-                    # This is the item name label (contains item name without parentheses)
-                        item_text = widget['text']
-                    # Extract item name (remove price part if present)
-                        if '(' in item_text:
-                            item_name = item_text.split('(')[0].strip()
-                        else:
-                            item_name = item_text.strip()
-                    elif isinstance(widget, tk.Label) and widget['text'] and '(' in widget['text'] and ')' in widget['text']:
-                    # This is the stock label (contains text in parentheses)
-                        stock_label = widget
-            
-                if item_name and stock_label and category in self.menu_items and item_name in self.menu_items[category]:
-                # Get current stock from database
-                    current_stock = self.db.get_current_stock_for_item(category, item_name)
-                    stock_color = "red" if current_stock <= 5 else "black"
-                
-                # Update the stock label
-                    stock_label.config(text=f"({current_stock})", fg=stock_color)
+            stock_color = "red" if current_stock <= 5 else "black"
+            stock_label.config(text=f"({current_stock})", fg=stock_color)
+            self.stock_labels[key] = (stock_label, current_stock)
+
     def print_receipt(self):
         """Print receipt and deduct items from stock"""
         # First calculate total to get pending sales data
@@ -9469,15 +12359,13 @@ Permissions:
             messagebox.showwarning("No Items", "No items selected for printing.", parent=self.root)
             return
         
-        # Record all sales in the database (this is where stock gets deducted)
-        for sale in self.pending_sales:
-            success, message = self.db.record_sale(sale)
-            if not success:
-                messagebox.showerror("Error", f"Failed to record sale: {message}", parent=self.root)
-                return
+        # Record the whole cart in one transaction (this is where stock gets deducted)
+        success, message = self.db.record_cart(self.pending_sales)
+        if not success:
+            messagebox.showerror("Error", f"Failed to record sale: {message}", parent=self.root)
+            return
         
-        # Refresh stock indicators after deduction
-        self.refresh_stock_indicators()
+        # Stock indicators follow the StockChanged event the sale published
         
         # Generate receipt content with proper formatting
         receipt_content = self.generate_receipt_content()
@@ -9540,9 +12428,9 @@ Permissions:
         content += f"{'Item':<25}{'Qty':>5}{'Price':>10}{'Total':>12}\n"
         content += "-" * width + "\n"
         
-        # Calculate totals
+        # Calculate totals (in cents)
         subtotal = 0
-        tax_rate = 0.02  # 2% tax
+        tax_percentage = 2  # 2% tax
         
         # Add items to receipt with optimized spacing
         for sale in self.pending_sales:
@@ -9554,18 +12442,18 @@ Permissions:
             
             # Format item name to fit increased width
             item_display = item[:22] + ".." if len(item) > 22 else item
-            content += f"{item_display:<25}{qty:>5}{price:>10.2f}{total:>12.2f}\n"
+            content += f"{item_display:<25}{qty:>5}{format_money(price):>10}{format_money(total):>12}\n"
         
         # Calculate tax and total
-        tax = subtotal * tax_rate
+        tax = percent_of(subtotal, tax_percentage)
         grand_total = subtotal + tax
         
         # Add totals section with optimized spacing
         content += "-" * width + "\n"
-        content += f"{'Subtotal:':<30}{subtotal:>22.2f}\n"
-        content += f"{'Tax (2%):':<30}{tax:>22.2f}\n"
+        content += f"{'Subtotal:':<30}{format_money(subtotal):>22}\n"
+        content += f"{'Tax (2%):':<30}{format_money(tax):>22}\n"
         content += "=" * width + "\n"
-        content += f"{'GRAND TOTAL:':<30}{grand_total:>22.2f}\n"
+        content += f"{'GRAND TOTAL:':<30}{format_money(grand_total):>22}\n"
         content += "=" * width + "\n"
         
         # Payment method
@@ -9671,23 +12559,9 @@ Permissions:
     def show_daily_sales(self):
         date = datetime.now().strftime('%Y-%m-%d')
 
-        # Get sales data for the current date for THIS USER ONLY
-        sales_data = self.db.get_daily_sales(date, self.current_user)
-        
-        # Calculate user-specific totals from sales_data
-        user_total_sales = sum(amt for _, _, _, amt, _, _, _ in sales_data)
-        user_total_profit = sum(profit for _, _, _, _, _, profit, _ in sales_data)
-        user_profit_percentage = (user_total_profit / user_total_sales * 100) if user_total_sales > 0 else 0
-
-        # Find most sold item and category for this user
-        item_sales = {}
-        category_sales = {}
-        for category, meal, qty, amt, _, _, _ in sales_data:
-            item_sales[meal] = item_sales.get(meal, 0) + qty
-            category_sales[category] = category_sales.get(category, 0) + qty
-        
-        most_sold_item = max(item_sales, key=item_sales.get) if item_sales else "None"
-        most_sold_category = max(category_sales, key=category_sales.get) if category_sales else "None"
+        # Get sales data for the current date for THIS USER ONLY; the tables and the
+        # printed summary are both drawn from it
+        summary = DailySalesSummary(date, self.current_user, self.db.get_daily_sales(date, self.current_user))
 
         sales_window = tk.Toplevel(self.root)
         sales_window.title(f'Daily Sales Summary - {self.current_user}')
@@ -9710,113 +12584,57 @@ Permissions:
         item_frame = tk.Frame(notebook, bg=BG_COLOR)
         notebook.add(item_frame, text="Sales by Item")
 
-        # Header row
-        header_frame = tk.Frame(item_frame, bg=BG_COLOR)
-        header_frame.pack(fill=tk.X, pady=(0, 10))
-
-        tk.Label(header_frame, text="Category", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(header_frame, text="Meal", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=20, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(header_frame, text="Qty Sold", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=16, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(header_frame, text="Amount", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(header_frame, text="Profit", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=17, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(header_frame, text="Margin", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
-
-        # Sales data rows
-        canvas = tk.Canvas(item_frame, bg=BG_COLOR, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(item_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=BG_COLOR)
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        # Only the rows in view are held by the tree, however many the day has
+        item_columns = (("Category", 150, tk.W), ("Meal", 200, tk.W), ("Qty Sold", 100, tk.E),
+                        ("Amount", 130, tk.E), ("Profit", 130, tk.E), ("Margin", 100, tk.E))
+        item_tree = ttk.Treeview(item_frame, columns=[column for column, _, _ in item_columns],
+                                 show="headings", selectmode="browse")
+        for column, width, anchor in item_columns:
+            item_tree.heading(column, text=column)
+            item_tree.column(column, width=width, anchor=anchor)
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(item_frame, orient="vertical", command=item_tree.yview)
+        self.virtual_grid(item_tree, scrollbar)
 
         scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
+        item_tree.pack(side="left", fill="both", expand=True)
 
-        for category, meal, qty, amt, method, profit, margin in sales_data:
-            row_frame = tk.Frame(scrollable_frame, bg=BG_COLOR)
-            row_frame.pack(fill=tk.X, pady=4)
-
-            tk.Label(row_frame, text=category, font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=meal, font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=20, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=str(qty), font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=20, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=f"{amt:.2f}", font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=25, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=f"{profit:.2f}", font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=23, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=f"{margin:.1f}%", font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=25, anchor="w").pack(side=tk.LEFT, padx=5)
+        self.show_rows(item_tree, summary.item_rows(), summary.item_values)
 
         # Tab 2: Payment methods
         payment_frame = tk.Frame(notebook, bg=BG_COLOR)
         notebook.add(payment_frame, text="Payment Methods")
 
-        # Header row
-        payment_header = tk.Frame(payment_frame, bg=BG_COLOR)
-        payment_header.pack(fill=tk.X, pady=(0, 10))
-
-        tk.Label(payment_header, text="Payment Method", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=25, anchor="w").pack(side=tk.LEFT, padx=5)
-        tk.Label(payment_header, text="Amount (ksh)", font=FONT_MEDIUM, bg=BG_COLOR,
-                 fg=ACCENT_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
-
-        # Payment method data
-        payment_canvas = tk.Canvas(payment_frame, bg=BG_COLOR, highlightthickness=0)
-        payment_scrollbar = ttk.Scrollbar(payment_frame, orient="vertical", command=payment_canvas.yview)
-        payment_scrollable = tk.Frame(payment_canvas, bg=BG_COLOR)
-
-        payment_scrollable.bind(
-            "<Configure>",
-            lambda e: payment_canvas.configure(scrollregion=payment_canvas.bbox("all"))
-        )
+        payment_tree = ttk.Treeview(payment_frame, columns=("Payment Method", "Amount"),
+                                    show="headings", selectmode="browse")
+        payment_tree.heading("Payment Method", text="Payment Method")
+        payment_tree.heading("Amount", text="Amount (ksh)")
+        payment_tree.column("Payment Method", width=250, anchor=tk.W)
+        payment_tree.column("Amount", width=150, anchor=tk.E)
 
-        payment_canvas.create_window((0, 0), window=payment_scrollable, anchor="nw")
-        payment_canvas.configure(yscrollcommand=payment_scrollbar.set)
+        payment_scrollbar = ttk.Scrollbar(payment_frame, orient="vertical", command=payment_tree.yview)
+        self.virtual_grid(payment_tree, payment_scrollbar)
 
         payment_scrollbar.pack(side="right", fill="y")
-        payment_canvas.pack(side="left", fill="both", expand=True)
+        payment_tree.pack(side="left", fill="both", expand=True)
 
-        # Group sales by payment method for THIS USER ONLY
-        payment_methods = {}
-        for _, _, _, amt, method, _, _ in sales_data:
-            payment_methods[method] = payment_methods.get(method, 0) + amt
-
-        for method, amount in payment_methods.items():
-            row_frame = tk.Frame(payment_scrollable, bg=BG_COLOR)
-            row_frame.pack(fill=tk.X, pady=2)
-
-            tk.Label(row_frame, text=method, font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=25, anchor="w").pack(side=tk.LEFT, padx=5)
-            tk.Label(row_frame, text=f"{amount:.2f}", font=FONT_SMALL, bg=BG_COLOR,
-                     fg=FG_COLOR, width=15, anchor="w").pack(side=tk.LEFT, padx=5)
+        # Grouped by payment method for THIS USER ONLY
+        self.show_rows(payment_tree, summary.payment_rows(), summary.payment_values)
 
         # Tab 3: Profit Summary - NOW USER SPECIFIC
         profit_frame = tk.Frame(notebook, bg=BG_COLOR)
         notebook.add(profit_frame, text="Profit Summary")
 
         # User-specific profit summary
-        tk.Label(profit_frame, text=f"Total Sales: ksh {user_total_sales:.2f}",
+        tk.Label(profit_frame, text=f"Total Sales: ksh {format_money(summary.total)}",
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=10)
-        tk.Label(profit_frame, text=f"Total Profit: ksh {user_total_profit:.2f}",
+        tk.Label(profit_frame, text=f"Total Profit: ksh {format_money(summary.profit)}",
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=SUCCESS_COLOR).pack(pady=5)
-        tk.Label(profit_frame, text=f"Profit Margin: {user_profit_percentage:.2f}%",
+        tk.Label(profit_frame, text=f"Profit Margin: {summary.profit_percentage:.2f}%",
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=ACCENT_COLOR).pack(pady=5)
-        tk.Label(profit_frame, text=f"Most Sold Item: {most_sold_item}",
+        tk.Label(profit_frame, text=f"Most Sold Item: {summary.most_sold_item}",
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=5)
-        tk.Label(profit_frame, text=f"Most Sold Category: {most_sold_category}",
+        tk.Label(profit_frame, text=f"Most Sold Category: {summary.most_sold_category}",
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=FG_COLOR).pack(pady=5)
 
         # Total row (at bottom of main frame)
@@ -9825,7 +12643,7 @@ Permissions:
 
         tk.Label(total_frame, text="TOTAL SALES:", font=('Poppins', 14, 'bold'),
                  bg=BG_COLOR, fg=ACCENT_COLOR, anchor="e").pack(side=tk.LEFT, padx=5, expand=True)
-        tk.Label(total_frame, text=f"ksh {user_total_sales:.2f}", font=('Poppins', 14, 'bold'),
+        tk.Label(total_frame, text=f"ksh {format_money(summary.total)}", font=('Poppins', 14, 'bold'),
                  bg=BG_COLOR, fg=ACCENT_COLOR).pack(side=tk.LEFT, padx=5)
 
         # Buttons
@@ -9842,7 +12660,7 @@ Permissions:
 
         tk.Button(
             btn_frame, text="Print Summary",
-            command=lambda: self.print_sales_summary(date, sales_data, user_total_sales, payment_methods, user_total_profit, user_profit_percentage, most_sold_item, most_sold_category),
+            command=lambda: self.print_sales_summary(summary),
             bg=BUTTON_COLOR, fg=FG_COLOR, font=FONT_MEDIUM,
             activebackground=ACCENT_COLOR, bd=0, padx=15, pady=5
         ).pack(side=tk.LEFT, padx=10)
@@ -9853,9 +12671,9 @@ Permissions:
             activebackground=ACCENT_COLOR, bd=0, padx=15, pady=5
         ).pack(side=tk.LEFT, padx=10)
 
-    def print_sales_summary(self, date, sales_data, total, payment_methods, total_profit, profit_percentage, most_sold_item, most_sold_category):
-        """Print a summary of daily sales with USER-SPECIFIC profit details"""
-        summary = f"Daily Sales Summary - {date} - {self.current_user}\n"
+    def print_sales_summary(self, sales):
+        """Print a DailySalesSummary with USER-SPECIFIC profit details"""
+        summary = f"Daily Sales Summary - {sales.date} - {sales.user}\n"
         summary += "=" * 50 + "\n\n"
 
         summary += "Sales by Item:\n"
@@ -9863,28 +12681,28 @@ Permissions:
         summary += f"{'Category':<15}{'Item':<20}{'Qty':>10}{'Amount':>15}{'Profit':>15}{'Margin':>10}\n"
         summary += "-" * 50 + "\n"
 
-        for category, item, qty, amt, _, profit, margin in sales_data:
-            summary += f"{category[:14]:<15}{item[:19]:<20}{qty:>10}{amt:>15.2f}{profit:>15.2f}{margin:>10.1f}%\n"
+        for category, item, qty, amt, _, profit, margin in sales.rows:
+            summary += f"{category[:14]:<15}{item[:19]:<20}{qty:>10}{format_money(amt):>15}{format_money(profit):>15}{margin or 0:>10.1f}%\n"
 
         summary += "\nPayment Methods:\n"
         summary += "-" * 50 + "\n"
         summary += f"{'Method':<25}{'Amount':>25}\n"
         summary += "-" * 50 + "\n"
 
-        for method, amount in payment_methods.items():
-            summary += f"{method[:24]:<25}{amount:>25.2f}\n"
+        for method, amount in sales.payment_methods.items():
+            summary += f"{method[:24]:<25}{format_money(amount):>25}\n"
 
         # Add USER-SPECIFIC profit information
         summary += "\nProfit Summary:\n"
         summary += "-" * 50 + "\n"
-        summary += f"{'Total Sales:':<25}{total:>25.2f}\n"
-        summary += f"{'Total Profit:':<25}{total_profit:>25.2f}\n"
-        summary += f"{'Profit Margin:':<25}{profit_percentage:>24.2f}%\n"
-        summary += f"{'Most Sold Item:':<25}{most_sold_item:>25}\n"
-        summary += f"{'Most Sold Category:':<25}{most_sold_category:>25}\n"
+        summary += f"{'Total Sales:':<25}{format_money(sales.total):>25}\n"
+        summary += f"{'Total Profit:':<25}{format_money(sales.profit):>25}\n"
+        summary += f"{'Profit Margin:':<25}{sales.profit_percentage:>24.2f}%\n"
+        summary += f"{'Most Sold Item:':<25}{sales.most_sold_item:>25}\n"
+        summary += f"{'Most Sold Category:':<25}{sales.most_sold_category:>25}\n"
 
         summary += "\n" + "=" * 50 + "\n"
-        summary += f"{'TOTAL SALES:':<25}{total:>25.2f}\n"
+        summary += f"{'TOTAL SALES:':<25}{format_money(sales.total):>25}\n"
         summary += "=" * 50 + "\n"
 
         try:
@@ -10013,11 +12831,7 @@ Permissions:
                 
                 if success:
                     # Record the activity
-                    self.db.cursor.execute('''
-                        INSERT INTO user_activity (user, activity_type, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.current_user, 'system', f'Cleared all sales for {today}'))
-                    self.db.conn.commit()
+                    self.db.log_activity(self.current_user, 'system', f'Cleared all sales for {today}', durable=True)
                     
                     progress_window.destroy()
                     
@@ -10138,8 +12952,8 @@ Permissions:
                 return
 
             try:
-                buying_price = float(buying_price)
-                selling_price = float(selling_price)
+                buying_price = to_cents(buying_price)
+                selling_price = to_cents(selling_price)
                 stock = int(stock)
 
                 if buying_price <= 0:
@@ -10157,11 +12971,6 @@ Permissions:
 
             # Add the meal to database
             if self.db.add_meal(category, name, description, buying_price, selling_price, stock):
-                # Update the menu_items dictionary
-                if category not in self.menu_items:
-                    self.menu_items[category] = {}
-                self.menu_items[category][name] = selling_price
-
                 # Refresh the meal entries in the UI
                 for widget in self.meal_frames[category].winfo_children():
                     if isinstance(widget, tk.Canvas):
@@ -10190,7 +12999,7 @@ Permissions:
                         stock = self.db.get_current_stock_for_item(category, item)
                         stock_color = "red" if stock <= 5 else "black"
 
-                        tk.Label(item_frame, text=f"{item[:18]:<18} (ksh{price}):",
+                        tk.Label(item_frame, text=f"{item[:18]:<18} (ksh{format_money(price)}):",
                                  font=FONT_SMALL, bg="#C2C2C8", fg="#000",
                                  width=20, anchor="w").pack(side=tk.LEFT, padx=5)
 
@@ -10286,9 +13095,7 @@ Permissions:
 
             if messagebox.askyesno("Confirm", confirm_msg, parent=remove_meal_win):
                 if self.db.remove_meal(category, meal):
-                    # Update the menu_items dictionary
-                    del self.menu_items[category][meal]
-                    if not self.menu_items[category]:  # Remove category if empty
+                    if category not in self.menu_items:  # Remove category if empty
                         del self.menu_items[category]
                         del self.meal_frames[category]
                         del self.meal_entries[category]
@@ -10321,7 +13128,7 @@ Permissions:
                                 stock = self.db.get_current_stock_for_item(category, item)
                                 stock_color = "red" if stock <= 5 else "black"
 
-                                tk.Label(item_frame, text=f"{item[:18]:<18} (ksh{price}):",
+                                tk.Label(item_frame, text=f"{item[:18]:<18} (ksh{format_money(price)}):",
                                          font=FONT_SMALL, bg="#C2C2C8", fg="#000",
                                          width=20, anchor="w").pack(side=tk.LEFT, padx=5)
 
@@ -10417,18 +13224,16 @@ Permissions:
         self.transaction_type = "CustomerPayBillOnline"
         self.party_b = "174379"
 
-        # Calculate grand total from pending sales
-        grand_total = 0.0
+        # Calculate grand total (in cents) from pending sales
+        grand_total = 0
         if hasattr(self, 'pending_sales') and self.pending_sales:
             for sale in self.pending_sales:
                 grand_total += sale['amount']
             
             # Add tax if applicable
-            tax_rate = self.config.get("tax_rate", 2.0) / 100.0
             tax_enabled = self.config.get("tax_enabled", True)
             if tax_enabled:
-                tax = grand_total * tax_rate
-                grand_total += tax
+                grand_total += percent_of(grand_total, self.config.get("tax_rate", 2.0))
 
         if grand_total <= 0:
             messagebox.showerror("Error", "No items selected or total is zero. Please calculate total first.", parent=mpesa_win)
@@ -10442,7 +13247,7 @@ Permissions:
         amount_frame = tk.Frame(mpesa_win, bg=BG_COLOR)
         amount_frame.pack(fill=tk.X, padx=20, pady=10)
         
-        tk.Label(amount_frame, text=f"Amount to Pay: Ksh {grand_total:.2f}", 
+        tk.Label(amount_frame, text=f"Amount to Pay: Ksh {format_money(grand_total)}", 
                  font=FONT_MEDIUM, bg=BG_COLOR, fg=ACCENT_COLOR).pack()
         tk.Label(amount_frame, text=f"Customer: {customer_name}",
                  font=FONT_SMALL, bg=BG_COLOR, fg=FG_COLOR).pack(pady=5)
@@ -10479,7 +13284,7 @@ Permissions:
                     # Show success message with customer name
                     success_message = (
                         f"✅ PAYMENT SUCCESSFUL!\n\n"
-                        f"💰 Amount: Ksh {grand_total:.2f}\n"
+                        f"💰 Amount: Ksh {format_money(grand_total)}\n"
                         f"📱 Phone: {phone}\n"
                         f"👤 Customer: {customer_name}\n"
                         f"🕒 Time: {datetime.now().strftime('%H:%M:%S')}\n\n"
@@ -10490,7 +13295,7 @@ Permissions:
                     # Update payment method details with customer name
                     self.payment_method_used = {
                         "method": "Mpesa",
-                        "details": f"Phone: {phone}, Customer: {customer_name}, Amount: {grand_total:.2f}"
+                        "details": f"Phone: {phone}, Customer: {customer_name}, Amount: {format_money(grand_total)}"
                     }
                     
                     # Update receipt to show payment confirmation and customer name
@@ -10550,7 +13355,7 @@ Permissions:
             self.bill_txt.insert(tk.END, "=" * 55 + "\n")
             self.bill_txt.insert(tk.END, f"Customer: {customer_name}\n")
             self.bill_txt.insert(tk.END, f"Phone: {phone}\n")
-            self.bill_txt.insert(tk.END, f"Amount: Ksh {amount:.2f}\n")
+            self.bill_txt.insert(tk.END, f"Amount: Ksh {format_money(amount)}\n")
             self.bill_txt.insert(tk.END, f"Time: {datetime.now().strftime('%H:%M:%S')}\n")
             self.bill_txt.insert(tk.END, "Status: ✅ Payment Received\n")
             self.bill_txt.insert(tk.END, "=" * 55 + "\n")
@@ -10569,7 +13374,7 @@ Permissions:
             return None
 
     def initiate_stk_push(self, access_token, phone, amount):
-        """Initiate STK push to customer's phone"""
+        """Initiate STK push to customer's phone for amount in cents"""
         try:
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             password = base64.b64encode(
@@ -10587,7 +13392,7 @@ Permissions:
                 "Password": password,
                 "Timestamp": timestamp,
                 "TransactionType": self.transaction_type,
-                "Amount": int(amount),  # Convert to integer for MPesa API
+                "Amount": int(amount) // 100,  # MPesa takes whole shillings
                 "PartyA": phone,
                 "PartyB": self.business_short_code,
                 "PhoneNumber": phone,
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hardware
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = hardware.DatabaseManager()
+    yield manager
+    manager.close()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: benchmarks that take several seconds (deselect with -m 'not slow')")
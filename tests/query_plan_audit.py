@@ -0,0 +1,250 @@
+"""Query plan audit over hardware.py, run by test_query_plan_audit.py"""
+import ast
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import hardware
+
+
+class QueryPlanAudit:
+    """Checks that no statement full-scans a large table, against a synthetic dataset
+
+    Statements come from two places: the ones DatabaseManager actually runs while
+    it is exercised, and every literal SQL string passed to execute() anywhere in
+    hardware.py (which covers the HotelApp screens without needing a display).
+    Run by test_query_plan_audit.py.
+    """
+    LARGE_TABLES = ("sales", "stock_history", "user_activity", "daily_item_totals", "sales_hourly")
+    # Statements that read a whole table on purpose, each with the reason
+    ALLOWED_SCANS = (
+        # One-off backfill of the per-day tally when it is first created
+        "INSERT INTO daily_item_totals (date, category, meal, quantity, amount, profit) "
+        "SELECT date, category, meal, SUM(quantity), SUM(amount), SUM(profit) "
+        "FROM sales GROUP BY date, category, meal",
+        # Full exports
+        "SELECT * FROM sales ORDER BY date DESC, time DESC",
+        "SELECT * FROM user_activity ORDER BY timestamp DESC",
+        # Clearing a table whose delete triggers keep its search index and row count in step
+        "DELETE FROM stock_history",
+        "DELETE FROM sales_hourly",
+        # All-time distinct customers for the analytics tab, read once per opening on a worker
+        # thread; it scans idx_sales_customer, which covers it, rather than the table
+        "SELECT COUNT(DISTINCT customer_name) as total_customers, "
+        "COUNT(DISTINCT CASE WHEN date >= date('now', '-30 days') THEN customer_name END) as returning_customers "
+        "FROM sales WHERE customer_name != 'Walk-in Customer'",
+    )
+
+    def __init__(self, rows=50000, days=365):
+        self.rows = rows
+        self.days = days
+        self.statements = set()
+        self.checked = 0
+
+    def run(self):
+        """Return a list of (statement, plan detail) for every offending statement"""
+        workdir = tempfile.mkdtemp(prefix="plan_audit_")
+        db = hardware.DatabaseManager(os.path.join(workdir, "plan_audit.db"))
+        try:
+            self._load_dataset(db)
+            # Reopen connections with tracing on so every executed statement is captured
+            db.close()
+            db.pool.trace_callback = self.statements.add
+            self._exercise(db)
+            db.pool.trace_callback = None
+            db.close()
+            self.statements.update(self._literal_statements())
+
+            failures = []
+            statements = {self._normalize(sql) for sql in self.statements}
+            # Temp tables only exist on the connection that made them; make them again here
+            # so the statements reading them can be planned too
+            for sql in sorted(statements):
+                if sql.upper().startswith(("CREATE TEMP ", "CREATE TEMPORARY ")):
+                    try:
+                        db.conn.execute(sql, (None,) * sql.count("?"))
+                    except sqlite3.OperationalError:
+                        pass  # The same table from another copy of the statement
+            for sql in sorted(statements):
+                if not self._is_query(sql) or sql in self._allowed:
+                    continue
+                self.checked += 1
+                detail = self._full_scan(db, sql)
+                if detail:
+                    failures.append((sql, detail))
+            return failures
+        finally:
+            db.activity.close()
+            db.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    @property
+    def _allowed(self):
+        return {self._normalize(sql) for sql in self.ALLOWED_SCANS}
+
+    @staticmethod
+    def _normalize(sql):
+        # Drop -- comments while the line breaks that end them are still there
+        return " ".join(re.sub(r"--[^\n]*", "", sql).split())
+
+    @staticmethod
+    def _is_query(sql):
+        words = sql.split()
+        if not words:
+            return False
+        verb = words[0].upper()
+        return verb in ("SELECT", "WITH", "UPDATE", "DELETE") or (verb == "INSERT" and "SELECT" in sql.upper())
+
+    def _load_dataset(self, db):
+        """Fill sales, stock_history and user_activity with rows spread over the last self.days days"""
+        meals = [(category, name, item.buying_price, item.selling_price)
+                 for (category, name), item in db.catalog.items.items()]
+        users = ["admin", "cashier", "manager", "night"]
+        methods = ["Cash", "M-Pesa", "Card"]
+        start = datetime.now() - timedelta(days=self.days)
+        sales, history, activity = [], [], []
+        for i in range(self.rows):
+            when = start + timedelta(seconds=i * self.days * 86400 // self.rows)
+            date, clock = when.strftime('%Y-%m-%d'), when.strftime('%H:%M:%S')
+            category, name, buying, selling = meals[i % len(meals)]
+            user = users[i % len(users)]
+            sales.append((user, date, clock, f"Customer {i % 500}", category, name, 1, buying, selling,
+                          selling, selling - buying, methods[i % len(methods)], "",
+                          f"{date} {clock}"))
+            history.append((date, clock, name, category, "sale", 1, 100, 99, buying, selling, user, "",
+                            f"{date} {clock}"))
+            activity.append((user, "sale", f"Sold {name}", f"{date} {clock}"))
+        with db.pool.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO sales (user, date, time, customer_name, category, meal, quantity,
+                                   buying_price, selling_price, amount, profit, payment_method,
+                                   payment_details, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', sales)
+            cursor.executemany('''
+                INSERT INTO stock_history (date, time, item_name, category, change_type, quantity,
+                                           previous_stock, new_stock, buying_price, selling_price,
+                                           user, notes, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', history)
+            cursor.executemany('''
+                INSERT INTO user_activity (user, activity_type, description, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', activity)
+            cursor.execute('''
+                INSERT INTO daily_item_totals (date, category, meal, quantity, amount, profit)
+                SELECT date, category, meal, SUM(quantity), SUM(amount), SUM(profit)
+                FROM sales
+                GROUP BY date, category, meal
+            ''')
+            cursor.execute(db.HOURLY_ROLLUP_SELECT.format(source="sales"), ("0000-01-01", "9999-12-31"))
+            cursor.executemany(db.HOURLY_ROLLUP_UPSERT, cursor.fetchall())
+        db.pool.writer.execute("ANALYZE")
+
+    def _exercise(self, db):
+        """Drive the DatabaseManager read and write paths once each"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        category, name = next(iter(db.catalog.items))
+        db.get_daily_sales(today)
+        db.get_daily_sales(today, "admin")
+        db.get_daily_summary(today)
+        db.get_all_meals()
+        db.get_current_stock()
+        db.get_stock_history()
+        db.get_stock_history(item_filter=name, category_filter=category)
+        db.search_stock_history(name)
+        db.search_user_activity("sold")
+        db.get_top_selling_items()
+        db.get_user_sales_summary()
+        db.get_user_sales_summary("admin")
+        db.get_user_activity()
+        db.get_user_activity("admin")
+        db.get_archive_partitions()
+        for pager in (db.page_user_sales("admin"), db.page_stock_history(), db.page_user_activity("admin")):
+            # Two pages, so the seek form of the query is traced too
+            pager.next_page()
+            pager.next_page()
+            pager.estimate_total()
+        # The same queries as a VirtualGrid reads them: a jump, then seeks either side of it
+        for pager, column in ((db.page_stock_history(), ("quantity",)), (db.page_user_sales("admin"), ("amount",)),
+                              (db.page_user_activity(), ("activity_type",))):
+            rows = hardware.QueryRows.from_cursor(pager, {"column": column})
+            for sort in ((None, False), ("column", True)):
+                rows.sort(*sort)
+                middle = len(rows) // 2
+                rows.window(middle, 50)
+                rows.window(middle + rows.page_size, 50)
+                rows.window(middle - rows.page_size, 50)
+        price = db.get_selling_price(category, name)
+        db.record_sale({'user': "admin", 'date': today, 'time': "12:00:00", 'customer_name': "Audit",
+                        'category': category, 'meal': name, 'quantity': 1, 'price': price, 'amount': price,
+                        'payment_method': "Cash", 'payment_details': ""})
+        db.update_stock(category, name, 5, user="admin", notes="audit")
+        db.void_sales(today, user="admin")
+        db.purge_user_activity(300)
+        db.purge_stock_history(10)
+        db.rebuild_sales_hourly((datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
+
+    @staticmethod
+    def _literal_statements():
+        """Every string literal passed as the SQL argument of an execute() call in hardware.py
+
+        f-strings are included when their only placeholders name a partitioned table
+        (as in FROM {sales}), which is filled in with the live table.
+        """
+        with open(hardware.__file__, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        statements = set()
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("execute", "executemany") and node.args):
+                continue
+            sql = node.args[0]
+            if isinstance(sql, ast.Constant) and isinstance(sql.value, str):
+                statements.add(sql.value.strip())
+            elif isinstance(sql, ast.JoinedStr):
+                parts = []
+                for part in sql.values:
+                    if isinstance(part, ast.Constant):
+                        parts.append(part.value)
+                    elif isinstance(part.value, ast.Name) and part.value.id in hardware.ARCHIVED_TABLES:
+                        parts.append(part.value.id)
+                    else:
+                        break
+                else:
+                    statements.add("".join(parts).strip())
+        return statements
+
+    @staticmethod
+    def _tables(sql):
+        """{alias: table} for every table named with an alias, since plans show the alias"""
+        keywords = {"WHERE", "ON", "USING", "LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS", "NATURAL",
+                    "JOIN", "GROUP", "ORDER", "LIMIT", "HAVING", "WINDOW", "UNION", "EXCEPT", "INTERSECT",
+                    "SET", "VALUES", "SELECT", "INDEXED", "NOT"}
+        pattern = r"(?:\bFROM|\bJOIN|,)\s+(?:\w+\.)?(\w+)\s+(?:AS\s+)?(\w+)"
+        return {alias: table for table, alias in re.findall(pattern, sql, re.IGNORECASE)
+                if alias.upper() not in keywords}
+
+    def _full_scan(self, db, sql):
+        """Plan detail of the first full scan of a large table, or None"""
+        try:
+            rows = db.conn.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")).fetchall()
+        except sqlite3.Error as e:
+            # A statement that cannot be planned cannot be shown not to scan
+            return f"EXPLAIN failed: {e}"
+        bounded = " LIMIT " in f" {self._normalize(sql).upper()} "
+        tables = self._tables(sql)
+        for row in rows:
+            detail = row[3]
+            words = detail.split()
+            if len(words) < 2 or words[0] != "SCAN" or tables.get(words[1], words[1]) not in self.LARGE_TABLES:
+                continue
+            # A covering index still reads every row when it is scanned rather than searched;
+            # walking an index in order is only fine when a LIMIT stops it after a few rows
+            if " INDEX " in detail and bounded:
+                continue
+            return detail
+        return None
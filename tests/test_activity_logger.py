@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+import hardware
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = hardware.ConnectionPool(str(tmp_path / "activity.db"), busy_timeout=50)
+    with pool.transaction() as cursor:
+        cursor.execute("CREATE TABLE user_activity (id INTEGER PRIMARY KEY, user TEXT, activity_type TEXT, "
+                       "description TEXT, timestamp TEXT)")
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def logger(pool):
+    # Long interval, so only the test's own flushes write
+    logger = hardware.ActivityLogger(pool, flush_interval=60)
+    yield logger
+    logger.close()
+
+
+def logged(pool):
+    return pool.writer.execute("SELECT COUNT(*) FROM user_activity").fetchone()[0]
+
+
+def test_locked_flush_keeps_the_batch(pool, logger):
+    blocker = sqlite3.connect(pool.database_file)
+    blocker.execute("BEGIN IMMEDIATE")
+    logger.log("u", "sale", "first")
+
+    with pytest.raises(sqlite3.OperationalError):
+        logger.log("u", "sale", "second", durable=True)
+    logger.flush()
+    assert logged(pool) == 0
+
+    blocker.rollback()
+    blocker.close()
+    logger.flush()
+
+    assert [row[0] for row in pool.writer.execute("SELECT description FROM user_activity ORDER BY id")] == \
+        ["first", "second"]
+
+
+def test_durable_log_inside_transaction_waits_for_commit(pool, logger):
+    with pool.transaction():
+        logger.log("u", "sale", "inside", durable=True)
+        assert logged(pool) == 0
+
+    assert logged(pool) == 1
+
+
+def test_full_queue_inside_transaction_holds_the_row(pool):
+    logger = hardware.ActivityLogger(pool, flush_interval=60, max_pending=1)
+    try:
+        with pool.transaction():
+            logger.log("u", "sale", "queued")
+            logger.log("u", "sale", "overflow")
+        assert logged(pool) == 2
+    finally:
+        logger.close()
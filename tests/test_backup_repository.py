@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import hardware
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return hardware.BackupRepository(str(tmp_path / "repo"))
+
+
+def make_db(path, rows, tag="a"):
+    """A database a few chunks long; rows decides how much of it differs from another"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", ((f"{tag}-{i}-" + "x" * 200,) for i in range(rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def chunk_files(repo):
+    return {name for prefix in os.listdir(repo.chunks_dir) for name in os.listdir(os.path.join(repo.chunks_dir, prefix))}
+
+
+def snapshot_at(repo, monkeypatch, when, path):
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(when)
+    with monkeypatch.context() as patch:
+        patch.setattr(hardware, "datetime", Clock)
+        return repo.create_snapshot(path)["id"]
+
+
+def test_unchanged_chunks_are_stored_once(repo, tmp_path):
+    path = make_db(str(tmp_path / "live.db"), 5000)
+
+    first = repo.create_snapshot(path)
+    stored = chunk_files(repo)
+    second = repo.create_snapshot(path)
+
+    assert first["chunk_count"] > 1
+    assert second["new_bytes"] == 0
+    assert chunk_files(repo) == stored
+
+    # Appending rows only adds the chunks that changed
+    make_db(path, 10)
+    third = repo.create_snapshot(path)
+    assert 0 < third["new_bytes"] < first["new_bytes"]
+    assert len(chunk_files(repo)) < len(stored) + third["chunk_count"]
+
+
+def test_restore_round_trip(repo, tmp_path):
+    path = make_db(str(tmp_path / "live.db"), 3000)
+    snapshot = repo.create_snapshot(path)
+    make_db(path, 5, tag="later")
+
+    restored = str(tmp_path / "restored.db")
+    size = repo.restore_to(snapshot["id"], restored)
+
+    assert size == snapshot["size"] == os.path.getsize(restored)
+    with sqlite3.connect(restored) as conn:
+        rows = conn.execute("SELECT id, name FROM items ORDER BY id").fetchall()
+    assert len(rows) == 3000
+    assert rows[-1] == (3000, "a-2999-" + "x" * 200)
+
+
+def test_retention_keeps_newest_per_bucket_and_collects_chunks(repo, tmp_path, monkeypatch):
+    ids = {}
+    for when, tag in (("2026-10-10T10:00:00", "t0"), ("2026-10-10T10:30:00", "t1"),
+                      ("2026-10-10T11:00:00", "t2"), ("2026-10-12T09:00:00", "t3")):
+        # Every snapshot has chunks of its own
+        ids[tag] = snapshot_at(repo, monkeypatch, when, make_db(str(tmp_path / f"{tag}.db"), 2000, tag))
+    orphan = os.path.join(repo.chunks_dir, "00", "0" * 64)
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    open(orphan, "wb").close()
+
+    removed = repo.apply_retention({"hourly": 1, "daily": 2})
+
+    # The newest of the last hour, and the newest of each of the last two days
+    assert removed == 2
+    assert [entry["id"] for entry in repo.list_snapshots()] == [ids["t3"], ids["t2"]]
+    assert sorted(os.listdir(repo.snapshots_dir)) == sorted(f"{ids[tag]}.json" for tag in ("t2", "t3"))
+    referenced = set()
+    for snapshot_id in (ids["t2"], ids["t3"]):
+        with open(os.path.join(repo.snapshots_dir, f"{snapshot_id}.json")) as f:
+            referenced.update(json.load(f)["chunks"])
+    assert chunk_files(repo) == referenced
+    repo.restore_to(ids["t2"], str(tmp_path / "kept.db"))
@@ -0,0 +1,96 @@
+import os
+import sqlite3
+
+import pytest
+
+import hardware
+
+
+class BaselineManager(hardware.DatabaseManager):
+    """Creates the tables as the app did before migrations, money as REAL shillings"""
+    MIGRATIONS = hardware.DatabaseManager.MIGRATIONS[:1]
+
+
+@pytest.fixture
+def baseline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "baseline.db")
+    manager = BaselineManager(path)
+    manager.close()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE meals SET buying_price = 0.1, selling_price = 0.1 + 0.2, "
+                     "total_revenue = 19.99 * 3, total_profit = 0.1 + 0.2 - 0.1 WHERE name = 'Rice'")
+        conn.execute('''
+            INSERT INTO sales (user, date, time, customer_name, category, meal, quantity,
+                               buying_price, selling_price, amount, profit, payment_method)
+            VALUES ('u', '2026-10-17', '10:15:00', 'c', 'Food', 'Rice', 3, 0.1, 19.99, 19.99 * 3,
+                    19.99 * 3 - 0.1 * 3, 'Cash')
+        ''')
+        conn.execute('''
+            INSERT INTO daily_summaries (date, user, total_sales, cash_sales, total_profit)
+            VALUES ('2026-10-17', 'u', 1234.56, 0.1 + 0.2, -0.1 - 0.2)
+        ''')
+        # Pre-versioning databases report user_version 0
+        conn.execute("PRAGMA user_version = 0")
+    sales_ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'sales'").fetchone()[0]
+    conn.close()
+
+    # An archived month, as archive_month wrote them before money was in cents
+    os.makedirs(hardware.ARCHIVE_DIR)
+    archive = sqlite3.connect(os.path.join(hardware.ARCHIVE_DIR, "hotel_archive_2025_03.db"))
+    with archive:
+        archive.execute(sales_ddl)
+        archive.execute('''
+            INSERT INTO sales (user, date, time, customer_name, category, meal, quantity,
+                               buying_price, selling_price, amount, profit, payment_method)
+            VALUES ('u', '2025-03-15', '09:00:00', 'c', 'Food', 'Rice', 1, 0.7, 1.1, 0.1 + 0.2 + 0.8, 0.4, 'Cash')
+        ''')
+    archive.close()
+    return path
+
+
+def test_real_shillings_become_exact_cents(baseline):
+    db = hardware.DatabaseManager(baseline)
+    try:
+        assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == hardware.DatabaseManager.MIGRATIONS[-1][0]
+        assert db.cursor.execute('''
+            SELECT buying_price, selling_price, total_revenue, total_profit FROM meals WHERE name = 'Rice'
+        ''').fetchone() == (10, 30, 5997, 20)
+        assert db.cursor.execute('''
+            SELECT buying_price, selling_price, amount, profit FROM sales
+        ''').fetchone() == (10, 1999, 5997, 5967)
+        assert db.cursor.execute('''
+            SELECT total_sales, cash_sales, total_profit FROM daily_summaries
+        ''').fetchone() == (123456, 30, -30)
+        for table in ("meals", "sales", "daily_summaries"):
+            types = {row[1]: row[2] for row in db.cursor.execute(f"PRAGMA table_info({table})")}
+            assert {types[column] for column in hardware.DatabaseManager.CENTS_TABLES[table][1]} == {"INTEGER"}
+    finally:
+        db.close()
+
+    archive = sqlite3.connect(os.path.join(hardware.ARCHIVE_DIR, "hotel_archive_2025_03.db"))
+    try:
+        assert archive.execute("SELECT buying_price, selling_price, amount, profit FROM sales").fetchone() == \
+            (70, 110, 110, 40)
+        assert archive.execute("PRAGMA user_version").fetchone()[0] == hardware.ARCHIVE_SCHEMA_VERSION
+    finally:
+        archive.close()
+
+
+@pytest.mark.parametrize("cents", [0, 1, 10, 30, 5997, 123456, -30, 100000000])
+def test_format_money_round_trips_through_to_cents(cents):
+    assert hardware.to_cents(hardware.format_money(cents)) == cents
+    assert hardware.to_cents(hardware.format_money(cents, grouped=True)) == cents
+
+
+@pytest.mark.parametrize("amount, cents", [("0.30", 30), (0.1 + 0.2, 30), ("1,234.56", 123456), ("1.005", 101),
+                                           (19.99 * 3, 5997)])
+def test_to_cents_rounds_half_up(amount, cents):
+    assert hardware.to_cents(amount) == cents
+
+
+@pytest.mark.parametrize("cents, percent, share", [(5997, 16, 960), (25, 50, 13), (30, 10, 3), (-25, 50, -13),
+                                                   (123456, "7.5", 9259)])
+def test_percent_of_rounds_to_whole_cents(cents, percent, share):
+    assert hardware.percent_of(cents, percent) == share
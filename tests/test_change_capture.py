@@ -0,0 +1,97 @@
+import json
+from datetime import datetime
+
+import hardware
+
+TODAY = datetime.now().strftime('%Y-%m-%d')
+
+
+def sale(quantity=1):
+    return dict(user='u', date=TODAY, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+def export(db, tmp_path, advance=True):
+    """{table: [(op, id)]} for one incremental export, its watermarks saved unless advance is False"""
+    db.activity.flush()
+    exporter = hardware.DataExporter(db, str(tmp_path), fmt="jsonl", compress=False)
+    jobs, marks = db.change_capture_jobs()
+    changes = {}
+    for job in jobs:
+        path = str(tmp_path / f"{job.name}.jsonl")
+        exporter.export(job, path)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        changes[job.name[:-len("_changes")]] = sorted((record["op"], record["id"]) for record in records)
+    if advance:
+        assert db.advance_export_watermarks(list(marks.values()))
+    return changes
+
+
+def ids(db, table):
+    return [row[0] for row in db.cursor.execute(f"SELECT id FROM {table} ORDER BY id")]
+
+
+def test_first_export_sends_every_row(db, tmp_path):
+    assert db.record_cart([sale(), sale(2)])[0]
+
+    changes = export(db, tmp_path)
+
+    assert changes["sales"] == [("upsert", id) for id in ids(db, "sales")]
+    assert len(changes["meals"]) == len(ids(db, "meals"))
+
+
+def test_only_changes_after_the_watermark_are_sent(db, tmp_path):
+    assert db.record_cart([sale()])[0]
+    export(db, tmp_path)
+    again = export(db, tmp_path)
+    assert again["sales"] == again["user_activity"] == []
+    # Meals are matched on last_updated, and only those stamped in the mark's own second come again
+    mark = db.get_export_watermarks()["meals"][1]
+    assert {db.cursor.execute("SELECT last_updated FROM meals WHERE id = ?", (id,)).fetchone()[0]
+            for _, id in again["meals"]} <= {mark}
+
+    assert db.record_cart([sale(3)])[0]
+    changes = export(db, tmp_path)
+
+    assert changes["sales"] == [("upsert", ids(db, "sales")[-1])]
+    assert [op for op, _ in changes["user_activity"]] == ["upsert"]
+    # Selling Rice changed its stock and totals
+    rice = db.cursor.execute("SELECT id FROM meals WHERE category = 'Food' AND name = 'Rice'").fetchone()[0]
+    assert ("upsert", rice) in changes["meals"]
+
+
+def test_deletes_are_sent_as_tombstones_once(db, tmp_path):
+    assert db.record_cart([sale(), sale(2)])[0]
+    export(db, tmp_path)
+    voided = ids(db, "sales")
+
+    assert db.void_sales(TODAY)[0]
+    changes = export(db, tmp_path)
+
+    assert changes["sales"] == [("delete", id) for id in voided]
+    assert db.cursor.execute("SELECT COUNT(*) FROM export_tombstones").fetchone()[0] == 0
+    assert export(db, tmp_path)["sales"] == []
+
+
+def test_unsaved_watermarks_send_the_changes_again(db, tmp_path):
+    assert db.record_cart([sale()])[0]
+    export(db, tmp_path)
+    assert db.record_cart([sale()])[0]
+
+    first = export(db, tmp_path, advance=False)
+
+    assert export(db, tmp_path) == first
+
+
+def test_purged_activity_is_sent_as_deletes(db, tmp_path):
+    with db.pool.transaction() as cursor:
+        cursor.execute("INSERT INTO user_activity (user, activity_type, description, timestamp) "
+                       "VALUES ('u', 'login', 'old login', '2020-01-01 08:00:00')")
+        old = cursor.lastrowid
+    export(db, tmp_path)
+
+    assert db.purge_user_activity(30) == 1
+    changes = export(db, tmp_path)
+
+    assert changes["user_activity"] == [("delete", old)]
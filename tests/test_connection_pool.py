@@ -0,0 +1,46 @@
+import sqlite3
+import threading
+
+import pytest
+
+import hardware
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = hardware.ConnectionPool(str(tmp_path / "pool.db"))
+    pool.writer.execute("PRAGMA foreign_keys = ON")
+    with pool.transaction() as cursor:
+        cursor.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        # Checked at COMMIT, so a missing parent makes the commit itself fail
+        cursor.execute("CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)")
+    yield pool
+    pool.close_all()
+
+
+def test_failed_commit_rolls_back(pool):
+    committed = []
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as cursor:
+            cursor.execute("INSERT INTO child (parent_id) VALUES (1)")
+            pool.after_commit(lambda: committed.append(True))
+
+    assert not committed
+    assert not pool.writer.in_transaction
+    # The next transaction starts and commits normally
+    with pool.transaction() as cursor:
+        cursor.execute("INSERT INTO parent (id) VALUES (1)")
+        cursor.execute("INSERT INTO child (parent_id) VALUES (1)")
+    assert pool.writer.execute("SELECT COUNT(*) FROM child").fetchone()[0] == 1
+
+
+def test_in_transaction_is_per_thread(pool):
+    seen = []
+    assert not pool.in_transaction()
+    with pool.transaction():
+        assert pool.in_transaction()
+        other = threading.Thread(target=lambda: seen.append(pool.in_transaction()))
+        other.start()
+        other.join()
+    assert seen == [False]
+    assert not pool.in_transaction()
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+DAY = '2026-10-17'
+
+
+def sale(db, category, meal, quantity=1):
+    price = db.get_selling_price(category, meal)
+    return dict(user='u', date=DAY, time='10:15:00', customer_name='c', category=category, meal=meal,
+                quantity=quantity, price=price, amount=price * quantity, payment_method='Cash', payment_details='')
+
+
+def stocked_items(db, count, stock):
+    items = sorted(db.catalog.items)[:count]
+    for category, meal in items:
+        ok, message = db.update_stock(category, meal, stock)
+        assert ok, message
+    return items
+
+
+def test_most_sold_matches_group_by_over_sales(db):
+    items = stocked_items(db, 4, 100)
+    # Distinct totals, so there is one most sold item; the last cart changes the leader
+    for (category, meal), quantity in zip(items, (3, 5, 2, 4)):
+        assert db.record_cart([sale(db, category, meal, quantity)])[0]
+    category, meal = items[3]
+    assert db.record_cart([sale(db, category, meal, 3)])[0]
+
+    expected = db.cursor.execute('''
+        SELECT meal, category FROM sales WHERE date = ?
+        GROUP BY meal, category ORDER BY SUM(quantity) DESC LIMIT 1
+    ''', (DAY,)).fetchone()
+    summary = db.cursor.execute("SELECT most_sold_item, most_sold_category FROM daily_summaries WHERE date = ?",
+                                (DAY,)).fetchone()
+    assert summary == expected == (meal, category)
+    assert db.cursor.execute('''
+        SELECT category, meal, quantity, amount, profit FROM daily_item_totals WHERE date = ? ORDER BY category, meal
+    ''', (DAY,)).fetchall() == db.cursor.execute('''
+        SELECT category, meal, SUM(quantity), SUM(amount), SUM(profit) FROM sales WHERE date = ?
+        GROUP BY category, meal ORDER BY category, meal
+    ''', (DAY,)).fetchall()
+
+
+@pytest.mark.slow
+def test_cost_per_sale_stays_flat_through_the_day(db):
+    sales, window = 10000, 1000
+    items = stocked_items(db, 8, sales)
+    timings = []
+    for i in range(sales):
+        category, meal = items[i % len(items)]
+        start = time.perf_counter()
+        ok, message = db.record_cart([sale(db, category, meal)])
+        assert ok, message
+        timings.append(time.perf_counter() - start)
+
+    first = sorted(timings[:window])[window // 2]
+    last = sorted(timings[-window:])[window // 2]
+    print(f"\nmedian per sale: first {window} {first * 1e6:.0f}us, last {window} {last * 1e6:.0f}us")
+    # Re-aggregating the day's sales on every sale would make the last ones many times slower
+    assert last < first * 2
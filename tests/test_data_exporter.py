@@ -0,0 +1,35 @@
+import gzip
+
+import hardware
+
+
+def test_progress_total_comes_from_the_row_counts(db, tmp_path):
+    statements = []
+    db.close()
+    db.pool.trace_callback = statements.append
+    exporter = hardware.DataExporter(db, str(tmp_path), batch_size=2)
+    progress = []
+    path = str(tmp_path / "meals.csv.gz")
+
+    written = exporter.export(hardware.ExportJob("meals", "SELECT * FROM meals", total_from="meals"), path,
+                              lambda name, rows, total: progress.append((rows, total)))
+
+    meals = db.stats.current()["row_counts"]["meals"]
+    assert written == meals
+    assert progress[0] == (2, meals)
+    assert progress[-1] == (meals, meals)
+    # The rows are read once, and the total comes without reading them
+    assert [sql for sql in statements if "FROM meals" in sql] == ["SELECT * FROM meals"]
+    with gzip.open(path, "rt") as f:
+        assert len(f.read().splitlines()) == meals + 1
+
+
+def test_job_without_total_from_reports_no_total_until_done(db, tmp_path):
+    exporter = hardware.DataExporter(db, str(tmp_path), batch_size=2)
+    progress = []
+
+    exporter.export(hardware.ExportJob("meals", "SELECT * FROM meals WHERE is_active=1"),
+                    str(tmp_path / "active.csv.gz"), lambda name, rows, total: progress.append(total))
+
+    assert set(progress[:-1]) == {None}
+    assert progress[-1] is not None
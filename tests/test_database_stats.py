@@ -0,0 +1,18 @@
+def test_table_count_covers_every_table(db):
+    tables = db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'").fetchone()[0]
+
+    assert db.stats.current()["table_count"] == tables
+    assert tables > len(db.stats.current()["row_counts"])
+
+
+def test_counts_are_read_again_on_a_new_connection(db):
+    before = db.stats.current()
+    db.pool.close_all()
+    with db.pool.transaction() as cursor:
+        cursor.execute("DELETE FROM meals")
+    db.pool.close_all()
+
+    after = db.stats.current()
+
+    assert after is not before
+    assert after["row_counts"]["meals"] == 0
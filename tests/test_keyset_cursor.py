@@ -0,0 +1,65 @@
+import pytest
+
+import hardware
+
+
+def sale(date, time='10:15:00', quantity=1):
+    return dict(user='u', date=date, time=time, customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+@pytest.fixture
+def tied(db):
+    # Five sales on one date and time, so only id tells them apart
+    cart = [sale('2025-05-01') for _ in range(5)]
+    cart += [sale('2025-05-02', time='09:00:00'), sale('2025-05-02', time='11:00:00')]
+    cart += [sale('2025-04-30') for _ in range(2)]
+    ok, _ = db.record_cart(cart)
+    assert ok
+    return db
+
+
+def pages(pager):
+    result = []
+    while True:
+        page = pager.next_page()
+        if not page:
+            return result
+        result.append(page)
+
+
+def expected(db, key, descending):
+    direction = "DESC" if descending else "ASC"
+    order = ", ".join(f"{column} {direction}" for column in key)
+    return [row[0] for row in db.conn.execute(f"SELECT id FROM sales ORDER BY {order}")]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_follow_the_full_order(tied, descending):
+    pager = hardware.KeysetCursor(tied, "id", "sales", descending=descending, page_size=3)
+
+    read = pages(pager)
+
+    assert [row[0] for page in read for row in page] == expected(tied, pager.key, descending)
+    assert [len(page) for page in read] == [3, 3, 3]
+    assert pager.exhausted
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_page_boundary_inside_duplicate_dates(tied, descending):
+    # Pages of two split the run of five 2025-05-01 sales twice
+    pager = hardware.KeysetCursor(tied, "id, date", "sales", key=("date", "id"),
+                                  descending=descending, page_size=2)
+
+    rows = [row for page in pages(pager) for row in page]
+
+    assert [row[0] for row in rows] == expected(tied, ("date", "id"), descending)
+    assert len({row[0] for row in rows}) == 9
+    assert [row[1] for row in rows].count('2025-05-01') == 5
+
+
+def test_ties_read_in_the_same_order_every_time(tied):
+    first = hardware.KeysetCursor(tied, "id", "sales", page_size=2)
+    second = hardware.KeysetCursor(tied, "id", "sales", page_size=4)
+
+    assert list(first) == list(second)
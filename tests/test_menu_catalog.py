@@ -0,0 +1,57 @@
+def catalog_matches_table(db):
+    rows = db.conn.execute('''
+        SELECT category, name, buying_price, selling_price, current_stock, is_active FROM meals
+    ''').fetchall()
+    for category, name, buying_price, selling_price, current_stock, is_active in rows:
+        item = db.catalog.get(category, name)
+        if item is None or (item.buying_price, item.selling_price, item.current_stock, item.is_active) != \
+                (buying_price, selling_price, current_stock, bool(is_active)):
+            return False
+    return True
+
+
+def test_add_meal_writes_through(db):
+    version = db.catalog.version
+
+    assert db.add_meal('Food', 'Ugali', 'with greens', 3000, 5000, 12)
+
+    item = db.catalog.get('Food', 'Ugali')
+    assert (item.selling_price, item.current_stock, item.is_active) == (5000, 12, True)
+    assert db.catalog.version > version
+    assert db.catalog.changed_since(version) == [('Food', 'Ugali')]
+    assert db.catalog.menu()['Food']['Ugali'] == 5000
+    assert catalog_matches_table(db)
+
+
+def test_update_stock_writes_through(db):
+    stock = db.catalog.stock('Food', 'Rice')
+    version = db.catalog.version
+
+    assert db.update_stock('Food', 'Rice', 4, selling_price=7500)[0]
+
+    assert db.catalog.stock('Food', 'Rice') == stock + 4
+    assert db.catalog.selling_price('Food', 'Rice') == 7500
+    assert db.catalog.version > version
+    assert db.catalog.changed_since(version) == [('Food', 'Rice')]
+    assert catalog_matches_table(db)
+
+
+def test_remove_meal_writes_through(db):
+    version = db.catalog.version
+
+    assert db.remove_meal('Food', 'Rice')
+
+    assert not db.catalog.get('Food', 'Rice').is_active
+    assert db.catalog.version > version
+    assert db.catalog.changed_since(version) == [('Food', 'Rice')]
+    assert 'Rice' not in db.catalog.menu().get('Food', {})
+    assert catalog_matches_table(db)
+
+
+def test_changed_since_a_reload_is_none(db):
+    version = db.catalog.version
+
+    db.reload_catalog()
+
+    assert db.catalog.changed_since(version) is None
+    assert db.catalog.changed_since(db.catalog.version) == []
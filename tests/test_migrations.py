@@ -0,0 +1,53 @@
+import re
+
+import pytest
+
+import hardware
+
+LATEST = hardware.DatabaseManager.MIGRATIONS[-1][0]
+DDL = re.compile(r"^\s*(CREATE|ALTER|DROP)\b", re.IGNORECASE)
+
+
+def test_migrations_are_numbered_in_order():
+    assert [version for version, _ in hardware.DatabaseManager.MIGRATIONS] == list(range(1, LATEST + 1))
+    for version in range(1, LATEST + 1):
+        assert callable(getattr(hardware.DatabaseManager, f"_migrate_{version}"))
+
+
+def test_current_database_runs_no_ddl(db):
+    statements = []
+    db.close()
+    db.pool.trace_callback = statements.append
+
+    db.initialize_database()
+
+    assert db.migration_report == []
+    assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == LATEST
+    assert not [sql for sql in statements if DDL.match(sql)]
+
+
+@pytest.mark.parametrize("version", range(1, LATEST))
+def test_older_database_upgrades_step_by_step(tmp_path, monkeypatch, version):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "old.db")
+
+    class OlderManager(hardware.DatabaseManager):
+        MIGRATIONS = hardware.DatabaseManager.MIGRATIONS[:version]
+
+    older = OlderManager(path)
+    assert older.cursor.execute("PRAGMA user_version").fetchone()[0] == version
+    older.close()
+
+    db = hardware.DatabaseManager(path)
+    try:
+        assert [step for step, _, _ in db.migration_report] == list(range(version + 1, LATEST + 1))
+        assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == LATEST
+        # The result is the same schema a new database gets
+        fresh = hardware.DatabaseManager(str(tmp_path / "fresh.db"))
+        try:
+            schema = "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+            assert db.cursor.execute(schema).fetchall() == fresh.cursor.execute(schema).fetchall()
+        finally:
+            fresh.close()
+    finally:
+        db.close()
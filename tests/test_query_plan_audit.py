@@ -0,0 +1,39 @@
+from query_plan_audit import QueryPlanAudit
+
+
+def full_scan(db, sql):
+    audit = QueryPlanAudit()
+    return audit._full_scan(db, audit._normalize(sql))
+
+
+def test_aliased_full_scan_is_a_finding(db):
+    assert full_scan(db, "SELECT s.meal FROM sales s WHERE s.amount > ?")
+    assert full_scan(db, "SELECT s.meal FROM sales AS s WHERE s.amount > ?")
+
+
+def test_commented_multiline_statement_is_checked(db):
+    sql = '''
+        SELECT m.name, SUM(w.quantity)
+        FROM meals m
+        -- One pass over the sales, joined to every meal
+        LEFT JOIN sales w ON w.meal = m.name
+        WHERE w.profit > ?
+        GROUP BY m.name
+    '''
+    assert full_scan(db, sql)
+
+
+def test_statement_that_cannot_be_planned_is_a_finding(db):
+    assert full_scan(db, "SELECT quantity FROM temp.no_such_table")
+
+
+def test_indexed_range_is_not_a_finding(db):
+    assert full_scan(db, "SELECT s.meal FROM sales s WHERE s.date >= ?") is None
+
+
+def test_no_statement_full_scans_a_large_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audit = QueryPlanAudit()
+
+    assert audit.run() == []
+    assert audit.checked
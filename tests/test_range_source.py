@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+
+def sale(date, quantity=1):
+    return dict(user='u', date=date, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+@pytest.fixture
+def archived(db):
+    ok, _ = db.record_cart([sale('2025-03-15'), sale('2025-04-02', 2)])
+    assert ok
+    ok, _ = db.archive_month('2025-03')
+    assert ok
+    return db
+
+
+def quantities(pager):
+    return [row[5] for row in pager]
+
+
+def temp_objects(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM temp.sqlite_master")}
+
+
+def test_open_cursors_keep_their_own_range(archived):
+    first = archived.page_user_sales('u', days=10000)
+    second = archived.page_user_sales('u', days=10000)
+
+    assert first.source != second.source
+    second.close()
+    assert quantities(first) == [2, 1]
+
+
+def test_range_made_in_a_snapshot_is_read_after_it(archived):
+    with archived.snapshot():
+        pager = archived.page_user_sales('u', days=10000)
+
+    assert pager.source != 'sales'
+    assert quantities(pager) == [2, 1]
+
+
+def test_close_drops_the_range(archived):
+    pager = archived.page_user_sales('u', days=10000)
+    conn = archived.range_connection(pager.source)
+    assert pager.source in temp_objects(conn)
+
+    pager.close()
+
+    # The range had a connection of its own, closed with it
+    with pytest.raises(sqlite3.ProgrammingError):
+        temp_objects(conn)
+    assert archived.range_connection(pager.source) is None
+
+
+def test_close_drops_a_snapshot_range(archived):
+    with archived.snapshot():
+        pager = archived.page_user_sales('u', days=10000)
+    conn = archived.range_connection(pager.source)
+    assert pager.source in temp_objects(conn)
+
+    pager.close()
+
+    assert pager.source not in temp_objects(conn)
+
+
+def test_two_open_ranges_over_different_months(archived):
+    assert archived.record_cart([sale('2025-05-03', 3)])[0]
+    assert archived.archive_month('2025-04')[0]
+
+    april = archived.range_source('sales', '2025-04-01', '2025-04-30')
+    march = archived.range_source('sales', '2025-03-01', '2025-03-31')
+
+    def quantities_in(source, start, end):
+        conn = archived.range_connection(source)
+        return [row[0] for row in conn.execute(
+            f"SELECT quantity FROM {source} WHERE date BETWEEN ? AND ? ORDER BY date", (start, end))]
+
+    assert quantities_in(april, '2025-04-01', '2025-04-30') == [2]
+    assert quantities_in(march, '2025-03-01', '2025-03-31') == [1]
+    archived.drop_range_source(march)
+    assert quantities_in(april, '2025-04-01', '2025-04-30') == [2]
+    archived.drop_range_source(april)
@@ -0,0 +1,31 @@
+def sale(payment_method, date='2026-10-17', quantity=1):
+    return dict(user='u', date=date, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method=payment_method,
+                payment_details='')
+
+
+def test_payment_methods_go_to_their_summary_columns(db):
+    for method in ('Cash', 'Mpesa', 'Credit Card', 'Voucher'):
+        ok, message = db.record_cart([sale(method)])
+        assert ok, message
+
+    row = db.cursor.execute('''
+        SELECT cash_sales, mpesa_sales, card_sales, other_sales, total_sales
+        FROM daily_summaries WHERE date = '2026-10-17'
+    ''').fetchone()
+    assert row == (7000, 7000, 7000, 7000, 28000)
+
+
+def test_failed_summary_rolls_back_the_cart(db):
+    stock = db.catalog.stock('Food', 'Rice')
+    with db.pool.transaction() as cursor:
+        cursor.execute("CREATE TRIGGER refuse_summary BEFORE INSERT ON daily_summaries "
+                       "BEGIN SELECT RAISE(ABORT, 'refused'); END")
+
+    ok, _ = db.record_cart([sale('Cash'), sale('Cash', quantity=2)])
+
+    assert not ok
+    assert db.cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 0
+    assert db.cursor.execute("SELECT COUNT(*) FROM daily_item_totals").fetchone()[0] == 0
+    assert db.cursor.execute("SELECT current_stock FROM meals WHERE category = 'Food' AND name = 'Rice'"
+                             ).fetchone()[0] == stock
@@ -0,0 +1,46 @@
+import sqlite3
+import threading
+
+import pytest
+
+import hardware
+
+
+def sale(date, quantity=1):
+    return dict(user='u', date=date, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+def count_sales(db):
+    return db.cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+
+
+def test_report_cannot_write(db):
+    @hardware.reporting
+    def report(self):
+        self.cursor.execute("DELETE FROM sales")
+
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        report(db)
+
+
+def test_report_reads_one_snapshot_while_the_writer_commits(db):
+    assert db.record_cart([sale('2025-05-01')])[0]
+    results = []
+
+    def checkout():
+        results.append(db.record_cart([sale('2025-05-02')])[0])
+
+    @hardware.reporting
+    def report(self):
+        before = count_sales(self)
+        # Another thread's checkout commits without waiting on the report
+        writer = threading.Thread(target=checkout)
+        writer.start()
+        writer.join(timeout=10)
+        assert not writer.is_alive()
+        return before, count_sales(self)
+
+    assert report(db) == (1, 1)
+    assert results == [True]
+    assert count_sales(db) == 2
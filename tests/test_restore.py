@@ -0,0 +1,68 @@
+import threading
+import time
+
+import hardware
+
+
+def sale(date, quantity=1):
+    return dict(user='u', date=date, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+def count_sales(conn, date):
+    return conn.execute("SELECT COUNT(*) FROM sales WHERE date=?", (date,)).fetchone()[0]
+
+
+def test_restore_into_an_open_database(db, tmp_path):
+    assert db.record_cart([sale('2025-12-01', 2)])[0]
+    backed_up_price = db.catalog.selling_price('Food', 'Rice')
+    backup = str(tmp_path / "backup.db")
+    db.backup_to(backup)
+
+    # Changes made after the backup that the restore must undo
+    assert db.update_stock('Food', 'Rice', 5, selling_price=backed_up_price + 500)[0]
+    assert db.record_cart([sale('2025-12-01')])[0]
+
+    stop = threading.Event()
+    errors = []
+    reads = []
+
+    def reader():
+        try:
+            while not stop.is_set():
+                with db.snapshot() as cursor:
+                    reads.append(count_sales(cursor, '2025-12-01'))
+        except Exception as e:
+            errors.append(e)
+
+    def writer():
+        try:
+            while not stop.is_set():
+                assert db.record_cart([sale('2026-01-01')])[0]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader), threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+
+    received = []
+    db.events.subscribe(hardware.DataReloaded, received.append)
+    try:
+        db.restore_from(backup)
+        after = len(reads)
+        # The reader carries on and its next snapshots see the restored rows
+        while len(reads) < after + 2 and not errors:
+            time.sleep(0.001)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors
+    assert reads[-1] == 1
+    assert count_sales(db.conn, '2025-12-01') == 1
+    assert db.conn.execute("SELECT selling_price FROM meals WHERE category='Food' AND name='Rice'"
+                           ).fetchone()[0] == backed_up_price
+    assert db.catalog.selling_price('Food', 'Rice') == backed_up_price
+    assert len(received) == 1
@@ -0,0 +1,44 @@
+def sale(date, time='10:15:00', user='u', quantity=1, payment_method='Cash'):
+    return dict(user=user, date=date, time=time, customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method=payment_method,
+                payment_details='')
+
+
+def rollup(db):
+    return sorted(db.conn.execute("SELECT * FROM sales_hourly").fetchall())
+
+
+def grouped_sales(db):
+    """The rollup recomputed from live and archived sales"""
+    everything = ('0000-01-01', '9999-12-31')
+    source = db.range_source('sales', *everything)
+    try:
+        conn = db.range_connection(source) or db.conn
+        return sorted(conn.execute(db.HOURLY_ROLLUP_SELECT.format(source=source), everything).fetchall())
+    finally:
+        db.drop_range_source(source)
+
+
+def test_rollup_follows_sales_voids_and_archiving(db):
+    ok, _ = db.record_cart([
+        sale('2025-03-03'),
+        sale('2025-03-03', time='10:45:00', quantity=2),
+        sale('2025-03-03', time='18:05:00', payment_method='Card'),
+        sale('2025-03-20', user='v'),
+        sale('2025-04-01', quantity=3),
+        sale('2025-04-02', time='09:00:00'),
+    ])
+    assert ok
+    assert rollup(db) == grouped_sales(db)
+
+    assert db.void_sales('2025-04-02')[0]
+    assert rollup(db) == grouped_sales(db)
+
+    assert db.archive_month('2025-03')[0]
+    assert db.conn.execute("SELECT COUNT(*) FROM sales WHERE date < '2025-04-01'").fetchone()[0] == 0
+    assert rollup(db) == grouped_sales(db)
+    assert len(rollup(db)) == 4
+
+    # Rebuilding from the partitions lands on the same rows
+    assert db.rebuild_sales_hourly('2025-01-01')[0]
+    assert rollup(db) == grouped_sales(db)
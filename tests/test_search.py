@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+import hardware
+
+TODAY = datetime.now().strftime('%Y-%m-%d')
+
+
+def history(db, date, item, category, notes=''):
+    with db.pool.transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO stock_history (date, time, item_name, category, change_type, quantity,
+                                       previous_stock, new_stock, buying_price, selling_price, user, notes)
+            VALUES (?, '09:00:00', ?, ?, 'add', 5, 0, 5, 100, 200, 'u', ?)
+        ''', (date, item, category, notes))
+
+
+@pytest.fixture
+def stocked(db):
+    db.pool.writer.execute("DELETE FROM stock_history")
+    history(db, '2025-03-10', 'Rice', 'Food', 'delivered by truck')
+    assert db.archive_month('2025-03')[0]
+    history(db, TODAY, 'Rice', 'Food', 'restocked after lunch')
+    history(db, TODAY, 'Juice', 'Cold Drinks', 'mango crates')
+    return db
+
+
+@pytest.mark.parametrize("text, query", [
+    ("rice", '"rice"*'),
+    ("mango crate", '"mango"* "crate"*'),
+    ('"after lunch" rice', '"after lunch" "rice"*'),
+    # Operators and stray quotes are searched for, not obeyed
+    ('rice OR NOT juice*', '"rice"* "OR"* "NOT"* "juice*"*'),
+    ('ri"ce', '"rice"*'),
+    ("   ", '""'),
+])
+def test_fts_query(text, query):
+    assert hardware.DatabaseManager.fts_query(text) == query
+
+
+def test_search_matches_word_prefixes_live_and_archived(stocked):
+    items = [(row[0], row[11]) for row in stocked.search_stock_history("ric")]
+
+    assert sorted(items) == [('2025-03-10', 'delivered by truck'), (TODAY, 'restocked after lunch')]
+    assert [row[11] for row in stocked.search_stock_history('"after lunch"')] == ['restocked after lunch']
+    assert stocked.search_stock_history("lunch after rice") == stocked.search_stock_history('"after lunch"')
+    assert [row[11] for row in stocked.search_stock_history("rice", days=30)] == ['restocked after lunch']
+    assert stocked.search_stock_history("rice OR juice") == []
+
+
+def test_history_filters_match_substrings_over_any_window(stocked):
+    def items(days, **filters):
+        return sorted((row[0], row[2]) for row in stocked.page_stock_history(days, **filters))
+
+    assert items(30, item_filter="ice") == [(TODAY, 'Juice'), (TODAY, 'Rice')]
+    assert items(10000, item_filter="ice") == [('2025-03-10', 'Rice'), (TODAY, 'Juice'), (TODAY, 'Rice')]
+    assert items(30, category_filter="old dri") == items(10000, category_filter="old dri") == [(TODAY, 'Juice')]
+    assert items(10000, item_filter="ice", category_filter="drinks") == [(TODAY, 'Juice')]
@@ -0,0 +1,46 @@
+def sale(date, quantity=1):
+    return dict(user='u', date=date, time='10:15:00', customer_name='c', category='Food', meal='Rice',
+                quantity=quantity, price=7000, amount=7000 * quantity, payment_method='Cash', payment_details='')
+
+
+def count(db, table, start, end):
+    return db.cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE date BETWEEN ? AND ?", (start, end)).fetchone()[0]
+
+
+def test_void_refuses_range_spanning_archived_month(db):
+    ok, _ = db.record_cart([sale('2025-03-15'), sale('2025-04-02', 2)])
+    assert ok
+    ok, _ = db.archive_month('2025-03')
+    assert ok
+
+    ok, message = db.void_sales('2025-03-01', '2025-04-30')
+
+    assert not ok
+    assert '2025-03' in message
+    # Nothing was voided: the live April sale and every rollup are untouched
+    assert count(db, 'sales', '2025-04-01', '2025-04-30') == 1
+    for table in ('sales_hourly', 'daily_summaries', 'daily_item_totals'):
+        assert count(db, table, '2025-03-01', '2025-03-31') == 1, table
+        assert count(db, table, '2025-04-01', '2025-04-30') == 1, table
+
+
+def test_void_live_range_next_to_archived_month(db):
+    db.record_cart([sale('2025-03-15'), sale('2025-04-02', 2)])
+    db.archive_month('2025-03')
+
+    ok, _ = db.void_sales('2025-04-01', '2025-04-30')
+
+    assert ok
+    assert count(db, 'sales', '2025-04-01', '2025-04-30') == 0
+    assert count(db, 'sales_hourly', '2025-03-01', '2025-03-31') == 1
+    assert count(db, 'sales_hourly', '2025-04-01', '2025-04-30') == 0
+
+
+def test_void_refuses_malformed_date(db):
+    db.record_cart([sale('2025-04-02')])
+
+    ok, message = db.void_sales('2025-4-1', '2025-04-30')
+
+    assert not ok
+    assert 'Invalid date' in message
+    assert count(db, 'sales', '2025-04-01', '2025-04-30') == 1